@@ -0,0 +1,24 @@
+"""Настройки gunicorn; режим и число воркеров задаются переменными окружения.
+
+SERVER_MODE=wsgi — синхронные воркеры и todo.wsgi (по умолчанию)
+SERVER_MODE=asgi — воркеры uvicorn и todo.asgi с асинхронными представлениями
+"""
+import multiprocessing
+import os
+
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'todo.asgi:application'
+    worker_class = os.getenv('GUNICORN_WORKER_CLASS') or 'uvicorn.workers.UvicornWorker'
+    # Асинхронный воркер сам обслуживает много запросов, хватает одного на ядро
+    workers = int(os.getenv('GUNICORN_WORKERS') or multiprocessing.cpu_count())
+else:
+    wsgi_app = 'todo.wsgi:application'
+    worker_class = os.getenv('GUNICORN_WORKER_CLASS') or 'sync'
+    # Синхронный воркер обслуживает один запрос за раз, пока ждет базу
+    workers = int(os.getenv('GUNICORN_WORKERS') or multiprocessing.cpu_count() * 2 + 1)
+    threads = int(os.getenv('GUNICORN_THREADS', '1'))
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Task, Category
+from .models import Task, Category, TelegramProfile, search_query
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -10,5 +10,17 @@ class CategoryAdmin(admin.ModelAdmin):
 class TaskAdmin(admin.ModelAdmin):
     list_display = ['title', 'user', 'completed', 'due_date', 'created_date']
     list_filter = ['completed', 'categories', 'created_date']
+    # Поле поиска показывается, только если search_fields не пуст; ищет get_search_results
     search_fields = ['title', 'description']
-    filter_horizontal = ['categories']
\ No newline at end of file
+    filter_horizontal = ['categories']
+
+    def get_search_results(self, request, queryset, search_term):
+        """Полнотекстовый поиск по GIN-индексу вместо icontains по каждому полю"""
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(search_vector=search_query(search_term)), False
+
+@admin.register(TelegramProfile)
+class TelegramProfileAdmin(admin.ModelAdmin):
+    list_display = ['user', 'telegram_id']
+    search_fields = ['user__username', 'telegram_id']
\ No newline at end of file
@@ -0,0 +1,105 @@
+"""Асинхронные GET для самых частых запросов: списки задач и категорий и check_category.
+
+Под ASGI (SERVER_MODE=asgi) эти представления ждут базу и кэш, не занимая
+поток воркера. Аутентификация по X-Telegram-User-Id и X-Bot-Api-Token, ключи кэша, ETag,
+пагинация и формат ответа — те же, что у вьюсетов: ответ из кэша отдается
+целиком асинхронно, а при промахе страницу собирает пагинатор DRF в потоке
+(в DRF 3.14 нет асинхронных вьюсетов и пагинаторов). Остальные запросы —
+другие методы, сессии и Basic-авторизация, HTML browsable API — обрабатывает
+синхронный вьюсет.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db.models.functions import Lower
+from django.http import HttpResponse, HttpResponseNotModified
+from rest_framework.exceptions import APIException, AuthenticationFailed
+from rest_framework.request import Request
+
+from .authentication import aget_telegram_user, get_request_telegram_id
+from .cache import aget_versions, arecord
+from .models import Category
+from .renderers import FastJSONRenderer
+from .views import CategoryViewSet, TaskViewSet
+
+
+def can_serve_async(request):
+    if request.method != 'GET' or 'format' in request.GET:
+        return False
+    if 'HTTP_AUTHORIZATION' in request.META or settings.SESSION_COOKIE_NAME in request.COOKIES:
+        return False
+    accept = request.headers.get('Accept', '*/*')
+    if 'text/html' in accept or not ('*/*' in accept or 'application/json' in accept):
+        return False
+    # Некорректный заголовок или секрет: ошибку вернет вьюсет
+    try:
+        get_request_telegram_id(request)
+    except AuthenticationFailed:
+        return False
+    return True
+
+
+def render(data, allow):
+    response = HttpResponse(FastJSONRenderer().render(data), content_type='application/json')
+    # Те же заголовки, что добавляет APIView
+    response['Allow'] = allow
+    response['Vary'] = 'Accept'
+    return response
+
+
+def cached_list_view(viewset_class, actions):
+    """Асинхронный list() для вьюсета с CachedListMixin"""
+    sync_view = sync_to_async(viewset_class.as_view(actions))
+
+    async def view(request, *args, **kwargs):
+        if not can_serve_async(request):
+            return await sync_view(request, *args, **kwargs)
+
+        telegram_id = get_request_telegram_id(request)
+        drf_request = Request(request)
+        drf_request.user = await aget_telegram_user(telegram_id) if telegram_id else AnonymousUser()
+        drf_request.auth = None
+        viewset = viewset_class(request=drf_request, args=args, kwargs=kwargs, action='list', format_kwarg=None)
+        if not all(permission.has_permission(drf_request, viewset) for permission in viewset.get_permissions()):
+            # Отказ в доступе оформляет вьюсет
+            return await sync_view(request, *args, **kwargs)
+        allow = ', '.join(viewset.allowed_methods)
+
+        versions = await aget_versions(await viewset.aget_cache_version_keys())
+        key = viewset.get_cache_key(request, versions)
+        entry = await cache.aget(key)
+        if entry is None:
+            try:
+                etag, data = await sync_to_async(viewset.fill_cache)(key, drf_request, *args, **kwargs)
+            except APIException:
+                # Неверная страница или фильтр: ответ с ошибкой оформляет вьюсет
+                return await sync_view(request, *args, **kwargs)
+        else:
+            etag, data = entry
+            await arecord(viewset.cache_name, 'hits')
+
+        if etag in request.headers.get('If-None-Match', ''):
+            await arecord(viewset.cache_name, 'not_modified')
+            response = HttpResponseNotModified()
+            response['Allow'] = allow
+            response['Vary'] = 'Accept'
+        else:
+            response = render(data, allow)
+        response['ETag'] = etag
+        return response
+
+    return view
+
+
+task_list = cached_list_view(TaskViewSet, {'get': 'list', 'post': 'create'})
+category_list = cached_list_view(CategoryViewSet, {'get': 'list', 'post': 'create'})
+_check_category_sync = sync_to_async(CategoryViewSet.as_view({'get': 'check_category'}))
+
+
+async def check_category(request):
+    if not can_serve_async(request):
+        return await _check_category_sync(request)
+    name = request.GET.get('name', '')
+    exists = await Category.objects.annotate(name_lower=Lower('name')).filter(name_lower=name.lower()).aexists()
+    return render({'exists': exists}, 'GET, HEAD, OPTIONS')
@@ -0,0 +1,73 @@
+import hmac
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import authentication, exceptions
+
+from .models import TelegramProfile
+
+TELEGRAM_USER_CACHE_KEY = 'telegram-user:{telegram_id}'
+
+
+def get_request_telegram_id(request):
+    """Telegram ID из X-Telegram-User-Id или None без заголовка.
+
+    Заголовок принимается только вместе с общим секретом бота в X-Bot-Api-Token,
+    иначе любой клиент мог бы назваться любым пользователем.
+    """
+    raw_id = request.META.get('HTTP_X_TELEGRAM_USER_ID')
+    if not raw_id:
+        return None
+    token = request.META.get('HTTP_X_BOT_API_TOKEN', '')
+    if not settings.BOT_API_TOKEN or not hmac.compare_digest(token.encode(), settings.BOT_API_TOKEN.encode()):
+        raise exceptions.AuthenticationFailed('Неверный X-Bot-Api-Token')
+    try:
+        return int(raw_id)
+    except ValueError:
+        raise exceptions.AuthenticationFailed('Некорректный X-Telegram-User-Id')
+
+
+def get_telegram_user(telegram_id):
+    """Возвращает пользователя Django для Telegram ID, создавая его при первом обращении"""
+    profile = TelegramProfile.objects.select_related('user').filter(telegram_id=telegram_id).first()
+    if profile is not None:
+        return profile.user
+
+    with transaction.atomic():
+        user, created = User.objects.get_or_create(username=f'tg_{telegram_id}')
+        profile, created = TelegramProfile.objects.get_or_create(
+            telegram_id=telegram_id,
+            defaults={'user': user}
+        )
+    return profile.user
+
+
+async def aget_telegram_user(telegram_id):
+    """Асинхронный вариант get_telegram_user.
+
+    Пользователь запоминается в кэше, и ответ из кэша списков не требует
+    базы вовсе — под ASGI это еще и без отдельного соединения на запрос.
+    """
+    key = TELEGRAM_USER_CACHE_KEY.format(telegram_id=telegram_id)
+    user = await cache.aget(key)
+    if user is None:
+        profile = await TelegramProfile.objects.select_related('user').filter(telegram_id=telegram_id).afirst()
+        if profile is not None:
+            user = profile.user
+        else:
+            user = await sync_to_async(get_telegram_user)(telegram_id)
+        await cache.aset(key, user, settings.API_CACHE_TTL)
+    return user
+
+
+class TelegramUserAuthentication(authentication.BaseAuthentication):
+    """Бот передает Telegram ID отправителя в X-Telegram-User-Id и общий секрет в X-Bot-Api-Token"""
+
+    def authenticate(self, request):
+        telegram_id = get_request_telegram_id(request)
+        if telegram_id is None:
+            return None
+        return (get_telegram_user(telegram_id), None)
@@ -0,0 +1,178 @@
+"""Кэш ответов списков задач и категорий.
+
+Ключ записи включает версии данных, из которых собран ответ. При изменении
+задачи или категории версия увеличивается, и старые записи просто перестают
+читаться, а затем истекают по TTL — удалять их по одной не нужно.
+
+Версии увеличиваются после коммита транзакции: иначе запрос списка между
+увеличением версии и коммитом прочитал бы старые строки и закэшировал их
+под новой версией до следующего изменения или истечения TTL.
+"""
+import hashlib
+import json
+import logging
+import time
+
+import redis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES_VERSION_KEY = 'categories:version'
+# Канал Redis, по которому бот узнает об изменении категорий (см. bot/categories.py)
+CATEGORY_EVENTS_CHANNEL = 'categories:changed'
+STATS_KEY = 'api-cache:{name}:{event}'
+STATS_EVENTS = ('hits', 'misses', 'not_modified')
+
+
+def task_list_version_key(user_id):
+    return f'tasks:{user_id}:version'
+
+
+def _initial_version():
+    # Версия от времени, а не 1: если ключ версии вытеснят из Redis,
+    # новая версия не совпадет со старыми записями
+    return time.time_ns()
+
+
+def get_versions(keys):
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _initial_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+async def aget_versions(keys):
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, _initial_version(), timeout=None)
+            versions[key] = await cache.aget(key)
+    return [versions[key] for key in keys]
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_version(), timeout=None)
+
+
+def bump_categories():
+    """Категории входят и в ответы со списком задач, поэтому сбрасываются оба кэша"""
+    transaction.on_commit(lambda: bump_version(CATEGORIES_VERSION_KEY))
+    if settings.CATEGORY_EVENTS_REDIS_URL:
+        # Бот сбрасывает свой кэш категорий по этому событию; оно тоже уходит после коммита,
+        # вслед за новой версией, иначе бот успеет перечитать старые данные
+        transaction.on_commit(publish_categories_changed)
+
+
+_events_client = None
+
+
+def publish_categories_changed():
+    global _events_client
+    try:
+        if _events_client is None:
+            _events_client = redis.Redis.from_url(settings.CATEGORY_EVENTS_REDIS_URL)
+        _events_client.publish(CATEGORY_EVENTS_CHANNEL, json.dumps({'version': cache.get(CATEGORIES_VERSION_KEY)}))
+    except redis.RedisError:
+        logger.warning('Не удалось отправить событие об изменении категорий', exc_info=True)
+
+
+def bump_task_lists(user_ids):
+    # Пользователи собираются сразу: user_ids может быть запросом к базе
+    user_ids = set(user_ids)
+
+    def bump():
+        for user_id in user_ids:
+            bump_version(task_list_version_key(user_id))
+
+    transaction.on_commit(bump)
+
+
+def record(name, event):
+    key = STATS_KEY.format(name=name, event=event)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+async def arecord(name, event):
+    key = STATS_KEY.format(name=name, event=event)
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aadd(key, 1, timeout=None)
+
+
+def get_stats(names=('tasks', 'categories')):
+    keys = {(name, event): STATS_KEY.format(name=name, event=event) for name in names for event in STATS_EVENTS}
+    values = cache.get_many(keys.values())
+    return {
+        name: {event: values.get(keys[name, event], 0) for event in STATS_EVENTS}
+        for name in names
+    }
+
+
+def make_etag(data):
+    payload = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return '"%s"' % hashlib.md5(payload.encode()).hexdigest()
+
+
+class CachedListMixin:
+    """Кэширует ответ list() и поддерживает условный GET по ETag.
+
+    Вьюсет задает cache_name и get_cache_version_keys(); при необходимости
+    get_cache_timeout(data) сокращает время жизни конкретного ответа.
+    """
+    cache_name = None
+
+    def get_cache_version_keys(self):
+        raise NotImplementedError
+
+    def get_cache_timeout(self, data):
+        return settings.API_CACHE_TTL
+
+    async def aget_cache_version_keys(self):
+        return await sync_to_async(self.get_cache_version_keys)()
+
+    def get_cache_key(self, request, versions=None):
+        if versions is None:
+            versions = get_versions(self.get_cache_version_keys())
+        # Абсолютный URL: в ответе есть ссылки next/previous с хостом запроса
+        url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+        return f"api-cache:{self.cache_name}:{':'.join(map(str, versions))}:{url}"
+
+    def fill_cache(self, key, request, *args, **kwargs):
+        """Собирает ответ списка и кладет его в кэш; возвращает (etag, data)"""
+        data = super().list(request, *args, **kwargs).data
+        etag = make_etag(data)
+        cache.set(key, (etag, data), self.get_cache_timeout(data))
+        record(self.cache_name, 'misses')
+        return etag, data
+
+    def list(self, request, *args, **kwargs):
+        key = self.get_cache_key(request)
+        entry = cache.get(key)
+        if entry is None:
+            etag, data = self.fill_cache(key, request, *args, **kwargs)
+        else:
+            etag, data = entry
+            record(self.cache_name, 'hits')
+
+        if etag in request.headers.get('If-None-Match', ''):
+            record(self.cache_name, 'not_modified')
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+        response['ETag'] = etag
+        return response
@@ -0,0 +1,100 @@
+"""Потоковая выгрузка задач в NDJSON и CSV.
+
+Строки читаются серверным курсором (.iterator()) пачками по EXPORT_CHUNK_SIZE,
+категории каждой пачки подгружаются одним запросом, и ответ отдается по
+пачке за раз — память не зависит от числа задач. Через PgBouncer в режиме
+transaction серверные курсоры выключены (DB_DISABLE_SERVER_SIDE_CURSORS),
+и драйвер читает результат запроса целиком.
+"""
+import csv
+import io
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.db.models.functions import Now
+from rest_framework import serializers
+
+from .models import Task
+from .renderers import FastJSONRenderer
+
+EXPORT_CHUNK_SIZE = 2000
+# Порядок столбцов выгрузки — как у полей списка задач
+EXPORT_FIELDS = ['id', 'title', 'description', 'completed', 'due_date', 'created_date', 'is_overdue', 'categories']
+# Значения в CSV — как в JSON: true/false и пустая ячейка вместо null
+CSV_VALUES = {True: 'true', False: 'false', None: ''}
+
+
+def export_rows(queryset, fields):
+    """Пачки задач словарями; даты и категории в том же виде, что в API"""
+    columns = [name for name in ('title', 'description', 'completed', 'due_date', 'created_date') if name in fields]
+    if 'is_overdue' in fields:
+        # Не is_overdue: так называется свойство модели
+        queryset = queryset.annotate(overdue=ExpressionWrapper(
+            Q(completed=False, due_date__isnull=False, due_date__lt=Now()),
+            output_field=BooleanField(),
+        ))
+        columns.append('overdue')
+    # id нужен для категорий, даже если его нет в ?fields=
+    rows = queryset.values('id', *columns).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    datetime_field = serializers.DateTimeField()
+    while True:
+        chunk = list(islice(rows, EXPORT_CHUNK_SIZE))
+        if not chunk:
+            return
+        if 'categories' in fields:
+            categories = {row['id']: [] for row in chunk}
+            links = (Task.categories.through.objects.filter(task_id__in=list(categories))
+                     .order_by('category__name').values_list('task_id', 'category_id', 'category__name'))
+            for task_id, category_id, name in links:
+                categories[task_id].append({'id': category_id, 'name': name})
+        for row in chunk:
+            for name in ('due_date', 'created_date'):
+                if row.get(name) is not None:
+                    row[name] = datetime_field.to_representation(row[name])
+            if 'overdue' in row:
+                row['is_overdue'] = row.pop('overdue')
+            if 'categories' in fields:
+                row['categories'] = categories[row['id']]
+            if 'id' not in fields:
+                del row['id']
+        yield chunk
+
+
+def ndjson_chunks(queryset, fields):
+    render = FastJSONRenderer().render
+    for chunk in export_rows(queryset, fields):
+        yield b''.join(render(row) + b'\n' for row in chunk)
+
+
+def csv_chunks(queryset, fields):
+    header = [name for name in EXPORT_FIELDS if name in fields]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM, чтобы Excel открыл UTF-8 с кириллицей
+    buffer.write('\ufeff')
+    writer.writerow(header)
+    for chunk in export_rows(queryset, fields):
+        for row in chunk:
+            if 'categories' in row:
+                row['categories'] = ', '.join(category['name'] for category in row['categories'])
+            writer.writerow([CSV_VALUES.get(row[name], row[name]) for name in header])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def aiter_chunks(chunks):
+    """Асинхронная обертка для ASGI: иначе Django 4.2 собрал бы синхронный поток в список целиком.
+
+    Пачки читаются в одном и том же потоке (thread_sensitive), где живет
+    соединение с серверным курсором.
+    """
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    while True:
+        chunk = await next_chunk(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
@@ -0,0 +1,289 @@
+"""Массовый импорт задач из CSV или NDJSON — формат совпадает с выгрузкой tasks.export.
+
+Файл читается потоком и обрабатывается пачками по IMPORT_BATCH_SIZE строк:
+строки проверяются без сериализаторов DRF, категории пачки находятся (или
+создаются) одним запросом и запоминаются на весь импорт, задачи и связи с
+категориями пишутся двумя bulk_create в транзакции пачки. Ошибочные строки
+пропускаются и попадают в отчет с номером строки файла. На строке не в UTF-8
+импорт останавливается: задачи из предыдущих строк остаются, ошибка и их число
+тоже попадают в отчет.
+
+В отличие от API, дедлайн в прошлом допустим — переносятся и старые задачи.
+Уже просроченные открытые задачи помечаются уведомленными, чтобы Celery не
+прислал уведомления обо всех них сразу после импорта.
+"""
+import csv
+import json
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .cache import bump_task_lists
+from .metrics import registry
+from .models import Task
+from .serializers import assign_pks, resolve_categories
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+IMPORT_BATCH_SIZE = 2000
+# Сколько ошибок с номерами строк попадает в отчет; остальные только считаются
+MAX_REPORTED_ERRORS = 1000
+TRUE_VALUES = {'true', '1', 'yes'}
+FALSE_VALUES = {'false', '0', 'no'}
+TITLE_MAX_LENGTH = Task._meta.get_field('title').max_length
+CATEGORY_NAME_MAX_LENGTH = 100
+
+
+def parse_bool(value):
+    """True/False для true/false, 1/0, yes/no; None для пустого значения; ValueError для прочего"""
+    if value is None or isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if not value:
+        return None
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(value)
+
+
+def parse_iso_datetime(value):
+    """Дата или дата и время в ISO 8601; дата без времени — начало дня. None для пустого значения"""
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None and parse_date(value) is not None:
+            parsed = datetime.combine(parse_date(value), datetime.min.time())
+    except (TypeError, ValueError):
+        parsed = None
+    if parsed is None:
+        raise ValueError(value)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class ImportFileError(Exception):
+    """Файл дальше не читается: импорт останавливается на строке line_number"""
+
+    def __init__(self, line_number, message):
+        super().__init__(message)
+        self.line_number = line_number
+
+
+def detect_format(stream):
+    """ndjson, если файл начинается с '{', иначе csv; поток возвращается в начало"""
+    head = stream.read(64)
+    stream.seek(0)
+    return 'ndjson' if head.lstrip(b'\xef\xbb\xbf \t\r\n').startswith(b'{') else 'csv'
+
+
+def read_rows(stream, file_format):
+    """(номер строки файла, словарь или текст ошибки разбора) из бинарного потока"""
+    if file_format == 'csv':
+        reader = csv.DictReader(decode_lines(stream))
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = orjson.loads(line) if orjson is not None else json.loads(line)
+        except ValueError:
+            yield line_number, 'Invalid JSON'
+            continue
+        yield line_number, row if isinstance(row, dict) else 'Expected a JSON object'
+
+
+def decode_lines(stream):
+    """Строки файла в UTF-8 (BOM в начале допустим) по одной — ошибка кодировки с точным номером строки"""
+    for line_number, line in enumerate(stream, 1):
+        try:
+            yield line.decode('utf-8-sig' if line_number == 1 else 'utf-8')
+        except UnicodeDecodeError:
+            raise ImportFileError(line_number, 'File is not valid UTF-8')
+
+
+def category_names_of(value):
+    """Имена категорий из строки через запятую (CSV) или списка имен либо {"name": ...} (NDJSON)"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, list):
+        raise ValueError(value)
+    names = []
+    for item in value:
+        name = item.get('name') if isinstance(item, dict) else item
+        if not isinstance(name, str):
+            raise ValueError(item)
+        name = name.strip()
+        if len(name) > CATEGORY_NAME_MAX_LENGTH:
+            raise ValueError(name)
+        if name:
+            names.append(name)
+    return list(dict.fromkeys(names))
+
+
+def validate_row(row, now):
+    """Поля задачи и имена категорий или словарь ошибок по полям"""
+    errors = {}
+    title = row.get('title')
+    title = title.strip() if isinstance(title, str) else ''
+    if not title:
+        errors['title'] = 'This field is required'
+    elif len(title) > TITLE_MAX_LENGTH:
+        errors['title'] = f'Ensure this field has no more than {TITLE_MAX_LENGTH} characters'
+
+    description = row.get('description') or ''
+    if not isinstance(description, str):
+        errors['description'] = 'Expected a string'
+
+    try:
+        completed = bool(parse_bool(row.get('completed')))
+    except ValueError:
+        errors['completed'] = 'Expected true or false'
+
+    dates = {}
+    for name in ('due_date', 'created_date'):
+        try:
+            dates[name] = parse_iso_datetime(row.get(name))
+        except ValueError:
+            errors[name] = 'Expected ISO 8601 date or datetime'
+    created_date = dates.get('created_date') or now
+    due_date = dates.get('due_date')
+    if due_date and due_date < created_date:
+        errors['due_date'] = 'Дедлайн не может быть раньше даты создания'
+
+    try:
+        names = category_names_of(row.get('categories'))
+    except ValueError:
+        errors['categories'] = 'Expected category names'
+
+    if errors:
+        return None, errors
+    fields = {
+        'title': title,
+        'description': description,
+        'completed': completed,
+        'due_date': due_date,
+        'created_date': created_date,
+        # Просроченные до импорта задачи не должны разом уйти в уведомления
+        'notified_at': now if due_date and not completed and due_date < now else None,
+    }
+    return (fields, names), None
+
+
+class TaskImporter:
+    """Импорт файла в задачи одного пользователя; report() — итог для API и команды"""
+
+    def __init__(self, user, batch_size=IMPORT_BATCH_SIZE, on_batch=None):
+        self.user = user
+        self.batch_size = batch_size
+        self.on_batch = on_batch
+        # Имя категории -> id на весь импорт: каждое имя ищется в базе один раз
+        self.category_ids = {}
+        self.rows = 0
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+        self.started = None
+        self.elapsed = 0.0
+
+    def run(self, stream, file_format=None):
+        self.started = time.perf_counter()
+        file_format = file_format or detect_format(stream)
+        batch = []
+        stopped = None
+        try:
+            try:
+                for line_number, row in read_rows(stream, file_format):
+                    batch.append((line_number, row))
+                    if len(batch) >= self.batch_size:
+                        self.import_batch(batch)
+                        batch = []
+            except ImportFileError as e:
+                # Прочитанные до ошибки строки импортируются, дальше файл не читается
+                stopped = e
+            if batch:
+                self.import_batch(batch)
+            if stopped is not None:
+                self.add_error(stopped.line_number, {
+                    'file': f'{stopped}: import stopped, {self.created} tasks created from the preceding lines',
+                })
+        finally:
+            self.elapsed = time.perf_counter() - self.started
+            if self.created:
+                # bulk_create не отправляет сигналов
+                bump_task_lists([self.user.pk])
+            self.record_metrics()
+        return self.report()
+
+    def import_batch(self, batch):
+        now = timezone.now()
+        valid = []
+        for line_number, row in batch:
+            result, errors = validate_row(row, now) if isinstance(row, dict) else (None, {'row': row})
+            if errors:
+                self.add_error(line_number, errors)
+            else:
+                valid.append(result)
+
+        missing = {name for fields, names in valid for name in names} - set(self.category_ids)
+        if missing:
+            for category in resolve_categories([], sorted(missing)):
+                self.category_ids[category.name] = category.pk
+
+        tasks = assign_pks([Task(user=self.user, **fields) for fields, names in valid])
+        through = Task.categories.through
+        links = [
+            through(task_id=task.pk, category_id=self.category_ids[name])
+            for task, (fields, names) in zip(tasks, valid)
+            for name in names
+        ]
+        with transaction.atomic():
+            Task.objects.bulk_create(tasks)
+            through.objects.bulk_create(links)
+
+        self.rows += len(batch)
+        self.created += len(tasks)
+        self.elapsed = time.perf_counter() - self.started
+        if self.on_batch is not None:
+            self.on_batch(self)
+
+    def add_error(self, line_number, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line_number, 'errors': errors})
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows / self.elapsed, 1) if self.elapsed else 0.0
+
+    def record_metrics(self):
+        if not settings.PERF_METRICS_ENABLED:
+            return
+        registry.add('todo_task_import_rows_total', '', (('status', 'created'),), self.created)
+        registry.add('todo_task_import_rows_total', '', (('status', 'error'),), self.error_count)
+        registry.add('todo_task_import_seconds_total', '', (), round(self.elapsed * 1_000_000))
+        registry.flush()
+
+    def report(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'elapsed_s': round(self.elapsed, 3),
+            'rows_per_second': self.rows_per_second,
+        }
@@ -0,0 +1,49 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+from tasks.models import Category
+
+
+class Command(BaseCommand):
+    help = 'Задержка типичного короткого запроса с новым соединением на каждый запрос и с постоянным'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--max-ages', type=int, nargs='+', default=[0, 60],
+                            help='Значения CONN_MAX_AGE для сравнения')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'CONN_MAX_AGE':>12} {'p50, ms':>8} {'p95, ms':>8} {'connections':>12}")
+        for max_age in options['max_ages']:
+            self.stdout.write(self.run(max_age, options['requests']))
+
+    def run(self, max_age, requests):
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = max_age
+        opened = []
+
+        def count_connection(**kwargs):
+            opened.append(1)
+
+        connection_created.connect(count_connection)
+        timings = []
+        try:
+            for _ in range(requests):
+                started = time.perf_counter()
+                # Те же сигналы, что gunicorn-воркер Django отправляет вокруг каждого запроса
+                request_started.send(sender=self.__class__)
+                list(Category.objects.values_list('id', 'name')[:20])
+                request_finished.send(sender=self.__class__)
+                timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            connection_created.disconnect(count_connection)
+        timings.sort()
+        return (
+            f'{max_age:>12} {statistics.median(timings):>8.2f} '
+            f'{timings[int(len(timings) * 0.95) - 1]:>8.2f} {len(opened):>12}'
+        )
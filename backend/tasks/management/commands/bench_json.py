@@ -0,0 +1,67 @@
+import io
+import json
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from tasks.renderers import FastJSONParser, FastJSONRenderer, orjson
+
+
+def make_page(count):
+    """Страница списка задач в том виде, в каком ее отдает TaskListSerializer"""
+    now = timezone.now()
+    return {
+        'count': count,
+        'next': 'http://backend:8000/api/tasks/?page=2',
+        'previous': None,
+        'results': [
+            {
+                'id': f'01J{i:023d}',
+                'title': f'Задача номер {i}',
+                'description': 'Подробное описание задачи на русском языке, обрезано ...',
+                'completed': i % 3 == 0,
+                'due_date': (now + timedelta(days=i % 7 - 3)).isoformat(),
+                'created_date': (now - timedelta(minutes=i)).isoformat(),
+                'is_overdue': i % 7 < 3,
+                'categories': [{'id': f'01K{j:023d}', 'name': f'Категория {j}'} for j in range(3)],
+            }
+            for i in range(count)
+        ],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает стандартный json и orjson на странице из 200 задач: рендер в backend и разбор в боте'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stderr.write('orjson не установлен — FastJSONRenderer работает как стандартный JSONRenderer')
+        page = make_page(options['tasks'])
+        body = JSONRenderer().render(page)
+        cases = [
+            ('render: drf json', lambda: JSONRenderer().render(page)),
+            ('render: orjson', lambda: FastJSONRenderer().render(page)),
+            ('parse: drf json', lambda: JSONParser().parse(io.BytesIO(body))),
+            ('parse: orjson', lambda: FastJSONParser().parse(io.BytesIO(body))),
+            # Так разбирал ответы бот до перехода на байты: decode в str, затем json.loads
+            ('bot: text + json', lambda: json.loads(body.decode())),
+            ('bot: bytes + orjson', lambda: orjson.loads(body) if orjson else json.loads(body)),
+        ]
+        self.stdout.write(f'Размер страницы: {len(body)} байт')
+        self.stdout.write(f"{'case':>22} {'median, us':>11}")
+        for name, func in cases:
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                func()
+                timings.append((time.perf_counter() - started) * 1_000_000)
+            self.stdout.write(f'{name:>22} {statistics.median(timings):>11.0f}')
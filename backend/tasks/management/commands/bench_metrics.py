@@ -0,0 +1,59 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from tasks.authentication import get_telegram_user
+from tasks.models import Task
+from tasks.serializers import assign_pks
+
+BENCH_TELEGRAM_ID = 999_999_999_004
+
+
+class Command(BaseCommand):
+    help = 'Накладные расходы PerformanceMiddleware: задержка запросов к API с метриками и без'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--cleanup', action='store_true', help='Удалить засеянные задачи после замера')
+
+    def handle(self, *args, **options):
+        user = get_telegram_user(BENCH_TELEGRAM_ID)
+        if not Task.objects.filter(user=user).exists():
+            Task.objects.bulk_create(assign_pks([
+                Task(title=f'Задача {i}', description='Описание задачи', user=user)
+                for i in range(options['page_size'])
+            ]))
+
+        url = f"/api/tasks/?page_size={options['page_size']}"
+        clients = {enabled: self.make_client(url, enabled) for enabled in (False, True)}
+        self.stdout.write(f"{'запрос':>22} {'без метрик, мкс':>16} {'с метриками, мкс':>17} {'разница, мкс':>13}")
+        # Ответ из кэша — самый короткий запрос, на нем доля накладных расходов максимальна
+        for name, bust_cache in (('из кэша', False), ('с запросами к БД', True)):
+            timings = {False: [], True: []}
+            # Запросы с метриками и без чередуются, чтобы прогрев и фон влияли на оба одинаково
+            for i in range(options['requests'] * 2):
+                enabled = bool(i % 2)
+                request_url = f'{url}&_={time.time_ns()}' if bust_cache else url
+                started = time.perf_counter()
+                response = clients[enabled].get(request_url)
+                timings[enabled].append((time.perf_counter() - started) * 1_000_000)
+                assert response.status_code == 200, response.content[:200]
+            off, on = statistics.median(timings[False]), statistics.median(timings[True])
+            self.stdout.write(f'{name:>22} {off:>16.0f} {on:>17.0f} {on - off:>13.0f}')
+
+        if options['cleanup']:
+            Task.objects.filter(user=user).delete()
+            user.delete()
+
+    def make_client(self, url, enabled):
+        with override_settings(PERF_METRICS_ENABLED=enabled):
+            client = APIClient()
+            client.credentials(HTTP_X_BOT_API_TOKEN=settings.BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID=str(BENCH_TELEGRAM_ID))
+            # Набор middleware клиент собирает при первом запросе и дальше не меняет
+            client.get(url)
+        return client
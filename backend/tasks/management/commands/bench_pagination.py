@@ -0,0 +1,91 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.pagination import Cursor
+from rest_framework.test import APIClient
+
+from tasks.authentication import get_telegram_user
+from tasks.models import Task
+from tasks.pagination import TaskCursorPagination
+
+BENCH_TELEGRAM_ID = 999_999_999_001
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает задержку глубоких страниц /api/tasks/: page-number против cursor'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=100_000, help='Сколько задач засеять')
+        parser.add_argument('--depths', type=int, nargs='+', default=[1, 100, 1000, 4000],
+                            help='Номера страниц для замера')
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--cleanup', action='store_true', help='Удалить засеянные задачи после замера')
+
+    def handle(self, *args, **options):
+        user = self.seed(options['tasks'])
+        client = APIClient()
+        client.credentials(HTTP_X_BOT_API_TOKEN=settings.BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID=str(BENCH_TELEGRAM_ID))
+        page_size = options['page_size']
+        total = Task.objects.filter(user=user).count()
+
+        self.stdout.write(f"{'page':>8} {'page-number, ms':>16} {'cursor, ms':>12}")
+        for depth in options['depths']:
+            offset = (depth - 1) * page_size
+            if offset >= total:
+                continue
+            page_url = f'/api/tasks/?page={depth}&page_size={page_size}'
+            cursor_url = f'/api/tasks/?pagination=cursor&page_size={page_size}'
+            if offset:
+                cursor_url += f'&cursor={self.cursor_at(user, offset)}'
+            self.stdout.write(
+                f'{depth:>8} {self.measure(client, page_url, options["repeat"]):>16.2f} '
+                f'{self.measure(client, cursor_url, options["repeat"]):>12.2f}'
+            )
+
+        if options['cleanup']:
+            Task.objects.filter(user=user).delete()
+            user.delete()
+
+    def seed(self, count, batch_size=5000):
+        user = get_telegram_user(BENCH_TELEGRAM_ID)
+        existing = Task.objects.filter(user=user).count()
+        now = timezone.now()
+        for start in range(existing, count, batch_size):
+            Task.objects.bulk_create([
+                Task(
+                    id=f'bench-{i:09d}',
+                    title=f'Задача {i}',
+                    user=user,
+                    created_date=now - timedelta(seconds=i),
+                )
+                for i in range(start, min(start + batch_size, count))
+            ])
+        if count > existing:
+            self.stdout.write(f'Засеяно задач: {count - existing}')
+        return user
+
+    def cursor_at(self, user, offset):
+        """Курсор, указывающий на задачу с заданным смещением"""
+        created_date = (
+            Task.objects.filter(user=user)
+            .order_by('-created_date', '-id')
+            .values_list('created_date', flat=True)[offset - 1]
+        )
+        paginator = TaskCursorPagination()
+        paginator.base_url = ''
+        # Смещение 0 с позицией предыдущей строки — ровно то, что кладет в next сам DRF
+        return paginator.encode_cursor(Cursor(offset=0, reverse=False, position=str(created_date))).split('cursor=', 1)[1]
+
+    def measure(self, client, url, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200, response.content[:200]
+        return statistics.median(timings)
@@ -0,0 +1,75 @@
+import hashlib
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from tasks.ulid import new_ulid
+
+
+def legacy_pk():
+    """Прежняя схема CustomPKModel.generate_pk — только для сравнения"""
+    timestamp = str(time.time_ns())
+    random_component = hashlib.sha256(timestamp.encode()).hexdigest()[:16]
+    return f"{timestamp}_{random_component}"
+
+
+SCHEMES = {
+    'legacy': legacy_pk,
+    'ulid': new_ulid,
+}
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость вставки и размер индексов для старых ключей и ULID'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200_000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--links', type=int, default=2, help='Строк M2M на одну задачу')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'scheme':>8} {'rows/s':>10} {'collisions':>11} {'pk index':>10} {'fk index':>10} {'key len':>8}"
+        )
+        for name, generate in SCHEMES.items():
+            self.stdout.write(self.run(name, generate, options))
+
+    def run(self, name, generate, options):
+        task_table = f'bench_pk_{name}_task'
+        link_table = f'bench_pk_{name}_link'
+        with connection.cursor() as cursor:
+            # Временные таблицы повторяют схему tasks_task и tasks_task_categories
+            cursor.execute(f'CREATE TEMP TABLE {task_table} (id varchar(50) PRIMARY KEY, title varchar(200))')
+            cursor.execute(
+                f'CREATE TEMP TABLE {link_table} (id serial PRIMARY KEY, task_id varchar(50), category_id varchar(50))'
+            )
+            cursor.execute(f'CREATE INDEX ON {link_table} (task_id)')
+
+            inserted = 0
+            started = time.perf_counter()
+            for start in range(0, options['rows'], options['batch_size']):
+                count = min(options['batch_size'], options['rows'] - start)
+                pks = [generate() for _ in range(count)]
+                cursor.execute(
+                    f'INSERT INTO {task_table} (id, title) VALUES {", ".join(["(%s, %s)"] * count)} '
+                    f'ON CONFLICT DO NOTHING',
+                    [value for pk in pks for value in (pk, 'Задача')],
+                )
+                inserted += cursor.rowcount
+                links = [(pk, f'category-{i}') for pk in pks for i in range(options['links'])]
+                cursor.execute(
+                    f'INSERT INTO {link_table} (task_id, category_id) VALUES {", ".join(["(%s, %s)"] * len(links))}',
+                    [value for link in links for value in link],
+                )
+            elapsed = time.perf_counter() - started
+
+            cursor.execute(f"SELECT pg_relation_size('{task_table}_pkey'), "
+                           f"pg_relation_size('{link_table}_task_id_idx'), avg(length(id)) FROM {task_table}")
+            pk_size, fk_size, key_length = cursor.fetchone()
+            cursor.execute(f'DROP TABLE {link_table}, {task_table}')
+
+        return (
+            f'{name:>8} {options["rows"] / elapsed:>10.0f} {options["rows"] - inserted:>11} '
+            f'{pk_size / 2**20:>8.1f}MB {fk_size / 2**20:>8.1f}MB {float(key_length):>8.1f}'
+        )
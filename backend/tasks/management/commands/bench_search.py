@@ -0,0 +1,78 @@
+import random
+import statistics
+import time
+
+from django.contrib.postgres.search import SearchRank
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from tasks.authentication import get_telegram_user
+from tasks.models import Task, search_query
+
+BENCH_TELEGRAM_ID = 999_999_999_003
+WORDS = (
+    'отчет', 'встреча', 'звонок', 'бюджет', 'договор', 'презентация', 'клиент', 'проект',
+    'ремонт', 'покупка', 'молоко', 'врач', 'билеты', 'отпуск', 'налоги', 'квартира',
+    'машина', 'страховка', 'школа', 'экзамен', 'курс', 'книга', 'подарок', 'собрание',
+    'сервер', 'релиз', 'ошибка', 'тесты', 'документация', 'дизайн', 'макет', 'счет',
+)
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает поиск задач icontains по title/description с полнотекстовым поиском по GIN-индексу'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=200_000, help='Сколько задач засеять')
+        parser.add_argument('--queries', nargs='+', default=['отчеты', 'договор клиента', 'страховка машины'])
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--cleanup', action='store_true', help='Удалить засеянные задачи после замера')
+
+    def handle(self, *args, **options):
+        user = self.seed(options['tasks'])
+        tasks = Task.objects.filter(user=user)
+
+        self.stdout.write(f"{'запрос':>20} {'icontains, ms':>14} {'FTS, ms':>9} {'найдено':>9}")
+        for text in options['queries']:
+            # Так искала админка: каждое слово в каждом поле, без учета словоформ
+            contains = Q()
+            for word in text.split():
+                contains &= Q(title__icontains=word) | Q(description__icontains=word)
+            query = search_query(text)
+            ranked = (tasks.filter(search_vector=query)
+                      .annotate(rank=SearchRank(F('search_vector'), query))
+                      .order_by('-rank', '-created_date'))
+            self.stdout.write(
+                f'{text:>20} {self.measure(tasks.filter(contains).order_by("-created_date"), options["repeat"]):>14.2f} '
+                f'{self.measure(ranked, options["repeat"]):>9.2f} {ranked.count():>9}'
+            )
+
+        if options['cleanup']:
+            tasks.delete()
+            user.delete()
+
+    def seed(self, count, batch_size=5000):
+        user = get_telegram_user(BENCH_TELEGRAM_ID)
+        existing = Task.objects.filter(user=user).count()
+        rng = random.Random(existing)
+        for start in range(existing, count, batch_size):
+            # Вектор заполняет триггер в базе
+            Task.objects.bulk_create([
+                Task(
+                    id=f'search-{i:09d}',
+                    title=' '.join(rng.sample(WORDS, 3)).capitalize(),
+                    description=' '.join(rng.choices(WORDS, k=8)),
+                    user=user,
+                )
+                for i in range(start, min(start + batch_size, count))
+            ])
+        if count > existing:
+            self.stdout.write(f'Засеяно задач: {count - existing}')
+        return user
+
+    def measure(self, queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(queryset.values_list('id', flat=True)[:20])
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
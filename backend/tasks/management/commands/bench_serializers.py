@@ -0,0 +1,77 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from tasks.authentication import get_telegram_user
+from tasks.models import Category, Task
+from tasks.serializers import TaskListSerializer, TaskSerializer
+from tasks.views import TaskViewSet
+
+BENCH_TELEGRAM_ID = 999_999_999_002
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает время сериализации и размер страницы списка задач: полный сериализатор против облегченного'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--fields', default='', help='Как ?fields= для облегченного сериализатора')
+        parser.add_argument('--cleanup', action='store_true', help='Удалить засеянные задачи после замера')
+
+    def handle(self, *args, **options):
+        user = self.seed(options['page_size'])
+        view = TaskViewSet(action='list', format_kwarg=None)
+        view.request = Request(RequestFactory().get('/api/tasks/', {'fields': options['fields']}))
+        view.request.user = user
+
+        fields = view.get_list_fields()
+        full = list(Task.objects.filter(user=user).prefetch_related('categories'))
+        slim = list(view.get_list_queryset(fields))
+
+        self.stdout.write(f"{'serializer':>12} {'ms/page':>9} {'bytes/page':>11}")
+        for name, serializer, tasks in (
+            ('full', lambda tasks: TaskSerializer(tasks, many=True), full),
+            ('slim', lambda tasks: TaskListSerializer(tasks, many=True, context={'fields': fields}), slim),
+        ):
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                payload = JSONRenderer().render(serializer(tasks).data)
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(f'{name:>12} {statistics.median(timings):>9.2f} {len(payload):>11}')
+
+        if options['cleanup']:
+            Task.objects.filter(user=user).delete()
+            Category.objects.filter(name__startswith='Бенчмарк ').delete()
+            user.delete()
+
+    def seed(self, count):
+        user = get_telegram_user(BENCH_TELEGRAM_ID)
+        existing = Task.objects.filter(user=user).count()
+        if existing >= count:
+            return user
+        categories = [Category.objects.get_or_create(name=f'Бенчмарк {i}')[0] for i in range(3)]
+        now = timezone.now()
+        tasks = Task.objects.bulk_create([
+            Task(
+                id=f'bench-ser-{i:06d}',
+                title=f'Задача {i}',
+                description='Подробное описание задачи. ' * 10,
+                user=user,
+                created_date=now - timedelta(seconds=i),
+                due_date=now + timedelta(days=i % 7 - 3),
+            )
+            for i in range(existing, count)
+        ])
+        Through = Task.categories.through
+        Through.objects.bulk_create([
+            Through(task_id=task.id, category_id=category.id) for task in tasks for category in categories
+        ])
+        return user
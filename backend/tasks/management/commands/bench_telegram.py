@@ -0,0 +1,28 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tasks.telegram import TelegramSender
+
+
+class Command(BaseCommand):
+    help = 'Замеряет пропускную способность отправки уведомлений через Bot API (или локальную заглушку)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default=settings.TELEGRAM_API_URL, help='Адрес Bot API')
+        parser.add_argument('--token', default=settings.TELEGRAM_BOT_TOKEN or 'TEST')
+        parser.add_argument('--messages', type=int, default=300)
+        parser.add_argument('--chats', type=int, default=100)
+
+    def handle(self, *args, **options):
+        sender = TelegramSender(options['token'], api_url=options['url'])
+        delivered = 0
+        started = time.perf_counter()
+        for i in range(options['messages']):
+            delivered += sender.send_message(i % options['chats'] + 1, f'Сообщение {i}')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Отправлено {delivered}/{options['messages']} за {elapsed:.2f} с "
+            f"({delivered / elapsed:.1f} сообщений/с, лимит {sender.global_bucket.rate:g}/с)"
+        )
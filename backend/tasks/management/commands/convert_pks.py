@@ -0,0 +1,88 @@
+import re
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from tasks.cache import bump_categories
+from tasks.models import Category, Task
+from tasks.ulid import ALPHABET, RANDOM_BITS, encode, new_ulid
+
+ULID_REGEX = f'^[{ALPHABET}]{{26}}$'
+LEGACY_PK = re.compile(r'^(\d+)_([0-9a-f]{16})$')
+
+
+def legacy_to_ulid(pk):
+    """Переводит ключ вида <time_ns>_<sha256[:16]> в ULID с тем же временем.
+
+    Доли миллисекунды идут в старшие биты случайной части, поэтому порядок
+    старых ключей сохраняется. Ключи другого вида получают новый ULID.
+    """
+    match = LEGACY_PK.match(pk)
+    if match is None:
+        return new_ulid()
+    ns = int(match.group(1))
+    ms, sub_ms = divmod(ns, 1_000_000)
+    random = (sub_ms << (RANDOM_BITS - 20)) | (int(match.group(2), 16) >> 4)
+    return encode(ms, random)
+
+
+def referencing_columns(model):
+    """Таблицы и столбцы, ссылающиеся на первичный ключ модели, включая M2M"""
+    return [
+        (field.related_model._meta.db_table, field.field.column)
+        for field in model._meta.get_fields(include_hidden=True)
+        if field.auto_created and not field.concrete and (field.one_to_many or field.one_to_one)
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Переводит первичные ключи задач и категорий в ULID небольшими транзакциями'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0.1,
+                            help='Пауза между пачками, чтобы не мешать рабочей нагрузке')
+
+    def handle(self, *args, **options):
+        for model in (Category, Task):
+            converted = 0
+            # Keyset по первичному ключу: каждая пачка продолжает индекс с последнего
+            # старого ключа, а не просматривает заново уже переведенные строки
+            last_pk = ''
+            while True:
+                pks = list(
+                    model.objects.filter(id__gt=last_pk)
+                    .exclude(id__regex=ULID_REGEX)
+                    .order_by('id')
+                    .values_list('id', flat=True)[:options['batch_size']]
+                )
+                if not pks:
+                    break
+                last_pk = pks[-1]
+                self.convert_batch(model, {pk: legacy_to_ulid(pk) for pk in pks})
+                converted += len(pks)
+                self.stdout.write(f'{model._meta.verbose_name_plural}: {converted}')
+                time.sleep(options['sleep'])
+            self.stdout.write(self.style.SUCCESS(f'{model._meta.verbose_name_plural}: переведено {converted}'))
+
+    def convert_batch(self, model, mapping):
+        """Меняет ключи пачки и все ссылки на них в одной транзакции.
+
+        Внешние ключи Django в PostgreSQL — DEFERRABLE INITIALLY DEFERRED,
+        поэтому проверяются только при коммите, когда обе стороны уже обновлены.
+        """
+        values = ', '.join(['(%s, %s)'] * len(mapping))
+        params = [value for pair in mapping.items() for value in pair]
+        tables = [(model._meta.db_table, model._meta.pk.column)] + referencing_columns(model)
+        quote = connection.ops.quote_name
+        with transaction.atomic(), connection.cursor() as cursor:
+            for table, column in tables:
+                table, column = quote(table), quote(column)
+                cursor.execute(
+                    f'UPDATE {table} AS t SET {column} = m.new '
+                    f'FROM (VALUES {values}) AS m(old, new) WHERE t.{column} = m.old',
+                    params,
+                )
+        # Ключи меняются в обход ORM; версия категорий входит во все закэшированные списки
+        bump_categories()
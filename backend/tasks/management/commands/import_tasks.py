@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.authentication import get_telegram_user
+from tasks.importer import IMPORT_BATCH_SIZE, TaskImporter
+
+# Сколько ошибок с номерами строк выводить после импорта
+PRINT_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = ('Массовый импорт задач пользователя из CSV или NDJSON в формате выгрузки '
+            '(GET /api/tasks/export/): пачки bulk_create, ошибочные строки пропускаются')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл CSV или NDJSON')
+        parser.add_argument('--telegram-id', type=int, required=True, help='Владелец задач')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='По умолчанию — по первому символу файла')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        user = get_telegram_user(options['telegram_id'])
+        importer = TaskImporter(user, batch_size=options['batch_size'], on_batch=self.progress)
+        try:
+            with open(options['path'], 'rb') as f:
+                report = importer.run(f, options['format'])
+        except OSError as e:
+            raise CommandError(e)
+
+        self.stdout.write(
+            f"Строк: {report['rows']}, создано задач: {report['created']}, ошибок: {report['error_count']} "
+            f"за {report['elapsed_s']} с ({report['rows_per_second']} строк/с)"
+        )
+        for error in report['errors'][:PRINT_ERRORS]:
+            self.stdout.write(f"  строка {error['line']}: {error['errors']}")
+        if report['error_count'] > PRINT_ERRORS:
+            self.stdout.write(f"  ... и еще {report['error_count'] - PRINT_ERRORS}")
+
+    def progress(self, importer):
+        self.stdout.write(f'  {importer.rows} строк, {importer.error_count} ошибок, {importer.rows_per_second} строк/с')
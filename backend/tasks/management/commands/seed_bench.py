@@ -0,0 +1,109 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from tasks.cache import bump_categories, bump_task_lists
+from tasks.models import Category, Task, TelegramProfile
+from tasks.serializers import assign_pks
+
+# Пользователи стенда: BENCH_TELEGRAM_ID, BENCH_TELEGRAM_ID + 1, ... — их же берет bot/bench_suite.py
+BENCH_TELEGRAM_ID = 999_999_000_000
+CATEGORY_PREFIX = 'Бенчмарк'
+WORDS = (
+    'отчет', 'встреча', 'звонок', 'бюджет', 'договор', 'презентация', 'клиент', 'проект',
+    'ремонт', 'покупка', 'врач', 'билеты', 'отпуск', 'налоги', 'страховка', 'релиз',
+)
+
+
+class Command(BaseCommand):
+    help = ('Засевает базу для нагрузочного теста: пользователи × задачи × категории пачками bulk_create. '
+            'Повторный запуск досеивает недостающее')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--tasks', type=int, default=1000, help='Задач на пользователя')
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--categories-per-task', type=int, default=2, help='Не больше стольких категорий у задачи')
+        parser.add_argument('--seed', type=int, default=0, help='Зерно генератора: одинаковые данные при одинаковых параметрах')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--cleanup', action='store_true', help='Удалить данные стенда вместо засева')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            self.cleanup()
+            return
+
+        categories = self.seed_categories(options['categories'])
+        users = self.seed_users(options['users'])
+        created = 0
+        for index, user in enumerate(users):
+            created += self.seed_tasks(user, index, categories, options)
+        bump_task_lists(user.pk for user in users)
+        self.stdout.write(
+            f'Пользователей: {len(users)} (Telegram ID {BENCH_TELEGRAM_ID}..{BENCH_TELEGRAM_ID + len(users) - 1}), '
+            f'категорий: {len(categories)}, новых задач: {created}'
+        )
+
+    def seed_categories(self, count):
+        names = [f'{CATEGORY_PREFIX} {i}' for i in range(1, count + 1)]
+        existing = set(Category.objects.filter(name__in=names).values_list('name', flat=True))
+        missing = [Category(name=name) for name in names if name not in existing]
+        if missing:
+            Category.objects.bulk_create(assign_pks(missing), ignore_conflicts=True)
+            bump_categories()
+        return list(Category.objects.filter(name__in=names).order_by('name'))
+
+    def seed_users(self, count):
+        telegram_ids = range(BENCH_TELEGRAM_ID, BENCH_TELEGRAM_ID + count)
+        with transaction.atomic():
+            existing = set(TelegramProfile.objects.filter(telegram_id__in=telegram_ids).values_list('telegram_id', flat=True))
+            missing = [telegram_id for telegram_id in telegram_ids if telegram_id not in existing]
+            # Имена как у get_telegram_user, чтобы backend узнал пользователей по заголовку
+            users = User.objects.bulk_create([User(username=f'tg_{telegram_id}') for telegram_id in missing])
+            TelegramProfile.objects.bulk_create([
+                TelegramProfile(user=user, telegram_id=telegram_id) for user, telegram_id in zip(users, missing)
+            ])
+        profiles = TelegramProfile.objects.filter(telegram_id__in=telegram_ids).select_related('user').order_by('telegram_id')
+        return [profile.user for profile in profiles]
+
+    def seed_tasks(self, user, index, categories, options):
+        existing = Task.objects.filter(user=user).count()
+        count = options['tasks']
+        now = timezone.now()
+        through = Task.categories.through
+        for start in range(existing, count, options['batch_size']):
+            rng = random.Random(f"{options['seed']}:{index}:{start}")
+            tasks = []
+            for i in range(start, min(start + options['batch_size'], count)):
+                created_date = now - timedelta(minutes=rng.randrange(365 * 24 * 60))
+                has_due_date = rng.random() < 0.5
+                tasks.append(Task(
+                    title=' '.join(rng.sample(WORDS, 3)).capitalize(),
+                    description=' '.join(rng.choices(WORDS, k=rng.randrange(0, 12))),
+                    # Примерно треть выполнена, часть открытых задач просрочена
+                    completed=rng.random() < 0.3,
+                    due_date=created_date + timedelta(days=rng.randrange(1, 60)) if has_due_date else None,
+                    created_date=created_date,
+                    user=user,
+                ))
+            with transaction.atomic():
+                Task.objects.bulk_create(assign_pks(tasks))
+                if categories and options['categories_per_task']:
+                    through.objects.bulk_create([
+                        through(task_id=task.pk, category_id=category.pk)
+                        for task in tasks
+                        for category in rng.sample(categories, rng.randint(0, min(options['categories_per_task'], len(categories))))
+                    ])
+        return max(count - existing, 0)
+
+    def cleanup(self):
+        profiles = TelegramProfile.objects.filter(telegram_id__gte=BENCH_TELEGRAM_ID, telegram_id__lt=BENCH_TELEGRAM_ID + 1_000_000)
+        user_ids = list(profiles.values_list('user_id', flat=True))
+        _, deleted = Task.objects.filter(user_id__in=user_ids).delete()
+        User.objects.filter(pk__in=user_ids).delete()
+        Category.objects.filter(name__startswith=f'{CATEGORY_PREFIX} ').delete()
+        self.stdout.write(f"Удалено пользователей: {len(user_ids)}, задач: {deleted.get('tasks.Task', 0)}")
@@ -0,0 +1,297 @@
+"""Метрики производительности запросов backend.
+
+PerformanceMiddleware меряет для каждого запроса общее время, число и время
+SQL-запросов и время сериализации, пишет в лог медленные запросы и
+повторяющиеся SQL (N+1). Измерения копятся в памяти процесса, а фоновый
+поток раз в PERF_METRICS_FLUSH_INTERVAL секунд прибавляет их к счетчикам
+в кэше — общим для всех воркеров, как и статистика кэша списков. GET /metrics
+отдает счетчики в текстовом формате Prometheus.
+
+В самом запросе остаются только perf_counter и словари; сколько это стоит,
+показывает команда bench_metrics. При PERF_METRICS_ENABLED=False middleware
+отключается целиком.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+# Семейства метрик: тип и описание для /metrics
+FAMILIES = {
+    'todo_http_requests_total': ('counter', 'Запросы по представлению, методу и статусу'),
+    'todo_http_request_duration_seconds': ('histogram', 'Время обработки запроса'),
+    'todo_http_request_db_queries': ('histogram', 'Число SQL-запросов на HTTP-запрос'),
+    'todo_http_request_db_seconds_total': ('counter', 'Суммарное время SQL-запросов'),
+    'todo_http_request_serialize_seconds_total': ('counter', 'Суммарное время сериализации и рендера JSON'),
+    'todo_task_import_rows_total': ('counter', 'Строки массового импорта задач: созданные и с ошибками'),
+    'todo_task_import_seconds_total': ('counter', 'Суммарное время массового импорта задач'),
+}
+# Секунды хранятся в кэше целыми микросекундами: incr работает только с целыми
+SECONDS_SUFFIXES = {
+    ('todo_http_request_duration_seconds', '_sum'),
+    ('todo_http_request_db_seconds_total', ''),
+    ('todo_http_request_serialize_seconds_total', ''),
+    ('todo_task_import_seconds_total', ''),
+}
+SERIES_KEY = 'metrics:series'
+# Метод попадает в метку, поэтому произвольные значения от клиентов сводятся к other
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+# Сколько разных SQL запоминается за один запрос для отчета о медленных запросах и N+1
+MAX_STATEMENTS = 200
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('queries', 'db_time', 'serialize_time', 'serializing', 'statements')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.serializing = False
+        # SQL с плейсхолдерами -> [сколько раз, суммарное время]
+        self.statements = {}
+
+    def record_query(self, sql, duration):
+        self.queries += 1
+        self.db_time += duration
+        stats = self.statements.get(sql)
+        if stats is None:
+            if len(self.statements) >= MAX_STATEMENTS:
+                return
+            stats = self.statements[sql] = [0, 0.0]
+        stats[0] += 1
+        stats[1] += duration
+
+
+def query_wrapper(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record_query(sql, time.perf_counter() - started)
+
+
+def install_query_wrapper(sender=None, connection=None, **kwargs):
+    # Обертка ставится на каждое соединение, и на открытое в потоке sync_to_async тоже
+    if query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_wrapper)
+
+
+class measure_serialization:
+    """Время сериализации текущего запроса без SQL, выполненного внутри"""
+    __slots__ = ('metrics', 'started', 'db_time')
+
+    def __enter__(self):
+        metrics = _current.get()
+        # Вложенные сериализаторы уже учтены внешним
+        self.metrics = metrics if metrics is not None and not metrics.serializing else None
+        if self.metrics is not None:
+            self.metrics.serializing = True
+            self.db_time = self.metrics.db_time
+            self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        if self.metrics is not None:
+            self.metrics.serializing = False
+            elapsed = time.perf_counter() - self.started
+            self.metrics.serialize_time += elapsed - (self.metrics.db_time - self.db_time)
+
+
+class TimedSerializerMixin:
+    def to_representation(self, instance):
+        with measure_serialization():
+            return super().to_representation(instance)
+
+
+def series_key(series):
+    return 'metrics:' + hashlib.md5(repr(series).encode()).hexdigest()
+
+
+class Registry:
+    """Приращения метрик процесса, которые еще не попали в кэш"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = defaultdict(int)
+        self.pid = None
+
+    def add(self, family, suffix, labels, value):
+        with self.lock:
+            self.pending[family, suffix, labels] += value
+
+    def observe(self, family, labels, value, buckets):
+        scale = 1_000_000 if (family, '_sum') in SECONDS_SUFFIXES else 1
+        with self.lock:
+            for bound in buckets:
+                if value <= bound:
+                    self.pending[family, '_bucket', labels + (('le', str(bound)),)] += 1
+            self.pending[family, '_bucket', labels + (('le', '+Inf'),)] += 1
+            self.pending[family, '_sum', labels] += round(value * scale)
+            self.pending[family, '_count', labels] += 1
+
+    def start_flusher(self):
+        """Поток сброса в кэш; после fork воркера gunicorn запускается заново"""
+        if self.pid == os.getpid() or settings.PERF_METRICS_FLUSH_INTERVAL <= 0:
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+        threading.Thread(target=self.run_flusher, name='metrics-flush', daemon=True).start()
+
+    def run_flusher(self):
+        while True:
+            time.sleep(settings.PERF_METRICS_FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, defaultdict(int)
+        if not pending:
+            return
+        try:
+            for series, value in pending.items():
+                key = series_key(series)
+                if not cache.add(key, value, timeout=None):
+                    cache.incr(key, value)
+            # Список серий обновляется без блокировки: серия, потерянная при гонке
+            # двух воркеров, вернется в него со следующим сбросом, где она есть
+            known = cache.get(SERIES_KEY) or set()
+            if not known.issuperset(pending):
+                cache.set(SERIES_KEY, known | set(pending), timeout=None)
+        except Exception:
+            logger.warning('Не удалось сохранить метрики', exc_info=True)
+
+
+registry = Registry()
+
+
+def view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    # Имя маршрута вроде task-list; у маршрутов без имени — шаблон пути
+    return match.view_name if match.url_name else match.route
+
+
+def record_request(request, response, metrics, duration):
+    view = view_label(request)
+    method = request.method if request.method in METHODS else 'other'
+    labels = (('view', view), ('method', method))
+    registry.add('todo_http_requests_total', '', labels + (('status', str(response.status_code)),), 1)
+    registry.observe('todo_http_request_duration_seconds', labels, duration, DURATION_BUCKETS)
+    registry.observe('todo_http_request_db_queries', labels, metrics.queries, QUERY_COUNT_BUCKETS)
+    registry.add('todo_http_request_db_seconds_total', '', labels, round(metrics.db_time * 1_000_000))
+    registry.add('todo_http_request_serialize_seconds_total', '', labels, round(metrics.serialize_time * 1_000_000))
+
+    repeated = [(sql, stats) for sql, stats in metrics.statements.items() if stats[0] >= settings.PERF_N_PLUS_ONE_THRESHOLD]
+    for sql, (count, total) in repeated:
+        logger.warning('Возможный N+1 в %s %s (%s): запрос выполнен %d раз за %.1f мс: %s',
+                       request.method, request.path, view, count, total * 1000, sql)
+    if duration * 1000 >= settings.PERF_SLOW_REQUEST_MS:
+        slowest = sorted(metrics.statements.items(), key=lambda item: item[1][1], reverse=True)[:3]
+        logger.warning(
+            'Медленный запрос %s %s (%s): %.1f мс, SQL: %d запросов за %.1f мс, сериализация %.1f мс%s',
+            request.method, request.path, view, duration * 1000, metrics.queries, metrics.db_time * 1000,
+            metrics.serialize_time * 1000,
+            ''.join(f'\n  {count} x {total * 1000:.1f} мс: {sql}' for sql, (count, total) in slowest),
+        )
+
+    if settings.PERF_METRICS_FLUSH_INTERVAL <= 0:
+        registry.flush()
+    else:
+        registry.start_flusher()
+
+
+class PerformanceMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PERF_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        connection_created.connect(install_query_wrapper)
+        for connection in connections.all(initialized_only=True):
+            install_query_wrapper(connection=connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        record_request(request, response, metrics, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        record_request(request, response, metrics, time.perf_counter() - started)
+        return response
+
+
+def format_labels(labels):
+    return '{%s}' % ','.join('%s="%s"' % (name, value.replace('\\', '\\\\').replace('"', '\\"')) for name, value in labels)
+
+
+def render_metrics():
+    registry.flush()
+    series = sorted(
+        cache.get(SERIES_KEY) or (),
+        # le по возрастанию, +Inf последним
+        key=lambda s: (s[0], s[2][:-1] if s[1] == '_bucket' else s[2], s[1],
+                       float(s[2][-1][1]) if s[1] == '_bucket' else 0),
+    )
+    values = cache.get_many([series_key(s) for s in series])
+    lines = []
+    family = None
+    for s in series:
+        value = values.get(series_key(s))
+        if value is None:
+            continue
+        if s[0] != family:
+            family = s[0]
+            kind, help_text = FAMILIES.get(family, ('untyped', ''))
+            lines += [f'# HELP {family} {help_text}', f'# TYPE {family} {kind}']
+        if (s[0], s[1]) in SECONDS_SUFFIXES:
+            value = value / 1_000_000
+        lines.append(f'{s[0]}{s[1]}{format_labels(s[2])} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Метрики всех воркеров backend в текстовом формате Prometheus"""
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
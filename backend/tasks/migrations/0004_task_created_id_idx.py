@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_alter_category_options_alter_task_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['-created_date', '-id'], name='task_created_id_idx'),
+        ),
+    ]
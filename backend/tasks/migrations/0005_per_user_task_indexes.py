@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('tasks', '0004_task_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelegramProfile',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='telegram', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('telegram_id', models.BigIntegerField(unique=True, verbose_name='Telegram ID')),
+            ],
+            options={
+                'verbose_name': 'Профиль Telegram',
+                'verbose_name_plural': 'Профили Telegram',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', '-created_date', '-id'], name='task_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'completed', 'due_date'], name='task_user_due_idx'),
+        ),
+        # Одиночный индекс по user удаляется после создания составных
+        migrations.AlterField(
+            model_name='task',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+    ]
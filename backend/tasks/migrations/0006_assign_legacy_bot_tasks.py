@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def link_legacy_bot_user(apps, schema_editor):
+    """Привязывает общие задачи старого бота к Telegram-аккаунту владельца.
+
+    Раньше все задачи записывались на telegram_bot_user. Если задан
+    TELEGRAM_LEGACY_OWNER_ID, этот пользователь связывается с указанным
+    Telegram ID, и его задачи становятся задачами владельца без переписывания строк.
+    """
+    telegram_id = getattr(settings, 'TELEGRAM_LEGACY_OWNER_ID', None)
+    if not telegram_id:
+        return
+
+    User = apps.get_model('auth', 'User')
+    TelegramProfile = apps.get_model('tasks', 'TelegramProfile')
+
+    legacy_user = User.objects.filter(username='telegram_bot_user').first()
+    if legacy_user is None or TelegramProfile.objects.filter(telegram_id=int(telegram_id)).exists():
+        return
+    TelegramProfile.objects.create(user=legacy_user, telegram_id=int(telegram_id))
+
+
+def unlink_legacy_bot_user(apps, schema_editor):
+    TelegramProfile = apps.get_model('tasks', 'TelegramProfile')
+    TelegramProfile.objects.filter(user__username='telegram_bot_user').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0005_per_user_task_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_legacy_bot_user, unlink_legacy_bot_user),
+    ]
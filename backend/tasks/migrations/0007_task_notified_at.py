@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0006_assign_legacy_bot_tasks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='notified_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Уведомление отправлено'),
+        ),
+    ]
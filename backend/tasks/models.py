@@ -1,19 +1,33 @@
-import hashlib
-import time
 from django.db import models
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchQuery, SearchVectorField
+from django.db.models import Q
+from django.db.models.functions import Lower
 from django.utils import timezone
+from .ulid import new_ulid
+
+# Конфигурация полнотекстового поиска: стемминг и стоп-слова для русских названий
+SEARCH_CONFIG = 'russian'
+
+
+def search_query(text):
+    """Запрос в синтаксисе поисковиков: слова, "фраза", -исключение, or"""
+    return SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
 
 class CustomPKModel(models.Model):
     class Meta:
         abstract = True
 
     def generate_pk(self):
-        """Не статический метод, а обычный метод экземпляра"""
-        timestamp = str(time.time_ns())
-        random_component = hashlib.sha256(timestamp.encode()).hexdigest()[:16]
-        return f"{timestamp}_{random_component}"
+        """Не статический метод, а обычный метод экземпляра.
+
+        ULID: 26 символов, сортируется по времени создания и не повторяется
+        между процессами. Старые ключи вида <time_ns>_<sha256> переводятся
+        командой convert_pks.
+        """
+        return new_ulid()
 
     def save(self, *args, **kwargs):
         """Переопределяем save для генерации ID перед сохранением"""
@@ -36,6 +50,10 @@ class Category(CustomPKModel):
     
     class Meta:
         ordering = ['name']
+        indexes = [
+            # Регистронезависимый поиск категорий по имени
+            models.Index(Lower('name'), name='category_name_lower_idx'),
+        ]
         verbose_name = 'Категория'
         verbose_name_plural = 'Категории'
 
@@ -45,8 +63,14 @@ class Task(CustomPKModel):
     completed = models.BooleanField(default=False, verbose_name='Выполнено')
     due_date = models.DateTimeField(null=True, blank=True, verbose_name='Дедлайн')
     created_date = models.DateTimeField(default=timezone.now, verbose_name='Дата создания')
-    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Пользователь')
+    # Когда задача была поставлена в очередь уведомлений о просрочке
+    notified_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='Уведомление отправлено')
+    # Отдельный индекс по user не нужен: user — первый столбец составных индексов ниже
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False, verbose_name='Пользователь')
     categories = models.ManyToManyField(Category, blank=True, verbose_name='Категории')
+    # Название (вес A) и описание (вес B) для полнотекстового поиска. Заполняет триггер
+    # в базе (миграция 0009), поэтому вектор актуален и после bulk_create/bulk_update
+    search_vector = SearchVectorField(null=True, editable=False)
     
     def clean(self):
         """Валидация дат"""
@@ -73,5 +97,37 @@ class Task(CustomPKModel):
     
     class Meta:
         ordering = ['-created_date']
+        indexes = [
+            # Для сортировки по умолчанию и cursor-пагинации
+            models.Index(fields=['-created_date', '-id'], name='task_created_id_idx'),
+            # Список задач пользователя
+            models.Index(fields=['user', '-created_date', '-id'], name='task_user_created_idx'),
+            # Открытые задачи пользователя по дедлайну: фильтры overdue/due_before/due_after,
+            # сортировка по due_date. Выполненные задачи в индекс не попадают
+            models.Index(fields=['user', 'due_date'], condition=Q(completed=False), name='task_open_due_idx'),
+            # Для check_due_tasks: только задачи, о которых еще не уведомляли
+            models.Index(fields=['due_date'], condition=Q(completed=False, notified_at__isnull=True),
+                         name='task_due_unnotified_idx'),
+            # Полнотекстовый поиск; с фильтром по пользователю сочетается с индексами выше
+            GinIndex(fields=['search_vector'], name='task_search_idx'),
+        ]
         verbose_name = 'Задача'
-        verbose_name_plural = 'Задачи'
\ No newline at end of file
+        verbose_name_plural = 'Задачи'
+
+class TelegramProfile(models.Model):
+    """Связь пользователя Django с аккаунтом Telegram"""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='telegram',
+        verbose_name='Пользователь'
+    )
+    telegram_id = models.BigIntegerField(unique=True, verbose_name='Telegram ID')
+
+    def __str__(self):
+        return f'{self.user} ({self.telegram_id})'
+
+    class Meta:
+        verbose_name = 'Профиль Telegram'
+        verbose_name_plural = 'Профили Telegram'
@@ -0,0 +1,13 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class TaskPagination(PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class TaskCursorPagination(CursorPagination):
+    """Keyset-пагинация: без OFFSET и COUNT(*), опирается на индекс (-created_date, -id)"""
+    ordering = ('-created_date', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 500
@@ -0,0 +1,64 @@
+"""JSON для REST API через orjson, если он установлен.
+
+Вывод совпадает с JSONRenderer из DRF: даты, Decimal и прочие типы,
+которые orjson не знает или пишет иначе, кодирует тот же JSONEncoder DRF.
+Без orjson классы ведут себя ровно как стандартные.
+"""
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from .metrics import measure_serialization
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    # Даты отдаем кодировщику DRF: он пишет UTC как 'Z', orjson — как '+00:00'
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with measure_serialization():
+            return self.encode(data, accepted_media_type, renderer_context)
+
+    def encode(self, data, accepted_media_type, renderer_context):
+        # orjson не умеет произвольный отступ и экранирование не-ASCII — это случаи стандартного рендерера
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # Например, целые длиннее 64 бит
+            return super().render(data, accepted_media_type, renderer_context)
+        # Как и DRF, экранируем U+2028 и U+2029, чтобы ответ оставался валидным JavaScript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        if orjson is None or not self.strict or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class NDJSONRenderer(FastJSONRenderer):
+    """Формат выгрузки задач: поток пишет tasks.export, рендерер нужен для выбора
+    формата по ?format= или Accept и для ответов с ошибкой, которые остаются JSON"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class CSVRenderer(FastJSONRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
@@ -1,14 +1,51 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from .cache import bump_categories
+from .metrics import TimedSerializerMixin
 from .models import Task, Category
 from django.utils import timezone
 
-class CategorySerializer(serializers.ModelSerializer):
+def assign_pks(objects):
+    """Заполняет id перед bulk_create, где save() не вызывается"""
+    for obj in objects:
+        obj.pk = obj.generate_pk()
+    return objects
+
+def resolve_categories(category_ids, category_names):
+    """Находит категории по id и именам одним запросом, недостающие имена создает одним INSERT.
+
+    Параллельное создание одной и той же категории безопасно: конфликт по
+    уникальному имени игнорируется, и категория перечитывается из базы.
+    """
+    category_names = list(dict.fromkeys(category_names))
+    if not category_ids and not category_names:
+        return []
+
+    categories = list(Category.objects.filter(Q(id__in=category_ids) | Q(name__in=category_names)))
+    found_names = {category.name for category in categories}
+    missing = [name for name in category_names if name not in found_names]
+    if not missing:
+        return categories
+
+    new_categories = assign_pks([Category(name=name) for name in missing])
+    Category.objects.bulk_create(new_categories, ignore_conflicts=True)
+    bump_categories()
+
+    created = list(Category.objects.filter(name__in=missing))
+    categories.extend(created)
+    # Страховка на случай, если строку отбросил конфликт не по имени
+    for name in set(missing) - {category.name for category in created}:
+        categories.append(Category.objects.get_or_create(name=name)[0])
+    return categories
+
+class CategorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = '__all__'
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     categories = CategorySerializer(many=True, read_only=True)
     category_ids = serializers.ListField(
         child=serializers.CharField(), 
@@ -28,7 +65,7 @@ class TaskSerializer(serializers.ModelSerializer):
         model = Task
         fields = '__all__'
         extra_kwargs = {
-            'user': {'required': False}
+            'user': {'read_only': True}
         }
     
     def validate_due_date(self, value):
@@ -37,6 +74,7 @@ class TaskSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Дедлайн не может быть в прошлом")
         return value
     
+    @transaction.atomic
     def create(self, validated_data):
         category_ids = validated_data.pop('category_ids', [])
         category_names = validated_data.pop('category_names', [])
@@ -46,49 +84,65 @@ class TaskSerializer(serializers.ModelSerializer):
         
         task = Task.objects.create(**validated_data)
         
-        # Обрабатываем категории по ID
-        if category_ids:
-            categories = Category.objects.filter(id__in=category_ids)
-            task.categories.set(categories)
-        
-        # Обрабатываем категории по именам
-        if category_names:
-            categories = []
-            for category_name in category_names:
-                category, created = Category.objects.get_or_create(
-                    name=category_name,
-                    defaults={'color': '#007bff'}
-                )
-                categories.append(category)
-            task.categories.set(categories)
+        if category_ids or category_names:
+            task.categories.set(resolve_categories(category_ids, category_names))
         
         return task
     
+    def assign(self, instance, validated_data):
+        """Переносит validated_data в задачу без сохранения и возвращает имена измененных полей"""
+        fields = set(validated_data)
+        # Новый дедлайн — о новой просрочке нужно уведомить заново
+        if 'due_date' in validated_data and validated_data['due_date'] != instance.due_date:
+            instance.notified_at = None
+            fields.add('notified_at')
+        
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        return fields
+    
+    @transaction.atomic
     def update(self, instance, validated_data):
         category_ids = validated_data.pop('category_ids', None)
         category_names = validated_data.pop('category_names', None)
         
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
+        self.assign(instance, validated_data)
         instance.save()
         
-        if category_ids is not None:
-            categories = Category.objects.filter(id__in=category_ids)
-            instance.categories.set(categories)
-        
-        if category_names is not None:
-            categories = []
-            for category_name in category_names:
-                category, created = Category.objects.get_or_create(
-                    name=category_name,
-                    defaults={'color': '#007bff'}
-                )
-                categories.append(category)
-            instance.categories.set(categories)
+        if category_ids is not None or category_names is not None:
+            instance.categories.set(resolve_categories(category_ids or [], category_names or []))
         
         return instance
 
-class UserSerializer(serializers.ModelSerializer):
+class CategoryShortSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Category
+        fields = ['id', 'name']
+
+class TaskListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Облегченная задача для списков, только чтение.
+
+    Ожидает queryset из TaskViewSet.get_queryset(): описание уже обрезано,
+    а is_overdue посчитан в SQL. В context['fields'] можно передать
+    подмножество полей из ?fields=.
+    """
+    categories = CategoryShortSerializer(many=True, read_only=True)
+    description = serializers.CharField(source='description_preview', read_only=True)
+    is_overdue = serializers.BooleanField(source='overdue', read_only=True)
+    
+    class Meta:
+        model = Task
+        fields = ['id', 'title', 'description', 'completed', 'due_date', 'created_date', 'is_overdue', 'categories']
+        read_only_fields = fields
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email']
\ No newline at end of file
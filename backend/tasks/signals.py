@@ -0,0 +1,30 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_categories, bump_task_lists
+from .models import Category, Task
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def invalidate_task_list(sender, instance, **kwargs):
+    bump_task_lists([instance.user_id])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_categories(sender, instance, **kwargs):
+    bump_categories()
+
+
+@receiver(m2m_changed, sender=Task.categories.through)
+def invalidate_task_categories(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        bump_task_lists([instance.user_id])
+    elif pk_set:
+        # category.task_set.add(...): задачи могут принадлежать разным пользователям
+        bump_task_lists(Task.objects.filter(pk__in=pk_set).values_list('user_id', flat=True))
+    else:
+        bump_categories()
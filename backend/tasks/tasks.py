@@ -1,31 +1,135 @@
+import logging
+from collections import defaultdict
+from itertools import islice
+
 from celery import shared_task
+from django.conf import settings
+from django.db import connection
 from django.utils import timezone
-from django.contrib.auth.models import User
 from .models import Task
-import requests
-import os
+from .telegram import TelegramRejected, get_sender, split_message
+
+logger = logging.getLogger(__name__)
+
+# Поля, которых достаточно для текста уведомления: воркер не перечитывает задачи из БД.
+# notified_at нет ни в одном ответе API, поэтому его изменения не сбрасывают кэш списков
+DUE_TASK_FIELDS = ('id', 'title', 'due_date', 'user__telegram__telegram_id')
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def claim_due_tasks(task_ids, now):
+    """Помечает задачи notified_at одним UPDATE ... RETURNING и возвращает id только помеченных здесь.
+
+    Задачи, которые уже забрал параллельный запуск, в результат не попадают.
+    """
+    table = connection.ops.quote_name(Task._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET notified_at = %s WHERE id = ANY(%s) AND notified_at IS NULL RETURNING id',
+            [now, list(task_ids)],
+        )
+        return {task_id for task_id, in cursor.fetchall()}
+
 
 @shared_task
-def check_due_tasks():
+def check_due_tasks(batch_size=None):
+    """Ставит в очередь просроченные задачи пачками, по одному сообщению на пачку.
+
+    Задачи читаются серверным курсором; перед отправкой пачка помечается
+    notified_at, и в очередь уходят только задачи, помеченные этим запуском, —
+    пересекающиеся запуски не отправят одно уведомление дважды. Если пачку
+    не удалось поставить в очередь, отметка снимается.
+    """
+    batch_size = batch_size or settings.DUE_TASKS_BATCH_SIZE
     now = timezone.now()
-    due_tasks = Task.objects.filter(
-        completed=False,
-        due_date__lte=now,
-        due_date__isnull=False
+    due_tasks = (
+        Task.objects.filter(
+            completed=False,
+            due_date__lte=now,
+            notified_at__isnull=True
+        )
+        .order_by()
+        .values_list(*DUE_TASK_FIELDS)
+        .iterator(chunk_size=batch_size)
     )
-    
-    for task in due_tasks:
-        send_task_notification.delay(task.id)
+
+    batches = 0
+    for rows in chunked(due_tasks, batch_size):
+        task_ids = claim_due_tasks([task_id for task_id, *_ in rows], now)
+        rows = [row for row in rows if row[0] in task_ids]
+        if not rows:
+            continue
+        try:
+            send_due_tasks_batch.delay([
+                {
+                    'id': task_id,
+                    'title': title,
+                    'due_date': due_date.isoformat(),
+                    'telegram_id': telegram_id,
+                }
+                for task_id, title, due_date, telegram_id in rows
+            ])
+        except Exception:
+            # Брокер недоступен: без этого задачи остались бы уведомленными, а сообщение не ушло бы
+            Task.objects.filter(id__in=task_ids, notified_at=now).update(notified_at=None)
+            logger.exception('Не удалось поставить в очередь пачку из %s просроченных задач', len(rows))
+            raise
+        batches += 1
+    return batches
+
+
+@shared_task
+def send_due_tasks_batch(tasks):
+    """Отправляет уведомления о пачке просроченных задач, одно сообщение на чат.
+
+    Задачи, уведомление о которых не доставлено, снова становятся видны check_due_tasks.
+    """
+    by_chat = defaultdict(list)
+    for task in tasks:
+        if task['telegram_id'] is None:
+            logger.info("Задача '%s' просрочена, но не привязана к Telegram", task['title'])
+            continue
+        by_chat[task['telegram_id']].append(task)
+
+    sender = get_sender()
+    delivered_chats = 0
+    failed_ids = []
+    for chat_id, chat_tasks in by_chat.items():
+        lines = [f"• {task['title']} (дедлайн {task['due_date'][:10]})" for task in chat_tasks]
+        try:
+            delivered = all(
+                sender.send_message(chat_id, text)
+                for text in split_message(lines, header='🚨 Просроченные задачи:\n\n')
+            )
+        except TelegramRejected:
+            logger.warning('Уведомление для чата %s отклонено Telegram', chat_id, exc_info=True)
+            continue
+        if delivered:
+            delivered_chats += 1
+        else:
+            failed_ids.extend(task['id'] for task in chat_tasks)
+
+    if failed_ids:
+        Task.objects.filter(id__in=failed_ids).update(notified_at=None)
+    return delivered_chats
+
 
 @shared_task
 def send_task_notification(task_id):
+    """Оставлена для сообщений, поставленных в очередь до перехода на пачки"""
     try:
-        task = Task.objects.get(id=task_id)
-        bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
-        
-        # Здесь должна быть логика отправки уведомления в Telegram
-        # Для простоты выведем в консоль
-        print(f"Уведомление: Задача '{task.title}' просрочена!")
-        
+        task = Task.objects.select_related('user__telegram').get(id=task_id)
+        profile = getattr(task.user, 'telegram', None)
+        send_due_tasks_batch([{
+            'id': task.id,
+            'title': task.title,
+            'due_date': task.due_date.isoformat() if task.due_date else '',
+            'telegram_id': profile.telegram_id if profile else None,
+        }])
     except Task.DoesNotExist:
-        pass
\ No newline at end of file
+        pass
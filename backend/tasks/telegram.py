@@ -0,0 +1,174 @@
+import logging
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Ограничение Telegram на длину текста сообщения
+MAX_MESSAGE_LENGTH = 4096
+
+# Допуск на ошибку округления при пополнении bucket
+EPSILON = 1e-9
+
+
+class TelegramRejected(Exception):
+    """Telegram отклонил сообщение окончательно (чат не найден, бот заблокирован)"""
+
+
+class TokenBucket:
+    """Классический token bucket: rate токенов в секунду, не больше capacity в запасе"""
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Блокирует до появления токена и возвращает время ожидания"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1 - EPSILON:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            self.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        """Обнуляет запас на seconds секунд — после ответа 429 от Telegram"""
+        with self.lock:
+            self._refill()
+            self.tokens = -seconds * self.rate
+
+
+def retry_after_seconds(response):
+    """Пауза из ответа 429: parameters.retry_after, иначе заголовок Retry-After, иначе 1 секунда.
+
+    Ответ 429 может прийти и не от Telegram (прокси, балансировщик) — без JSON.
+    """
+    try:
+        return float(response.json()['parameters']['retry_after'])
+    except (ValueError, KeyError, TypeError):
+        pass
+    try:
+        return float(response.headers['Retry-After'])
+    except (ValueError, KeyError, TypeError):
+        return 1.0
+
+
+class TelegramSender:
+    """Отправка сообщений через Bot API с учетом лимитов Telegram.
+
+    Общий лимит бота и лимит на один чат соблюдаются двумя уровнями token bucket,
+    HTTP-соединения переиспользуются через пул requests.Session.
+    """
+
+    def __init__(self, token, api_url=None, global_rate=None, chat_rate=None,
+                 pool_size=None, timeout=10, max_retries=3, session=None,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.token = token
+        self.api_url = (api_url or settings.TELEGRAM_API_URL).rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.clock = clock
+        self.sleep = sleep
+        self.chat_rate = chat_rate or settings.TELEGRAM_CHAT_RATE
+        self.global_bucket = TokenBucket(global_rate or settings.TELEGRAM_GLOBAL_RATE, clock=clock, sleep=sleep)
+        self.chat_buckets = {}
+
+        if session is None:
+            pool_size = pool_size or settings.TELEGRAM_POOL_SIZE
+            session = requests.Session()
+            session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+            session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session = session
+
+    def _chat_bucket(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self.chat_buckets) > 10_000:
+                self._prune_chat_buckets()
+            bucket = TokenBucket(self.chat_rate, capacity=1, clock=self.clock, sleep=self.sleep)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _prune_chat_buckets(self):
+        # Полный bucket ничем не отличается от нового, его можно забыть
+        for chat_id, bucket in list(self.chat_buckets.items()):
+            bucket._refill()
+            if bucket.tokens >= bucket.capacity:
+                del self.chat_buckets[chat_id]
+
+    def send_message(self, chat_id, text):
+        """Отправляет сообщение.
+
+        Возвращает True при успехе и False, если попытки исчерпаны;
+        при окончательном отказе Telegram бросает TelegramRejected.
+        """
+        url = f'{self.api_url}/bot{self.token}/sendMessage'
+        chat_bucket = self._chat_bucket(chat_id)
+
+        for attempt in range(self.max_retries + 1):
+            chat_bucket.acquire()
+            self.global_bucket.acquire()
+            try:
+                response = self.session.post(url, json={'chat_id': chat_id, 'text': text}, timeout=self.timeout)
+            except requests.RequestException:
+                logger.exception('Telegram sendMessage failed for chat %s', chat_id)
+                self.sleep(2 ** attempt)
+                continue
+
+            if response.status_code == 429:
+                retry_after = retry_after_seconds(response)
+                logger.warning('Telegram rate limit hit, retry after %s s', retry_after)
+                self.global_bucket.pause(retry_after)
+                continue
+            if response.status_code >= 500:
+                self.sleep(2 ** attempt)
+                continue
+            if not response.ok:
+                # 400/403: чат не найден или бот заблокирован — повтор не поможет
+                raise TelegramRejected(f'chat {chat_id}: {response.text[:200]}')
+            return True
+        return False
+
+
+def split_message(lines, header=''):
+    """Собирает строки в сообщения не длиннее лимита Telegram"""
+    messages = []
+    current = header
+    for line in lines:
+        line = line[:MAX_MESSAGE_LENGTH - len(header) - 1]
+        if len(current) + len(line) + 1 > MAX_MESSAGE_LENGTH:
+            messages.append(current)
+            current = header
+        current += line + '\n'
+    if current != header:
+        messages.append(current)
+    return messages
+
+
+_sender = None
+
+
+def get_sender():
+    """Один отправитель на процесс воркера, чтобы пул соединений и лимиты были общими"""
+    global _sender
+    if _sender is None:
+        _sender = TelegramSender(settings.TELEGRAM_BOT_TOKEN)
+    return _sender
@@ -1,3 +1,1190 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from asgiref.sync import async_to_sync
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from . import async_views
+from .authentication import get_telegram_user
+from .cache import task_list_version_key
+from .export import aiter_chunks
+from .importer import TaskImporter
+from .management.commands.convert_pks import ULID_REGEX, legacy_to_ulid
+from .management.commands.seed_bench import BENCH_TELEGRAM_ID as SEED_BENCH_TELEGRAM_ID
+from .metrics import PerformanceMiddleware
+from .models import Task, Category
+from .renderers import FastJSONParser, FastJSONRenderer
+from .serializers import resolve_categories
+from .tasks import check_due_tasks, send_due_tasks_batch
+from .telegram import TelegramRejected, TelegramSender, TokenBucket
+from .ulid import new_ulid
+
+# Общий секрет бота и backend для заголовка X-Bot-Api-Token во всех тестах модуля
+BOT_API_TOKEN = 'test-bot-token'
+bot_api_token_settings = override_settings(BOT_API_TOKEN=BOT_API_TOKEN)
+
+
+def setUpModule():
+    bot_api_token_settings.enable()
+
+
+def tearDownModule():
+    bot_api_token_settings.disable()
+
+
+def create_tasks(user, count, categories=()):
+    """Создает задачи пачкой, минуя Task.save(), и привязывает к ним категории"""
+    now = timezone.now()
+    tasks = Task.objects.bulk_create([
+        Task(
+            id=f'task-{i:05d}',
+            title=f'Задача {i}',
+            user=user,
+            created_date=now - timedelta(minutes=i),
+        )
+        for i in range(count)
+    ])
+    Through = Task.categories.through
+    Through.objects.bulk_create([
+        Through(task_id=task.id, category_id=category.id)
+        for task in tasks
+        for category in categories
+    ])
+    return tasks
+
+
+class TaskQueryCountTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_telegram_user(1001)
+        cls.categories = [
+            Category.objects.create(name=f'Категория {i}')
+            for i in range(3)
+        ]
+        create_tasks(cls.user, 200, cls.categories)
+
+    def setUp(self):
+        self.client.credentials(HTTP_X_BOT_API_TOKEN=BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID='1001')
+
+    def assert_page_queries(self, page_size):
+        # Пользователь, COUNT для пагинации, сами задачи и prefetch категорий
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/tasks/', {'page_size': page_size})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), page_size)
+        self.assertEqual(len(response.data['results'][0]['categories']), 3)
+
+    def test_page_of_20_tasks(self):
+        self.assert_page_queries(20)
+
+    def test_page_of_200_tasks(self):
+        self.assert_page_queries(200)
+
+    def test_task_detail(self):
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/tasks/task-00000/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['categories']), 3)
+
+
+class TaskCursorPaginationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_telegram_user(1001)
+        create_tasks(cls.user, 45)
+
+    def setUp(self):
+        self.client.credentials(HTTP_X_BOT_API_TOKEN=BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID='1001')
+
+    def test_walks_all_pages_without_count(self):
+        seen = []
+        url = '/api/tasks/?pagination=cursor'
+        while url:
+            # Пользователь, задачи и prefetch категорий, без COUNT(*)
+            with self.assertNumQueries(3):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            seen.extend(task['id'] for task in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, [f'task-{i:05d}' for i in range(45)])
+
+    def test_ties_on_created_date_are_not_skipped(self):
+        Task.objects.update(created_date=timezone.now())
+        seen = []
+        url = '/api/tasks/?pagination=cursor&page_size=7'
+        while url:
+            response = self.client.get(url)
+            seen.extend(task['id'] for task in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(sorted(seen), [f'task-{i:05d}' for i in range(45)])
+
+    def test_page_number_pagination_is_default(self):
+        response = self.client.get('/api/tasks/')
+        self.assertEqual(response.data['count'], 45)
+
+
+class TaskOwnershipTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = get_telegram_user(1001)
+        cls.bob = get_telegram_user(1002)
+        Task.objects.bulk_create([
+            Task(id='alice-task', title='Задача Алисы', user=cls.alice),
+            Task(id='bob-task', title='Задача Боба', user=cls.bob),
+        ])
+
+    def test_list_is_scoped_to_sender(self):
+        self.client.credentials(HTTP_X_BOT_API_TOKEN=BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID='1001')
+        response = self.client.get('/api/tasks/')
+        self.assertEqual([task['id'] for task in response.data['results']], ['alice-task'])
+
+    def test_other_users_task_is_not_found(self):
+        self.client.credentials(HTTP_X_BOT_API_TOKEN=BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID='1001')
+        response = self.client.post('/api/tasks/bob-task/delete_task/')
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(Task.objects.filter(id='bob-task').exists())
+
+    def test_create_assigns_sender(self):
+        self.client.credentials(HTTP_X_BOT_API_TOKEN=BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID='1003')
+        response = self.client.post('/api/tasks/', {'title': 'Новая задача'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        task = Task.objects.get(id=response.data['id'])
+        self.assertEqual(task.user.telegram.telegram_id, 1003)
+
+    def test_invalid_telegram_id_is_rejected(self):
+        self.client.credentials(HTTP_X_BOT_API_TOKEN=BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID='abc')
+        response = self.client.get('/api/tasks/')
+        self.assertIn(response.status_code, (401, 403))
+
+    def test_telegram_id_requires_bot_token(self):
+        users = User.objects.count()
+        for token in (None, 'wrong-token'):
+            headers = {'HTTP_X_TELEGRAM_USER_ID': '1004'}
+            if token:
+                headers['HTTP_X_BOT_API_TOKEN'] = token
+            self.client.credentials(**headers)
+            response = self.client.get('/api/tasks/')
+            self.assertIn(response.status_code, (401, 403))
+        self.assertEqual(User.objects.count(), users)
+
+    def test_anonymous_is_rejected(self):
+        response = self.client.get('/api/tasks/')
+        self.assertIn(response.status_code, (401, 403))
+        response = self.client.post('/api/tasks/', {'title': 'Анонимная задача'}, format='json')
+        self.assertIn(response.status_code, (401, 403))
+        self.assertFalse(Task.objects.filter(title='Анонимная задача').exists())
+
+
+class CheckDueTasksTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_telegram_user(1001)
+        past = timezone.now() - timedelta(days=1)
+        Task.objects.bulk_create(
+            [Task(id=f'due-{i:03d}', title=f'Просрочена {i}', user=cls.user, due_date=past) for i in range(25)]
+            + [
+                Task(id='done', title='Выполнена', user=cls.user, due_date=past, completed=True),
+                Task(id='future', title='Будущая', user=cls.user, due_date=timezone.now() + timedelta(days=1)),
+            ]
+        )
+
+    @mock.patch('tasks.tasks.send_due_tasks_batch.delay')
+    def test_sends_overdue_tasks_in_batches(self, delay):
+        # SELECT по курсору и по одному UPDATE на каждую из трех пачек
+        with self.assertNumQueries(4):
+            self.assertEqual(check_due_tasks(batch_size=10), 3)
+
+        batches = [call.args[0] for call in delay.call_args_list]
+        self.assertEqual([len(batch) for batch in batches], [10, 10, 5])
+        sent = {task['id'] for batch in batches for task in batch}
+        self.assertEqual(sent, {f'due-{i:03d}' for i in range(25)})
+        self.assertEqual(batches[0][0]['telegram_id'], 1001)
+
+    @mock.patch('tasks.tasks.send_due_tasks_batch.delay')
+    def test_works_without_server_side_cursors(self, delay):
+        # Так backend настроен за PgBouncer в режиме transaction
+        with mock.patch.dict(connection.settings_dict, {'DISABLE_SERVER_SIDE_CURSORS': True}):
+            self.assertEqual(check_due_tasks(batch_size=10), 3)
+        self.assertEqual(sum(len(call.args[0]) for call in delay.call_args_list), 25)
+
+    @mock.patch('tasks.tasks.send_due_tasks_batch.delay')
+    def test_does_not_requeue_notified_tasks(self, delay):
+        check_due_tasks(batch_size=10)
+        delay.reset_mock()
+
+        self.assertEqual(check_due_tasks(batch_size=10), 0)
+        delay.assert_not_called()
+
+    @mock.patch('tasks.tasks.send_due_tasks_batch.delay')
+    def test_overlapping_runs_enqueue_each_task_once(self, delay):
+        def overlap(batch):
+            # Второй запуск начинается, пока первый держит прочитанные, но еще не помеченные пачки
+            if delay.call_count == 1:
+                check_due_tasks(batch_size=10)
+        delay.side_effect = overlap
+
+        first = check_due_tasks(batch_size=10)
+
+        sent = [task['id'] for call in delay.call_args_list for task in call.args[0]]
+        self.assertEqual(sorted(sent), [f'due-{i:03d}' for i in range(25)])
+        self.assertEqual(first + 2, delay.call_count)
+
+    @mock.patch('tasks.tasks.send_due_tasks_batch.delay')
+    def test_failed_publish_clears_notification(self, delay):
+        delay.side_effect = [None, ConnectionError('broker is down')]
+        with self.assertLogs('tasks.tasks', 'ERROR'), self.assertRaises(ConnectionError):
+            check_due_tasks(batch_size=10)
+        # Первая пачка ушла в очередь, вторая снова ждет следующего запуска
+        self.assertEqual(Task.objects.filter(notified_at__isnull=False).count(), 10)
+
+        delay.side_effect = None
+        self.assertEqual(check_due_tasks(batch_size=10), 2)
+
+    @mock.patch('tasks.tasks.send_due_tasks_batch.delay')
+    def test_new_due_date_resets_notification(self, delay):
+        check_due_tasks(batch_size=10)
+        self.client.patch(
+            '/api/tasks/due-000/',
+            {'due_date': (timezone.now() + timedelta(hours=1)).isoformat()},
+            content_type='application/json',
+            HTTP_X_BOT_API_TOKEN=BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID='1001',
+        )
+        self.assertIsNone(Task.objects.get(id='due-000').notified_at)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None, headers=None):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.payload = payload or {}
+        self.headers = headers or {}
+        self.text = str(self.payload)
+
+    def json(self):
+        # Строка вместо словаря — тело не в JSON, например страница ошибки прокси
+        if isinstance(self.payload, str):
+            raise ValueError('not JSON')
+        return self.payload
+
+
+class FakeSession:
+    def __init__(self, clock, responses=()):
+        self.clock = clock
+        self.responses = list(responses)
+        self.sent = []
+
+    def post(self, url, json, timeout):
+        self.sent.append((self.clock(), url, json))
+        return self.responses.pop(0) if self.responses else FakeResponse(200, {'ok': True})
+
+
+class TelegramSenderTests(TestCase):
+    @staticmethod
+    def make_sender(responses=()):
+        clock = FakeClock()
+        session = FakeSession(clock, responses)
+        sender = TelegramSender(
+            'TOKEN', api_url='http://stub', global_rate=30, chat_rate=1,
+            session=session, clock=clock, sleep=clock.sleep,
+        )
+        return sender, session
+
+    def test_token_bucket_limits_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(10, clock=clock, sleep=clock.sleep)
+        for _ in range(30):
+            bucket.acquire()
+        # 10 токенов запаса, остальные 20 выдаются со скоростью 10 в секунду
+        self.assertAlmostEqual(clock.now, 2.0)
+
+    def test_respects_per_chat_limit(self):
+        sender, session = self.make_sender()
+        for _ in range(3):
+            sender.send_message(1, 'привет')
+        sender.send_message(2, 'привет')
+        times = [sent_at for sent_at, url, payload in session.sent]
+        self.assertEqual(times[:3], [0.0, 1.0, 2.0])
+        self.assertEqual(session.sent[0][1], 'http://stub/botTOKEN/sendMessage')
+
+    def test_retries_after_429(self):
+        sender, session = self.make_sender([FakeResponse(429, {'parameters': {'retry_after': 5}})])
+        with self.assertLogs('tasks.telegram', 'WARNING'):
+            self.assertTrue(sender.send_message(1, 'привет'))
+        self.assertEqual(len(session.sent), 2)
+        self.assertGreaterEqual(session.sent[1][0], 5.0)
+
+    def test_429_without_json_uses_retry_after_header(self):
+        sender, session = self.make_sender([
+            FakeResponse(429, '<html>Too Many Requests</html>', headers={'Retry-After': '3'}),
+            FakeResponse(429, {'ok': False}),
+        ])
+        with self.assertLogs('tasks.telegram', 'WARNING'):
+            self.assertTrue(sender.send_message(1, 'привет'))
+        self.assertEqual(len(session.sent), 3)
+        self.assertGreaterEqual(session.sent[1][0], 3.0)
+        # Без parameters и без заголовка — пауза в 1 секунду
+        self.assertGreaterEqual(session.sent[2][0] - session.sent[1][0], 1.0)
+
+    def test_rejected_message_is_not_retried(self):
+        sender, session = self.make_sender([FakeResponse(403, {'description': 'bot was blocked'})])
+        with self.assertRaises(TelegramRejected):
+            sender.send_message(1, 'привет')
+        self.assertEqual(len(session.sent), 1)
+
+
+class SendDueTasksBatchTests(TestCase):
+    def setUp(self):
+        self.sender, self.session = TelegramSenderTests.make_sender()
+        patcher = mock.patch('tasks.tasks.get_sender', return_value=self.sender)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_coalesces_tasks_per_chat(self):
+        tasks = [
+            {'id': 'a', 'title': 'Первая', 'due_date': '2025-01-01T00:00:00', 'telegram_id': 1},
+            {'id': 'b', 'title': 'Вторая', 'due_date': '2025-01-02T00:00:00', 'telegram_id': 1},
+            {'id': 'c', 'title': 'Третья', 'due_date': '2025-01-03T00:00:00', 'telegram_id': 2},
+            {'id': 'd', 'title': 'Без чата', 'due_date': '2025-01-03T00:00:00', 'telegram_id': None},
+        ]
+        self.assertEqual(send_due_tasks_batch(tasks), 2)
+        messages = {payload['chat_id']: payload['text'] for _, _, payload in self.session.sent}
+        self.assertEqual(set(messages), {1, 2})
+        self.assertIn('Первая', messages[1])
+        self.assertIn('Вторая', messages[1])
+
+    def test_failed_delivery_is_requeued(self):
+        user = get_telegram_user(1)
+        Task.objects.bulk_create([Task(id='a', title='Первая', user=user, notified_at=timezone.now())])
+        self.session.responses = [FakeResponse(502)] * 4
+        send_due_tasks_batch([{'id': 'a', 'title': 'Первая', 'due_date': '2025-01-01', 'telegram_id': 1}])
+        self.assertIsNone(Task.objects.get(id='a').notified_at)
+
+
+class CheckCategoriesTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.work = Category.objects.create(id='work', name='Работа')
+        cls.home = Category.objects.create(id='home', name='Дом')
+
+    def test_resolves_names_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.post(
+                '/api/categories/check_categories/',
+                {'names': ['работа', ' ДОМ ', 'Учеба', 'Работа']},
+                format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['existing'], [
+            {'id': 'work', 'name': 'Работа'},
+            {'id': 'home', 'name': 'Дом'},
+        ])
+        self.assertEqual(response.data['missing'], ['Учеба'])
+
+    def test_rejects_non_list(self):
+        response = self.client.post('/api/categories/check_categories/', {'names': 'Работа'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_body_that_is_not_an_object(self):
+        for body in (['Работа'], 'Работа', 1):
+            response = self.client.post('/api/categories/check_categories/', body, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data, {'error': 'names must be a list of strings'})
+
+    def test_check_category_is_case_insensitive(self):
+        response = self.client.get('/api/categories/check_category/', {'name': 'РАБОТА'})
+        self.assertTrue(response.data['exists'])
+
+
+class ResolveCategoriesTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.work = Category.objects.create(id='work', name='Работа')
+        cls.home = Category.objects.create(id='home', name='Дом')
+
+    def test_reuses_existing_and_creates_missing(self):
+        categories = resolve_categories(['home'], ['Работа', 'Учеба', 'Спорт', 'Учеба'])
+        self.assertEqual(
+            sorted(category.name for category in categories),
+            ['Дом', 'Работа', 'Спорт', 'Учеба'],
+        )
+        self.assertEqual(Category.objects.count(), 4)
+
+    def test_query_count_does_not_depend_on_number_of_names(self):
+        # SELECT существующих, INSERT недостающих и SELECT созданных
+        with self.assertNumQueries(3):
+            resolve_categories([], ['Работа'] + [f'Новая {i}' for i in range(2)])
+        with self.assertNumQueries(3):
+            resolve_categories([], ['Работа'] + [f'Другая {i}' for i in range(20)])
+
+    def test_category_created_concurrently_is_reused(self):
+        original_bulk_create = Category.objects.bulk_create
+
+        def bulk_create_after_other_user(objs, **kwargs):
+            # Другой пользователь успел создать ту же категорию раньше нас
+            Category.objects.create(id='rival', name='Учеба')
+            return original_bulk_create(objs, **kwargs)
+
+        with mock.patch.object(Category.objects, 'bulk_create', bulk_create_after_other_user):
+            categories = resolve_categories([], ['Учеба'])
+        self.assertEqual([category.id for category in categories], ['rival'])
+
+    def test_task_create_sets_categories_by_ids_and_names(self):
+        response = self.client.post(
+            '/api/tasks/',
+            {'title': 'Задача', 'category_ids': ['home'], 'category_names': ['Работа', 'Учеба']},
+            format='json',
+            HTTP_X_BOT_API_TOKEN=BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID='1001',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            sorted(category['name'] for category in response.data['categories']),
+            ['Дом', 'Работа', 'Учеба'],
+        )
+
+
+class BulkTaskTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = get_telegram_user(1001)
+        cls.bob = get_telegram_user(1002)
+        cls.work = Category.objects.create(id='work', name='Работа')
+        create_tasks(cls.alice, 3)
+        Task.objects.create(id='bob-task', title='Задача Боба', user=cls.bob)
+
+    def setUp(self):
+        self.client.credentials(HTTP_X_BOT_API_TOKEN=BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID='1001')
+
+    def bulk_create(self, count):
+        tasks = [{'title': f'Новая {i}', 'category_names': ['Работа', f'Категория {count}-{i % 3}']} for i in range(count)]
+        return self.client.post('/api/tasks/bulk_create/', {'tasks': tasks}, format='json')
+
+    def test_bulk_create_reports_each_item(self):
+        response = self.client.post('/api/tasks/bulk_create/', {'tasks': [
+            {'title': 'Первая', 'category_ids': ['work']},
+            {'description': 'Без названия'},
+            {'title': 'Вторая', 'category_names': ['Дом']},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 2)
+        statuses = [result['status'] for result in response.data['results']]
+        self.assertEqual(statuses, ['created', 'error', 'created'])
+        self.assertIn('title', response.data['results'][1]['errors'])
+
+        first = Task.objects.get(id=response.data['results'][0]['id'])
+        second = Task.objects.get(id=response.data['results'][2]['id'])
+        self.assertEqual(first.user, self.alice)
+        self.assertEqual([category.name for category in first.categories.all()], ['Работа'])
+        self.assertEqual([category.name for category in second.categories.all()], ['Дом'])
+
+    def test_bulk_create_query_count_does_not_depend_on_batch_size(self):
+        with self.assertNumQueries(9) as small:
+            self.bulk_create(5)
+        with self.assertNumQueries(len(small.captured_queries)):
+            self.bulk_create(100)
+        self.assertEqual(Task.objects.filter(user=self.alice).count(), 108)
+
+    def test_bulk_create_rejects_oversized_batch(self):
+        response = self.bulk_create(501)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Task.objects.filter(user=self.alice).count(), 3)
+
+    def test_bulk_update(self):
+        response = self.client.post('/api/tasks/bulk_update/', {'tasks': [
+            {'id': 'task-00000', 'completed': True},
+            {'id': 'task-00001', 'title': 'Переименована', 'category_ids': ['work']},
+            {'id': 'bob-task', 'completed': True},
+            {'id': 'task-00002', 'title': ''},
+        ]}, format='json')
+        self.assertEqual(response.data['updated'], 2)
+        statuses = [result['status'] for result in response.data['results']]
+        self.assertEqual(statuses, ['updated', 'updated', 'not_found', 'error'])
+
+        self.assertTrue(Task.objects.get(id='task-00000').completed)
+        renamed = Task.objects.get(id='task-00001')
+        self.assertEqual(renamed.title, 'Переименована')
+        self.assertFalse(renamed.completed)
+        self.assertEqual([category.id for category in renamed.categories.all()], ['work'])
+        self.assertFalse(Task.objects.get(id='bob-task').completed)
+        self.assertEqual(Task.objects.get(id='task-00002').title, 'Задача 2')
+
+    def test_bulk_delete_is_scoped_to_owner(self):
+        response = self.client.post(
+            '/api/tasks/bulk_delete/', {'ids': ['task-00000', 'task-00001', 'bob-task']}, format='json'
+        )
+        self.assertEqual(response.data['deleted'], 2)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['deleted', 'deleted', 'not_found'],
+        )
+        self.assertEqual(list(Task.objects.filter(user=self.alice).values_list('id', flat=True)), ['task-00002'])
+        self.assertTrue(Task.objects.filter(id='bob-task').exists())
+
+
+class PrimaryKeyTests(TestCase):
+    def test_generated_keys_are_sorted_and_unique(self):
+        pks = [new_ulid() for _ in range(10_000)]
+        self.assertEqual(pks, sorted(pks))
+        self.assertEqual(len(set(pks)), len(pks))
+        self.assertTrue(all(len(pk) == 26 for pk in pks))
+
+    def test_legacy_keys_keep_their_order(self):
+        legacy = ['1792296600610799640_491dfa0df49c59cc', '1792296600610838612_a77c61916da1e81b',
+                  '1792296601000000000_0000000000000000']
+        converted = [legacy_to_ulid(pk) for pk in legacy]
+        self.assertEqual(converted, sorted(converted))
+        self.assertEqual(len(set(converted)), 3)
+
+    def test_convert_pks_rewrites_links(self):
+        user = get_telegram_user(1001)
+        category = Category.objects.create(id='1792296600522525546_42cf3356eef2e040', name='Работа')
+        task = Task.objects.create(id='1792296600610799640_491dfa0df49c59cc', title='Задача', user=user)
+        task.categories.add(category)
+
+        call_command('convert_pks', sleep=0, stdout=io.StringIO())
+
+        task = Task.objects.get()
+        self.assertEqual(task.id, legacy_to_ulid('1792296600610799640_491dfa0df49c59cc'))
+        self.assertEqual(
+            [category.id for category in task.categories.all()],
+            [legacy_to_ulid('1792296600522525546_42cf3356eef2e040')],
+        )
+
+    def test_convert_pks_walks_keys_in_batches(self):
+        user = get_telegram_user(1001)
+        ulid = new_ulid()
+        legacy = [f'17922966006107996{i:02d}_491dfa0df49c59cc' for i in range(5)]
+        Task.objects.bulk_create([Task(id=pk, title=pk, user=user) for pk in legacy + [ulid, 'custom-key']])
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command('convert_pks', batch_size=2, sleep=0, stdout=io.StringIO())
+
+        self.assertEqual(
+            set(Task.objects.values_list('id', flat=True)) - {ulid},
+            {legacy_to_ulid(pk) for pk in legacy} | {Task.objects.get(title='custom-key').id},
+        )
+        self.assertRegex(Task.objects.get(title='custom-key').id, ULID_REGEX)
+        # Пачки продолжают с последнего старого ключа: 6 ключей по 2 — 3 пачки и пустой запрос
+        selects = [query['sql'] for query in queries if query['sql'].startswith('SELECT "tasks_task"."id"')]
+        self.assertEqual(len(selects), 4)
+        self.assertTrue(all('"tasks_task"."id" >' in sql for sql in selects))
+
+
+class ResponseCacheTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = get_telegram_user(1001)
+        cls.work = Category.objects.create(id='work', name='Работа')
+        create_tasks(cls.alice, 3)
+
+    def setUp(self):
+        cache.clear()
+        self.client.credentials(HTTP_X_BOT_API_TOKEN=BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID='1001')
+
+    def test_second_request_is_served_from_cache(self):
+        first = self.client.get('/api/tasks/')
+        # Остается только запрос пользователя из аутентификации
+        with self.assertNumQueries(1):
+            second = self.client.get('/api/tasks/')
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertEqual(self.client.get('/api/cache/stats/').data['tasks'],
+                         {'hits': 1, 'misses': 1, 'not_modified': 0})
+
+    def test_conditional_get_returns_304(self):
+        etag = self.client.get('/api/categories/')['ETag']
+        response = self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Дом')
+        response = self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_task_changes_invalidate_list(self):
+        self.client.get('/api/tasks/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/tasks/', {'title': 'Новая'}, format='json')
+        self.assertEqual(self.client.get('/api/tasks/').data['count'], 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.get(id='task-00000').categories.add(self.work)
+        results = self.client.get('/api/tasks/').data['results']
+        task = next(task for task in results if task['id'] == 'task-00000')
+        self.assertEqual([category['name'] for category in task['categories']], ['Работа'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/tasks/bulk_delete/', {'ids': ['task-00001']}, format='json')
+        self.assertEqual(self.client.get('/api/tasks/').data['count'], 3)
+
+    def test_versions_are_bumped_after_commit(self):
+        self.client.get('/api/tasks/')
+        key = task_list_version_key(self.alice.id)
+        version = cache.get(key)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post('/api/tasks/', {'title': 'Новая'}, format='json')
+            # До коммита список под старой версией: иначе запрос списка в этот момент
+            # закэшировал бы строки без новой задачи уже под новой версией
+            self.assertEqual(cache.get(key), version)
+        self.assertEqual(cache.get(key), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(cache.get(key), version)
+
+    def test_category_rename_invalidates_task_list(self):
+        Task.objects.get(id='task-00000').categories.add(self.work)
+        self.client.get('/api/tasks/')
+        Category.objects.filter(id='work').update(name='Офис')
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.get(id='work').save()
+        results = self.client.get('/api/tasks/').data['results']
+        task = next(task for task in results if task['id'] == 'task-00000')
+        self.assertEqual(task['categories'][0]['name'], 'Офис')
+
+    def test_lists_are_cached_per_user(self):
+        self.client.get('/api/tasks/')
+        self.client.credentials(HTTP_X_BOT_API_TOKEN=BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID='1002')
+        self.assertEqual(self.client.get('/api/tasks/').data['count'], 0)
+
+    def test_cache_expires_with_nearest_due_date(self):
+        Task.objects.filter(id='task-00000').update(due_date=timezone.now() + timedelta(seconds=30))
+        with mock.patch('tasks.cache.cache.set', wraps=cache.set) as cache_set:
+            self.client.get('/api/tasks/')
+        self.assertLessEqual(cache_set.call_args.args[2], 31)
+
+
+class AsyncViewTests(APITestCase):
+    """Асинхронные представления отвечают так же, как вьюсеты"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = get_telegram_user(1001)
+        cls.work = Category.objects.create(id='work', name='Работа')
+        create_tasks(cls.alice, 30, [cls.work])
+
+    def setUp(self):
+        cache.clear()
+        self.client.credentials(HTTP_X_BOT_API_TOKEN=BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID='1001')
+        self.factory = RequestFactory()
+
+    def call(self, view, url, method='get', **extra):
+        request = getattr(self.factory, method)(url, **extra)
+        return async_to_sync(view)(request)
+
+    def test_task_list_matches_viewset(self):
+        for url in ('/api/tasks/?page=2', '/api/tasks/?pagination=cursor&fields=id,title,categories'):
+            expected = self.client.get(url).json()
+            cache.clear()
+            response = self.call(async_views.task_list, url, HTTP_X_BOT_API_TOKEN=BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID='1001')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'application/json')
+            self.assertEqual(json.loads(response.content), expected)
+
+    def test_shares_cache_and_etag_with_viewset(self):
+        etag = self.client.get('/api/tasks/')['ETag']
+        with self.assertNumQueries(1):
+            response = self.call(async_views.task_list, '/api/tasks/',
+                                 HTTP_X_BOT_API_TOKEN=BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID='1001', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get('/api/cache/stats/').data['tasks'],
+                         {'hits': 1, 'misses': 1, 'not_modified': 1})
+
+    def test_anonymous_request_is_rejected(self):
+        response = self.call(async_views.task_list, '/api/tasks/')
+        self.assertIn(response.status_code, (401, 403))
+
+    def test_categories(self):
+        response = self.call(async_views.category_list, '/api/categories/')
+        self.assertEqual([category['name'] for category in json.loads(response.content)['results']], ['Работа'])
+
+        response = self.call(async_views.check_category, '/api/categories/check_category/?name=работа')
+        self.assertEqual(json.loads(response.content), {'exists': True})
+        response = self.call(async_views.check_category, '/api/categories/check_category/?name=Дом')
+        self.assertEqual(json.loads(response.content), {'exists': False})
+
+    def test_other_requests_go_to_viewset(self):
+        response = self.call(async_views.task_list, '/api/tasks/', 'post', data={'title': 'Новая'},
+                             content_type='application/json',
+                             HTTP_X_BOT_API_TOKEN=BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID='1001')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Task.objects.filter(user=self.alice).count(), 31)
+
+        response = self.call(async_views.task_list, '/api/tasks/',
+                             HTTP_X_BOT_API_TOKEN=BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID='abc')
+        self.assertIn(response.status_code, (401, 403))
+
+        # Без секрета бота заголовок с Telegram ID не принимается
+        response = self.call(async_views.task_list, '/api/tasks/', HTTP_X_TELEGRAM_USER_ID='1001')
+        self.assertIn(response.status_code, (401, 403))
+
+
+class TaskListSerializerTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_telegram_user(1001)
+        work = Category.objects.create(id='work', name='Работа', color='#ff0000')
+        past = timezone.now() - timedelta(days=1)
+        Task.objects.bulk_create([
+            Task(id='overdue', title='Просрочена', user=cls.user, due_date=past, description='д' * 80),
+            Task(id='done', title='Выполнена', user=cls.user, due_date=past, completed=True),
+            Task(id='no-due', title='Без дедлайна', user=cls.user, description='Коротко'),
+        ])
+        Task.objects.get(id='overdue').categories.add(work)
+
+    def setUp(self):
+        cache.clear()
+        self.client.credentials(HTTP_X_BOT_API_TOKEN=BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID='1001')
+
+    def get_tasks(self, **params):
+        return {task['id']: task for task in self.client.get('/api/tasks/', params).data['results']}
+
+    def test_slim_representation(self):
+        tasks = self.get_tasks()
+        self.assertEqual(
+            set(tasks['overdue']),
+            {'id', 'title', 'description', 'completed', 'due_date', 'created_date', 'is_overdue', 'categories'},
+        )
+        self.assertEqual(tasks['overdue']['description'], 'д' * 50 + '...')
+        self.assertEqual(tasks['no-due']['description'], 'Коротко')
+        self.assertEqual(tasks['overdue']['categories'], [{'id': 'work', 'name': 'Работа'}])
+
+    def test_is_overdue_is_computed_in_sql(self):
+        tasks = self.get_tasks()
+        self.assertEqual(
+            {task_id: task['is_overdue'] for task_id, task in tasks.items()},
+            {'overdue': True, 'done': False, 'no-due': False},
+        )
+
+    def test_sparse_fieldset_skips_unneeded_queries(self):
+        # Пользователь, COUNT и задачи — без prefetch категорий
+        with self.assertNumQueries(3):
+            tasks = self.get_tasks(fields='id,title,unknown')
+        self.assertEqual(tasks['done'], {'id': 'done', 'title': 'Выполнена'})
+
+    def test_only_unknown_fields_are_rejected(self):
+        response = self.client.get('/api/tasks/', {'fields': 'bogus'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.data)
+
+    def test_detail_keeps_full_representation(self):
+        response = self.client.get('/api/tasks/overdue/')
+        self.assertEqual(response.data['description'], 'д' * 80)
+        self.assertEqual(response.data['categories'][0]['color'], '#ff0000')
+
+
+class TaskSearchTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = get_telegram_user(1001)
+        cls.bob = get_telegram_user(1002)
+        Task.objects.create(id='report', title='Квартальный отчет', user=cls.alice)
+        Task.objects.create(id='mention', title='Позвонить бухгалтеру', description='Уточнить сроки отчетов',
+                            user=cls.alice)
+        Task.objects.create(id='other', title='Купить молоко', user=cls.alice)
+        Task.objects.create(id='bobs', title='Отчет для Боба', user=cls.bob)
+
+    def setUp(self):
+        cache.clear()
+        self.client.credentials(HTTP_X_BOT_API_TOKEN=BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID='1001')
+
+    def search(self, q, **params):
+        response = self.client.get('/api/tasks/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [task['id'] for task in response.data['results']]
+
+    def test_russian_stemming_and_rank(self):
+        # Совпадение в названии важнее совпадения в описании
+        self.assertEqual(self.search('отчеты'), ['report', 'mention'])
+        self.assertEqual(self.search('отчет -квартальный'), ['mention'])
+        self.assertEqual(self.search('молоко', pagination='cursor'), ['other'])
+        self.assertEqual(self.search(''), ['other', 'mention', 'report'])
+
+    def test_vector_follows_bulk_writes(self):
+        Task.objects.bulk_create([Task(id='bulk', title='Подготовить презентацию', user=self.alice)])
+        self.assertEqual(self.search('презентация'), ['bulk'])
+
+        task = Task.objects.get(id='other')
+        task.title = 'Купить хлеб'
+        Task.objects.bulk_update([task], ['title'])
+        self.assertEqual(self.search('молоко'), [])
+        # save() пишет search_vector из экземпляра, но триггер пересчитывает его
+        Task.objects.get(id='other').save()
+        self.assertEqual(self.search('хлеб'), ['other'])
+
+    def test_admin_uses_full_text_search(self):
+        from django.contrib import admin
+        model_admin = admin.site._registry[Task]
+        queryset, may_have_duplicates = model_admin.get_search_results(None, Task.objects.all(), 'отчетов')
+        self.assertEqual(set(queryset.values_list('id', flat=True)), {'report', 'mention', 'bobs'})
+
+
+class TaskFilterTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = get_telegram_user(1001)
+        cls.work = Category.objects.create(id='work', name='Работа')
+        now = timezone.now()
+        Task.objects.bulk_create([
+            Task(id='overdue', title='Просрочена', user=cls.alice, due_date=now - timedelta(days=1)),
+            Task(id='soon', title='Завтра', user=cls.alice, due_date=now + timedelta(days=1)),
+            Task(id='later', title='Через неделю', user=cls.alice, due_date=now + timedelta(days=7)),
+            Task(id='no-due', title='Без дедлайна', user=cls.alice),
+            Task(id='done', title='Готово', user=cls.alice, completed=True, due_date=now - timedelta(days=2)),
+        ])
+        Task.objects.get(id='soon').categories.add(cls.work)
+
+    def setUp(self):
+        cache.clear()
+        self.client.credentials(HTTP_X_BOT_API_TOKEN=BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID='1001')
+
+    def ids(self, **params):
+        response = self.client.get('/api/tasks/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [task['id'] for task in response.data['results']]
+
+    def test_filters(self):
+        self.assertEqual(set(self.ids(completed='false')), {'overdue', 'soon', 'later', 'no-due'})
+        self.assertEqual(self.ids(completed='true'), ['done'])
+        self.assertEqual(self.ids(overdue='true'), ['overdue'])
+        self.assertEqual(set(self.ids(overdue='false')), {'soon', 'later', 'no-due', 'done'})
+        tomorrow = (timezone.now() + timedelta(days=2)).date().isoformat()
+        self.assertEqual(set(self.ids(due_after=timezone.now().isoformat(), due_before=tomorrow)), {'soon'})
+        self.assertEqual(self.ids(category='work'), ['soon'])
+        self.assertEqual(self.ids(overdue='true', pagination='cursor'), ['overdue'])
+
+    def test_ordering_by_due_date(self):
+        self.assertEqual(self.ids(ordering='due_date'), ['done', 'overdue', 'soon', 'later', 'no-due'])
+        self.assertEqual(self.ids(ordering='-due_date', completed='false'), ['later', 'soon', 'overdue', 'no-due'])
+
+    def test_invalid_parameters(self):
+        for params in ({'completed': 'maybe'}, {'due_before': 'вчера'}, {'ordering': 'title'},
+                       {'ordering': 'due_date', 'pagination': 'cursor'}):
+            response = self.client.get('/api/tasks/', params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(next(iter(params)), response.data)
+
+    def test_overdue_list_expires_at_next_due_date(self):
+        # Задача 'soon' станет просроченной через сутки, хотя ее нет в ответе
+        with self.settings(API_CACHE_TTL=7 * 24 * 60 * 60), mock.patch('tasks.cache.cache.set') as cache_set:
+            self.client.get('/api/tasks/', {'overdue': 'true', 'fields': 'id'})
+        timeout = cache_set.call_args[0][2]
+        self.assertLessEqual(timeout, 24 * 60 * 60 + 1)
+
+    def test_async_view_reports_invalid_parameters(self):
+        request = RequestFactory().get('/api/tasks/', {'ordering': 'title'}, HTTP_X_BOT_API_TOKEN=BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID='1001')
+        response = async_to_sync(async_views.task_list)(request)
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(PERF_METRICS_ENABLED=True, PERF_METRICS_FLUSH_INTERVAL=0)
+class PerformanceMetricsTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = get_telegram_user(1001)
+        create_tasks(cls.alice, 3)
+
+    def setUp(self):
+        cache.clear()
+        self.client.credentials(HTTP_X_BOT_API_TOKEN=BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID='1001')
+
+    def test_metrics_endpoint(self):
+        self.client.get('/api/tasks/')
+        self.client.get('/api/tasks/')
+        self.client.post('/api/tasks/', {'title': 'Новая'}, format='json')
+        body = self.client.get('/metrics').content.decode()
+
+        self.assertIn('# TYPE todo_http_request_duration_seconds histogram', body)
+        self.assertIn('todo_http_requests_total{view="task-list",method="GET",status="200"} 2', body)
+        self.assertIn('todo_http_requests_total{view="task-list",method="POST",status="201"} 1', body)
+        self.assertIn('todo_http_request_duration_seconds_bucket{view="task-list",method="GET",le="+Inf"} 2', body)
+        self.assertIn('todo_http_request_duration_seconds_count{view="task-list",method="GET"} 2', body)
+        # Первый запрос идет в базу, второй берет ответ из кэша
+        self.assertIn('todo_http_request_db_queries_bucket{view="task-list",method="GET",le="1"} 1', body)
+        self.assertRegex(body, r'todo_http_request_serialize_seconds_total\{view="task-list",method="GET"\} 0\.\d+')
+
+    @override_settings(PERF_N_PLUS_ONE_THRESHOLD=5, PERF_SLOW_REQUEST_MS=60_000)
+    def test_n_plus_one_is_logged(self):
+        def view(request):
+            # Пользователь задачи читается отдельным запросом на каждую задачу
+            for _ in range(2):
+                for task in Task.objects.all():
+                    task.user.username
+            return HttpResponse()
+
+        with self.assertLogs('tasks.metrics', 'WARNING') as logs:
+            PerformanceMiddleware(view)(RequestFactory().get('/n-plus-one/'))
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('Возможный N+1 в GET /n-plus-one/ (unmatched): запрос выполнен 6 раз', logs.output[0])
+        self.assertIn('FROM "auth_user"', logs.output[0])
+
+    @override_settings(PERF_SLOW_REQUEST_MS=0)
+    def test_slow_request_is_logged_with_sql(self):
+        with self.assertLogs('tasks.metrics', 'WARNING') as logs:
+            self.client.get('/api/tasks/')
+        self.assertIn('Медленный запрос GET /api/tasks/ (task-list)', logs.output[0])
+        self.assertIn('FROM "tasks_task"', logs.output[0])
+
+    @override_settings(PERF_METRICS_ENABLED=False)
+    def test_disabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            PerformanceMiddleware(lambda request: HttpResponse())
+
+
+class TaskExportTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = get_telegram_user(1001)
+        work = Category.objects.create(id='work', name='Работа')
+        home = Category.objects.create(id='home', name='Дом')
+        now = timezone.now()
+        Task.objects.bulk_create([
+            Task(id=f'task-{i}', title=f'Задача {i}', description='Длинное описание, ' * 10, user=cls.alice,
+                 created_date=now - timedelta(minutes=i), completed=i == 4,
+                 due_date=now - timedelta(days=1) if i == 0 else None)
+            for i in range(5)
+        ])
+        Task.objects.get(id='task-0').categories.add(work, home)
+        Task.objects.get(id='task-3').categories.add(work)
+        Task.objects.create(title='Чужая задача', user=get_telegram_user(1002))
+
+    def setUp(self):
+        self.client.credentials(HTTP_X_BOT_API_TOKEN=BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID='1001')
+
+    def export(self, **params):
+        response = self.client.get('/api/tasks/export/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode('utf-8')
+
+    def test_ndjson(self):
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        tasks = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([task['id'] for task in tasks], [f'task-{i}' for i in range(5)])
+        self.assertEqual(tasks[0]['categories'], [{'id': 'home', 'name': 'Дом'}, {'id': 'work', 'name': 'Работа'}])
+        self.assertTrue(tasks[0]['is_overdue'])
+        # Описание целиком, не обрезанное, как в списке
+        self.assertEqual(tasks[1]['description'], 'Длинное описание, ' * 10)
+        list_task = self.client.get('/api/tasks/').data['results'][1]
+        self.assertEqual(tasks[1]['created_date'], list_task['created_date'])
+
+    def test_csv_with_filters_and_fields(self):
+        response, body = self.export(format='csv', completed='false', fields='title,categories')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="tasks.csv"')
+        self.assertEqual(body.lstrip('\ufeff').splitlines(), [
+            'title,categories', 'Задача 0,"Дом, Работа"', 'Задача 1,', 'Задача 2,', 'Задача 3,Работа',
+        ])
+
+    def test_categories_are_loaded_per_chunk(self):
+        with mock.patch('tasks.export.EXPORT_CHUNK_SIZE', 2), CaptureQueriesContext(connection) as queries:
+            self.export()
+        category_queries = [query for query in queries if 'tasks_task_categories' in query['sql']]
+        self.assertEqual(len(category_queries), 3)
+
+    def test_invalid_filter(self):
+        response = self.client.get('/api/tasks/export/', {'overdue': 'maybe'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/tasks/export/', {'fields': 'bogus'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_async_iteration(self):
+        async def consume():
+            return [chunk async for chunk in aiter_chunks(iter([b'a', b'b']))]
+        self.assertEqual(async_to_sync(consume)(), [b'a', b'b'])
+
+
+class TaskImportTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = get_telegram_user(1001)
+        Category.objects.create(id='work', name='Работа')
+
+    def setUp(self):
+        self.client.credentials(HTTP_X_BOT_API_TOKEN=BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID='1001')
+
+    def run_import(self, content, **kwargs):
+        return TaskImporter(self.alice, **kwargs).run(io.BytesIO(content.encode('utf-8')))
+
+    def test_csv(self):
+        report = self.run_import(
+            '\ufeffid,title,description,completed,due_date,created_date,is_overdue,categories\n'
+            'old-id,Отчет,"Описание, с запятой",true,2020-01-10T12:00:00Z,2020-01-01T12:00:00Z,false,"Работа, Дом"\n'
+            ',Звонок,,,2030-01-01,,,\n'
+        )
+        self.assertEqual((report['rows'], report['created'], report['error_count']), (2, 2, 0))
+        task = Task.objects.get(user=self.alice, title='Отчет')
+        # id из файла не переносится: у задачи новый ключ
+        self.assertNotEqual(task.pk, 'old-id')
+        self.assertEqual(task.description, 'Описание, с запятой')
+        self.assertTrue(task.completed)
+        self.assertEqual(task.created_date, datetime(2020, 1, 1, 12, tzinfo=dt_timezone.utc))
+        self.assertEqual(sorted(task.categories.values_list('name', flat=True)), ['Дом', 'Работа'])
+        self.assertEqual(task.categories.get(name='Работа').pk, 'work')
+        self.assertEqual(Task.objects.get(title='Звонок').due_date.date(), date(2030, 1, 1))
+
+    def test_ndjson_with_row_errors(self):
+        rows = [
+            {'title': 'Первая', 'categories': [{'id': 'x', 'name': 'Дом'}]},
+            {'title': ''},
+            'не JSON',
+            {'title': 'Дедлайн раньше создания', 'created_date': '2024-02-01', 'due_date': '2024-01-01'},
+            {'title': 'Вторая', 'completed': 'maybe', 'due_date': 'завтра'},
+            {'title': 'Третья', 'categories': ['Дом']},
+        ]
+        content = '\n'.join(row if isinstance(row, str) else json.dumps(row, ensure_ascii=False) for row in rows)
+        report = self.run_import(content, batch_size=2)
+        self.assertEqual((report['rows'], report['created'], report['error_count']), (6, 2, 4))
+        self.assertEqual([error['line'] for error in report['errors']], [2, 3, 4, 5])
+        self.assertEqual(report['errors'][1]['errors'], {'row': 'Invalid JSON'})
+        self.assertEqual(set(report['errors'][3]['errors']), {'completed', 'due_date'})
+        self.assertEqual(Category.objects.filter(name='Дом').count(), 1)
+
+    def test_categories_are_resolved_once(self):
+        content = 'title,categories\n' + ''.join(f'Задача {i},"Работа, Новая"\n' for i in range(6))
+        with CaptureQueriesContext(connection) as queries:
+            report = self.run_import(content, batch_size=2)
+        self.assertEqual(report['created'], 6)
+        # Поиск и перечитывание созданной категории — на весь импорт, а не на каждую пачку
+        category_queries = [query for query in queries if 'FROM "tasks_category"' in query['sql']]
+        self.assertEqual(len(category_queries), 2)
+        self.assertEqual(Task.categories.through.objects.filter(task__user=self.alice).count(), 12)
+
+    def test_invalid_utf8_stops_import_with_report(self):
+        content = 'title\nПервая\nВторая\nТретья\n'.encode('utf-8') + b'\xff\xfe\n' + 'Пятая\n'.encode('utf-8')
+        report = TaskImporter(self.alice, batch_size=2).run(io.BytesIO(content))
+        self.assertEqual((report['rows'], report['created'], report['error_count']), (3, 3, 1))
+        self.assertEqual(report['errors'][0]['line'], 5)
+        self.assertIn('3 tasks created', report['errors'][0]['errors']['file'])
+        self.assertEqual(sorted(Task.objects.filter(user=self.alice).values_list('title', flat=True)),
+                         ['Вторая', 'Первая', 'Третья'])
+
+        upload = SimpleUploadedFile('tasks.csv', b'title\n\xc3\x28\n', content_type='text/csv')
+        response = self.client.post('/api/tasks/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['errors'][0]['line']), (0, 2))
+
+    def test_overdue_tasks_are_marked_notified(self):
+        report = self.run_import('title,due_date,created_date\nПросрочена,2020-01-01,2019-12-01\nВ будущем,2030-01-01,\n')
+        self.assertEqual(report['created'], 2)
+        self.assertIsNotNone(Task.objects.get(title='Просрочена').notified_at)
+        self.assertIsNone(Task.objects.get(title='В будущем').notified_at)
+
+    def test_export_round_trip(self):
+        task = Task.objects.create(title='Задача', description='Описание', user=get_telegram_user(1002),
+                                   due_date=timezone.now() + timedelta(days=1))
+        task.categories.add(Category.objects.get(pk='work'))
+        self.client.credentials(HTTP_X_BOT_API_TOKEN=BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID='1002')
+        for file_format in ('csv', 'ndjson'):
+            response = self.client.get('/api/tasks/export/', {'format': file_format})
+            report = self.run_import(b''.join(response.streaming_content).decode('utf-8'))
+            self.assertEqual((report['created'], report['error_count']), (1, 0))
+        imported = Task.objects.filter(user=self.alice)
+        self.assertEqual(imported.count(), 2)
+        for copy in imported:
+            self.assertEqual((copy.title, copy.description, copy.due_date, copy.created_date),
+                             (task.title, task.description, task.due_date, task.created_date))
+            self.assertEqual(list(copy.categories.values_list('pk', flat=True)), ['work'])
+
+    def test_upload_endpoint(self):
+        upload = SimpleUploadedFile('tasks.csv', 'title\nИз файла\n\n'.encode('utf-8'), content_type='text/csv')
+        response = self.client.post('/api/tasks/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['error_count']), (1, 0))
+        self.assertEqual(self.client.get('/api/tasks/').data['results'][0]['title'], 'Из файла')
+
+        response = self.client.post('/api/tasks/import/', {}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+
+    def test_command(self):
+        path = self.tmp_file('title\nИз команды\nНет\n')
+        out = io.StringIO()
+        call_command('import_tasks', path, '--telegram-id', '1003', stdout=out)
+        self.assertIn('создано задач: 2', out.getvalue())
+        self.assertEqual(Task.objects.filter(user=get_telegram_user(1003)).count(), 2)
+
+    def tmp_file(self, content):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8', delete=False) as f:
+            f.write(content)
+        self.addCleanup(os.remove, f.name)
+        return f.name
+
+
+class SeedBenchTests(APITestCase):
+    def test_seed_is_repeatable_and_cleaned_up(self):
+        call_command('seed_bench', users=3, tasks=20, categories=4, batch_size=7, stdout=io.StringIO())
+        call_command('seed_bench', users=3, tasks=20, categories=4, stdout=io.StringIO())
+
+        self.assertEqual(Task.objects.count(), 60)
+        self.assertEqual(Category.objects.filter(name__startswith='Бенчмарк ').count(), 4)
+        self.assertTrue(Task.categories.through.objects.exists())
+        # Пользователи стенда работают с API по своим Telegram ID
+        response = self.client.get('/api/tasks/', HTTP_X_BOT_API_TOKEN=BOT_API_TOKEN, HTTP_X_TELEGRAM_USER_ID=str(SEED_BENCH_TELEGRAM_ID + 2))
+        self.assertEqual(response.data['count'], 20)
+
+        call_command('seed_bench', cleanup=True, stdout=io.StringIO())
+        self.assertFalse(Task.objects.exists())
+        self.assertFalse(Category.objects.exists())
+
+
+class FastJSONTests(TestCase):
+    data = {
+        'created_date': datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc),
+        'due_date': datetime(2025, 1, 2, 3, 4, 5, tzinfo=dt_timezone(timedelta(hours=3))),
+        'date': date(2025, 1, 2),
+        'amount': Decimal('12.50'),
+        'title': 'Купить молоко 🥛',
+        'separator': 'строка\u2028абзац\u2029',
+        'nested': [{'id': 1, 2: None}],
+    }
+
+    def test_renderer_matches_drf(self):
+        self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+
+    def test_renderer_falls_back_without_orjson(self):
+        with mock.patch('tasks.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+
+    def test_indent_uses_standard_renderer(self):
+        rendered = FastJSONRenderer().render(self.data, 'application/json; indent=2')
+        self.assertEqual(rendered, JSONRenderer().render(self.data, 'application/json; indent=2'))
+
+    def test_parser_matches_drf(self):
+        body = '{"title": "Задача", "ids": [1, 2.5, null], "ok": true}'.encode()
+        self.assertEqual(
+            FastJSONParser().parse(io.BytesIO(body)),
+            JSONParser().parse(io.BytesIO(body)),
+        )
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b'{"value": NaN}'))
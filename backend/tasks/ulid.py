@@ -0,0 +1,60 @@
+"""Генерация первичных ключей в формате ULID.
+
+ULID — 128 бит: 48 бит времени в миллисекундах и 80 случайных бит,
+записанные 26 символами Crockford base32. Строки сортируются так же,
+как время создания, а в пределах одной миллисекунды процесс просто
+увеличивает случайную часть, поэтому ключи монотонны и не повторяются.
+"""
+import os
+import secrets
+import threading
+import time
+
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+LENGTH = 26
+RANDOM_BITS = 80
+RANDOM_MAX = (1 << RANDOM_BITS) - 1
+
+_lock = threading.Lock()
+_last_ms = -1
+_last_random = 0
+
+
+def _reset_state():
+    # Дочерний процесс не должен продолжать последовательность родителя,
+    # иначе два воркера в одну миллисекунду выдадут одинаковые ключи
+    global _last_ms, _last_random
+    _last_ms = -1
+    _last_random = 0
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_state)
+
+
+# Кодируем по 10 бит за шаг: вдвое меньше итераций, чем посимвольно
+_PAIRS = [a + b for a in ALPHABET for b in ALPHABET]
+
+
+def encode(ms, random):
+    value = (ms << RANDOM_BITS) | random
+    return ''.join([_PAIRS[(value >> shift) & 1023] for shift in range(120, -1, -10)])
+
+
+def new_ulid():
+    global _last_ms, _last_random
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms <= _last_ms:
+            # Та же миллисекунда (или часы сдвинулись назад) — продолжаем последовательность
+            ms = _last_ms
+            random = _last_random + 1
+            if random > RANDOM_MAX:
+                ms += 1
+                random = secrets.randbits(RANDOM_BITS - 1)
+        else:
+            # Старший бит случайной части оставляем нулевым, чтобы хватило места для инкрементов
+            random = secrets.randbits(RANDOM_BITS - 1)
+        _last_ms = ms
+        _last_random = random
+    return encode(ms, random)
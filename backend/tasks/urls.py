@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TaskViewSet, CategoryViewSet, UserViewSet
+from . import async_views
+from .views import TaskViewSet, CategoryViewSet, UserViewSet, cache_stats
 
 router = DefaultRouter()
 router.register(r'tasks', TaskViewSet)
@@ -8,5 +10,18 @@ router.register(r'categories', CategoryViewSet)
 router.register(r'users', UserViewSet)
 
 urlpatterns = [
+    path('cache/stats/', cache_stats, name='cache-stats'),
+]
+
+if settings.ASYNC_API_VIEWS:
+    # Частые GET обслуживают асинхронные представления, остальные методы они передают вьюсетам
+    urlpatterns += [
+        # Те же имена, что у маршрутов роутера: на них опираются reverse() и метки метрик
+        path('tasks/', async_views.task_list, name='task-list'),
+        path('categories/', async_views.category_list, name='category-list'),
+        path('categories/check_category/', async_views.check_category, name='category-check-category'),
+    ]
+
+urlpatterns += [
     path('', include(router.urls)),
-]
\ No newline at end of file
+]
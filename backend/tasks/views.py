@@ -1,30 +1,386 @@
 from rest_framework import viewsets, permissions, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from django.contrib.auth.models import User
-from django.db.models import Q
-from .models import Task, Category
-from .serializers import TaskSerializer, CategorySerializer, UserSerializer
+from django.contrib.postgres.search import SearchRank
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import BooleanField, Case, ExpressionWrapper, F, Min, Prefetch, Q, TextField, Value, When
+from django.db.models.functions import Concat, Length, Lower, Now, Substr
+from django.db.models.lookups import GreaterThan
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .cache import (
+    CATEGORIES_VERSION_KEY, CachedListMixin, bump_task_lists, get_stats, task_list_version_key,
+)
+from .export import aiter_chunks, csv_chunks, ndjson_chunks
+from .importer import TaskImporter, parse_bool, parse_iso_datetime
+from .models import Task, Category, search_query
+from .pagination import TaskCursorPagination, TaskPagination
+from .renderers import CSVRenderer, NDJSONRenderer
+from .serializers import (
+    TaskSerializer, TaskListSerializer, CategorySerializer, UserSerializer, assign_pks, resolve_categories,
+)
+
+# Ограничение на число имен в одном запросе check_categories
+MAX_CATEGORY_NAMES = 100
+# Ограничение на число задач в одном запросе bulk_create/bulk_update/bulk_delete
+MAX_BULK_TASKS = 500
+# Сколько символов описания отдает список задач; полное описание — в карточке задачи
+LIST_DESCRIPTION_LENGTH = 50
+# Допустимые ?ordering= списка задач; created_date и id в конце делают порядок однозначным
+LIST_ORDERINGS = {
+    'due_date': (F('due_date').asc(nulls_last=True), '-created_date', '-id'),
+    '-due_date': (F('due_date').desc(nulls_last=True), '-created_date', '-id'),
+    'created_date': ('created_date', 'id'),
+    '-created_date': ('-created_date', '-id'),
+}
 
 class IsOwner(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         return obj.user == request.user
 
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(CachedListMixin, viewsets.ModelViewSet):
     queryset = Task.objects.all()
     serializer_class = TaskSerializer
-    permission_classes = [permissions.AllowAny]
+    # Задачи есть только у пользователя из X-Telegram-User-Id (или сессии)
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TaskPagination
+    cache_name = 'tasks'
+    
+    @property
+    def paginator(self):
+        # ?pagination=cursor включает keyset-пагинацию вместо постраничной
+        if (not hasattr(self, '_paginator') and self.request is not None
+                and self.request.query_params.get('pagination') == 'cursor'):
+            self._paginator = TaskCursorPagination()
+        return super().paginator
+    
+    def get_owned_tasks(self):
+        if not self.request.user.is_authenticated:
+            return Task.objects.none()
+        return Task.objects.filter(user=self.request.user)
     
     def get_queryset(self):
-        return Task.objects.all()
+        if self.action == 'list':
+            queryset = self.filter_list(self.get_list_queryset(self.get_list_fields()))
+            return self.order_list(self.search(queryset))
+        # Категории подгружаются одним запросом на страницу, а не по запросу на задачу
+        return self.get_owned_tasks().prefetch_related('categories')
+    
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return TaskListSerializer
+        return TaskSerializer
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == 'list':
+            context['fields'] = self.get_list_fields()
+        return context
+    
+    def get_list_fields(self):
+        """Поля из ?fields=id,title,...; неизвестные имена игнорируются, но хотя бы одно должно быть известным"""
+        requested = self.request.query_params.get('fields')
+        if not requested:
+            return TaskListSerializer.Meta.fields
+        requested = {name.strip() for name in requested.split(',')}
+        fields = [name for name in TaskListSerializer.Meta.fields if name in requested]
+        if not fields:
+            raise ValidationError({'fields': f"Expected some of: {', '.join(TaskListSerializer.Meta.fields)}"})
+        return fields
+    
+    def get_list_queryset(self, fields):
+        """Читает только нужные столбцы; описание обрезается, а is_overdue считается в SQL"""
+        # created_date и id нужны пагинации даже без ?fields=
+        columns = {'id', 'created_date'} | {name for name in ('title', 'completed', 'due_date') if name in fields}
+        queryset = self.get_owned_tasks().only(*columns)
+        if 'description' in fields:
+            queryset = queryset.annotate(description_preview=Case(
+                When(
+                    GreaterThan(Length('description'), LIST_DESCRIPTION_LENGTH),
+                    then=Concat(Substr('description', 1, LIST_DESCRIPTION_LENGTH), Value('...')),
+                ),
+                default='description',
+                output_field=TextField(),
+            ))
+        if 'is_overdue' in fields:
+            # Не is_overdue: так называется свойство модели, которое считает то же самое в Python
+            queryset = queryset.annotate(overdue=ExpressionWrapper(
+                Q(completed=False, due_date__isnull=False, due_date__lt=Now()),
+                output_field=BooleanField(),
+            ))
+        if 'categories' in fields:
+            queryset = queryset.prefetch_related(Prefetch('categories', queryset=Category.objects.only('id', 'name')))
+        return queryset
+    
+    def get_bool_param(self, name):
+        try:
+            return parse_bool(self.request.query_params.get(name))
+        except ValueError:
+            raise ValidationError({name: 'Expected true or false'})
+    
+    def get_date_param(self, name):
+        """Дата или дата и время в ISO 8601; дата без времени — начало дня"""
+        try:
+            return parse_iso_datetime(self.request.query_params.get(name))
+        except ValueError:
+            raise ValidationError({name: 'Expected ISO 8601 date or datetime'})
+    
+    def filter_list(self, queryset):
+        """?completed=, ?overdue=, ?due_before=, ?due_after= и ?category=<id>.
+
+        Открытые задачи по дедлайну читаются из частичного индекса task_open_due_idx.
+        """
+        completed = self.get_bool_param('completed')
+        if completed is not None:
+            queryset = queryset.filter(completed=completed)
+        overdue = self.get_bool_param('overdue')
+        if overdue is not None:
+            condition = Q(completed=False, due_date__lt=Now())
+            queryset = queryset.filter(condition) if overdue else queryset.exclude(condition)
+        due_before = self.get_date_param('due_before')
+        if due_before is not None:
+            queryset = queryset.filter(due_date__lt=due_before)
+        due_after = self.get_date_param('due_after')
+        if due_after is not None:
+            queryset = queryset.filter(due_date__gte=due_after)
+        category = self.request.query_params.get('category')
+        if category:
+            queryset = queryset.filter(categories__id=category)
+        return queryset
+    
+    def order_list(self, queryset):
+        """?ordering=due_date|-due_date|created_date|-created_date для постраничного списка"""
+        ordering = self.request.query_params.get('ordering')
+        if not ordering:
+            return queryset
+        if ordering not in LIST_ORDERINGS:
+            raise ValidationError({'ordering': f"Expected one of: {', '.join(LIST_ORDERINGS)}"})
+        if isinstance(self.paginator, TaskCursorPagination):
+            # Курсор строится по created_date; по дедлайну, который бывает пустым, он не работает
+            if ordering != '-created_date':
+                raise ValidationError({'ordering': 'Only -created_date is supported with pagination=cursor'})
+            return queryset
+        return queryset.order_by(*LIST_ORDERINGS[ordering])
+    
+    def search(self, queryset):
+        """?q= — полнотекстовый поиск по названию и описанию, самые релевантные задачи первыми"""
+        text = self.request.query_params.get('q', '').strip()
+        if not text:
+            return queryset
+        query = search_query(text)
+        queryset = queryset.filter(search_vector=query)
+        if isinstance(self.paginator, TaskCursorPagination):
+            # Keyset-пагинация держится на порядке по дате, релевантность она не учитывает
+            return queryset
+        return queryset.annotate(rank=SearchRank(F('search_vector'), query)).order_by('-rank', '-created_date', '-id')
+    
+    def get_cache_version_keys(self):
+        return [task_list_version_key(self.request.user.id), CATEGORIES_VERSION_KEY]
+    
+    async def aget_cache_version_keys(self):
+        return self.get_cache_version_keys()
+    
+    def get_cache_timeout(self, data):
+        # is_overdue зависит от текущего времени: ответ живет не дольше ближайшего дедлайна на странице
+        timeout = super().get_cache_timeout(data)
+        tasks = data['results'] if isinstance(data, dict) else data
+        # С ?overdue= от времени зависит и сам состав списка
+        filters_by_time = 'overdue' in self.request.query_params
+        if not filters_by_time and not any('is_overdue' in task for task in tasks):
+            return timeout
+        now = timezone.now()
+        if not filters_by_time and all('due_date' in task and 'completed' in task for task in tasks):
+            due_dates = [
+                parse_datetime(task['due_date'])
+                for task in tasks if task['due_date'] and not task['completed']
+            ]
+        else:
+            # Ближайший дедлайн может быть не на странице: берем его из базы (индекс task_open_due_idx)
+            due_dates = [self.get_owned_tasks().filter(completed=False, due_date__gt=now)
+                         .aggregate(nearest=Min('due_date'))['nearest']]
+        for due_date in due_dates:
+            if due_date and due_date > now:
+                timeout = min(timeout, int((due_date - now).total_seconds()) + 1)
+        return timeout
+    
+    def get_owner(self):
+        # Анонимный запрос сюда не доходит: его отклоняет IsAuthenticated
+        return self.request.user
     
     def perform_create(self, serializer):
-        from django.contrib.auth.models import User
-        user, created = User.objects.get_or_create(
-            username='telegram_bot_user',
-            defaults={'email': 'bot@example.com'}
-        )
-        serializer.save(user=user)
+        serializer.save(user=self.get_owner())
+    
+    def get_bulk_items(self, key):
+        """Достает из тела запроса список для bulk-операции или возвращает ответ с ошибкой"""
+        items = self.request.data.get(key) if isinstance(self.request.data, dict) else None
+        if not isinstance(items, list):
+            return None, Response({'error': f'{key} must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > MAX_BULK_TASKS:
+            return None, Response({'error': f'At most {MAX_BULK_TASKS} items allowed'}, status=status.HTTP_400_BAD_REQUEST)
+        return items, None
+    
+    @staticmethod
+    def set_task_categories(task_categories):
+        """Заменяет категории у нескольких задач: один DELETE и один INSERT связей.
+
+        task_categories — словарь {задача: (category_ids, category_names)}.
+        """
+        if not task_categories:
+            return
+        all_ids = set()
+        all_names = set()
+        for category_ids, category_names in task_categories.values():
+            all_ids.update(category_ids)
+            all_names.update(category_names)
+        categories = resolve_categories(list(all_ids), list(all_names))
+        by_id = {category.id: category for category in categories}
+        by_name = {category.name: category for category in categories}
+        
+        Through = Task.categories.through
+        Through.objects.filter(task__in=list(task_categories)).delete()
+        links = {}
+        for task, (category_ids, category_names) in task_categories.items():
+            found = [by_id.get(category_id) for category_id in category_ids] + [by_name.get(name) for name in category_names]
+            for category in found:
+                if category is not None:
+                    links[task.pk, category.pk] = Through(task_id=task.pk, category_id=category.pk)
+        Through.objects.bulk_create(links.values())
+    
+    @action(detail=False, methods=['post'])
+    def bulk_create(self, request):
+        """Создает до MAX_BULK_TASKS задач: {"tasks": [...]} -> статус по каждой задаче"""
+        items, error = self.get_bulk_items('tasks')
+        if error:
+            return error
+        
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            serializer = TaskSerializer(data=item, context=self.get_serializer_context())
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results[index] = {'index': index, 'status': 'error', 'errors': serializer.errors}
+        
+        owner = self.get_owner()
+        categories = [
+            (validated_data.pop('category_ids', []), validated_data.pop('category_names', []))
+            for index, validated_data in valid
+        ]
+        tasks = assign_pks([Task(user=owner, **validated_data) for index, validated_data in valid])
+        task_categories = {
+            task: (category_ids, category_names)
+            for task, (category_ids, category_names) in zip(tasks, categories)
+            if category_ids or category_names
+        }
+        
+        with transaction.atomic():
+            Task.objects.bulk_create(tasks)
+            self.set_task_categories(task_categories)
+        # bulk_create и связи через through не отправляют сигналов
+        bump_task_lists([owner.id])
+        
+        for (index, validated_data), task in zip(valid, tasks):
+            results[index] = {'index': index, 'status': 'created', 'id': task.pk}
+        return Response({'created': len(tasks), 'results': results})
+    
+    @action(detail=False, methods=['post'])
+    def bulk_update(self, request):
+        """Частично обновляет до MAX_BULK_TASKS задач: {"tasks": [{"id": ..., <поля>}, ...]}"""
+        items, error = self.get_bulk_items('tasks')
+        if error:
+            return error
+        
+        results = [None] * len(items)
+        with transaction.atomic():
+            ids = [item.get('id') for item in items if isinstance(item, dict)]
+            tasks = self.get_owned_tasks().select_for_update().in_bulk([pk for pk in ids if isinstance(pk, str)])
+            
+            changed = set()
+            updated_fields = set()
+            task_categories = {}
+            for index, item in enumerate(items):
+                task = tasks.get(item.get('id')) if isinstance(item, dict) and isinstance(item.get('id'), str) else None
+                if task is None:
+                    results[index] = {'index': index, 'status': 'not_found'}
+                    continue
+                data = {key: value for key, value in item.items() if key != 'id'}
+                serializer = TaskSerializer(task, data=data, partial=True, context=self.get_serializer_context())
+                if not serializer.is_valid():
+                    results[index] = {'index': index, 'status': 'error', 'errors': serializer.errors}
+                    continue
+                
+                validated_data = dict(serializer.validated_data)
+                category_ids = validated_data.pop('category_ids', None)
+                category_names = validated_data.pop('category_names', None)
+                updated_fields |= serializer.assign(task, validated_data)
+                changed.add(task)
+                if category_ids is not None or category_names is not None:
+                    task_categories[task] = (category_ids or [], category_names or [])
+                results[index] = {'index': index, 'status': 'updated', 'id': task.pk}
+            
+            if updated_fields:
+                Task.objects.bulk_update(changed, sorted(updated_fields))
+            self.set_task_categories(task_categories)
+        bump_task_lists(task.user_id for task in changed)
+        return Response({'updated': len(changed), 'results': results})
+    
+    @action(detail=False, methods=['post'])
+    def bulk_delete(self, request):
+        """Удаляет до MAX_BULK_TASKS задач одним запросом: {"ids": [...]}"""
+        ids, error = self.get_bulk_items('ids')
+        if error:
+            return error
+        if not all(isinstance(pk, str) for pk in ids):
+            return Response({'error': 'ids must be a list of strings'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        with transaction.atomic():
+            owned = self.get_owned_tasks().filter(id__in=ids)
+            existing = set(owned.values_list('id', flat=True))
+            owned.delete()
+        
+        results = [
+            {'id': pk, 'status': 'deleted' if pk in existing else 'not_found'}
+            for pk in ids
+        ]
+        return Response({'deleted': len(existing), 'results': results})
+
+    @action(detail=False, methods=['get'], renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request):
+        """Все задачи потоком, с фильтрами, поиском, сортировкой и ?fields= списка.
+
+        ?format=ndjson (по умолчанию) — задача на строку, ?format=csv — с заголовком
+        и именами категорий через запятую. Описание не обрезается.
+        """
+        queryset = self.get_owned_tasks().order_by(*LIST_ORDERINGS['-created_date'])
+        queryset = self.order_list(self.search(self.filter_list(queryset)))
+        renderer = request.accepted_renderer
+        chunks = csv_chunks if renderer.format == 'csv' else ndjson_chunks
+        content = chunks(queryset, self.get_list_fields())
+        if isinstance(request._request, ASGIRequest):
+            content = aiter_chunks(content)
+        response = StreamingHttpResponse(content, content_type=f'{renderer.media_type}; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="tasks.{renderer.format}"'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_tasks(self, request):
+        """Импорт задач из файла CSV или NDJSON (поле file) в формате выгрузки.
+
+        Отвечает отчетом: сколько строк прочитано и создано, ошибки с номерами
+        строк, скорость в строках в секунду. Для миграций на сотни тысяч
+        строк удобнее команда import_tasks: запрос ограничен таймаутом воркера.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'file is required'}, status=status.HTTP_400_BAD_REQUEST)
+        report = TaskImporter(self.get_owner()).run(upload.file)
+        return Response(report)
 
     @action(detail=True, methods=['post'])
     def delete_task(self, request, pk=None):
@@ -35,10 +391,17 @@ class TaskViewSet(viewsets.ModelViewSet):
         except Task.DoesNotExist:
             return Response({'error': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(CachedListMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
+    cache_name = 'categories'
+    
+    def get_cache_version_keys(self):
+        return [CATEGORIES_VERSION_KEY]
+    
+    async def aget_cache_version_keys(self):
+        return self.get_cache_version_keys()
 
     @action(detail=False, methods=['post'])
     def create_category(self, request):
@@ -60,10 +423,41 @@ class CategoryViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def check_category(self, request):
         name = request.query_params.get('name', '')
-        exists = Category.objects.filter(name__iexact=name).exists()
+        exists = Category.objects.annotate(name_lower=Lower('name')).filter(name_lower=name.lower()).exists()
         return Response({'exists': exists})
 
+    @action(detail=False, methods=['post'])
+    def check_categories(self, request):
+        """Проверяет список имен одним запросом: {"names": [...]} -> существующие и недостающие"""
+        names = request.data.get('names') if isinstance(request.data, dict) else None
+        if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+            return Response({'error': 'names must be a list of strings'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(names) > MAX_CATEGORY_NAMES:
+            return Response({'error': f'At most {MAX_CATEGORY_NAMES} names allowed'}, status=status.HTTP_400_BAD_REQUEST)
+
+        names = list(dict.fromkeys(name.strip() for name in names if name.strip()))
+        found = {
+            category.name_lower: category
+            for category in Category.objects.annotate(name_lower=Lower('name'))
+                                            .filter(name_lower__in={name.lower() for name in names})
+        }
+
+        existing = {}
+        missing = []
+        for name in names:
+            category = found.get(name.lower())
+            if category is None:
+                missing.append(name)
+            else:
+                existing[category.id] = {'id': category.id, 'name': category.name}
+        return Response({'existing': list(existing.values()), 'missing': missing})
+
 class UserViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
-    permission_classes = [permissions.AllowAny]
\ No newline at end of file
+    permission_classes = [permissions.AllowAny]
+
+@api_view(['GET'])
+def cache_stats(request):
+    """Попадания и промахи кэша списков, общие для всех процессов backend"""
+    return Response(get_stats())
@@ -1,6 +1,8 @@
 import os
 from celery import Celery
+from celery.signals import task_postrun, task_prerun
 from django.conf import settings
+from django.db import close_old_connections
 from celery.schedules import crontab
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'todo.settings')
@@ -14,4 +16,12 @@ app.conf.beat_schedule = {
         'task': 'tasks.tasks.check_due_tasks',
         'schedule': crontab(minute='*/5'),  # Every 5 minutes
     },
-}
\ No newline at end of file
+}
+
+
+@task_prerun.connect
+@task_postrun.connect
+def close_stale_connections(**kwargs):
+    # В воркере нет request_started/request_finished: без этого CONN_MAX_AGE
+    # и проверки соединений не работают, а соединения живут вечно
+    close_old_connections()
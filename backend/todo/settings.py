@@ -19,12 +19,15 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'corsheaders',
     'tasks',
 ]
 
 MIDDLEWARE = [
+    # Первым, чтобы время запроса включало остальные middleware; без PERF_METRICS_ENABLED отключается
+    'tasks.metrics.PerformanceMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -54,6 +57,12 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'todo.wsgi.application'
+ASGI_APPLICATION = 'todo.asgi.application'
+
+# wsgi — синхронные воркеры gunicorn, asgi — воркеры uvicorn (см. gunicorn.conf.py)
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+# Асинхронные представления для списков задач и категорий и check_category; по умолчанию — под ASGI
+ASYNC_API_VIEWS = os.getenv('ASYNC_API_VIEWS', str(SERVER_MODE == 'asgi')).lower() == 'true'
 
 DATABASES = {
     'default': {
@@ -63,6 +72,15 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'todo_pass'),
         'HOST': os.getenv('POSTGRES_HOST', 'db'),
         'PORT': os.getenv('POSTGRES_PORT', '5432'),
+        # Соединение живет между запросами и задачами Celery, 0 — закрывать после каждого.
+        # Под ASGI каждый запрос работает с базой из своего потока и открывает свое
+        # соединение, поэтому там по умолчанию 0, а пул — PgBouncer
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE') or ('0' if SERVER_MODE == 'asgi' else '60')),
+        # Перед повторным использованием соединение проверяется, упавшее открывается заново
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', 'True').lower() == 'true',
+        # За PgBouncer в режиме transaction серверные курсоры (QuerySet.iterator())
+        # не переживают конец транзакции — их нужно отключить
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv('DB_DISABLE_SERVER_SIDE_CURSORS', 'False').lower() == 'true',
     }
 }
 
@@ -94,16 +112,81 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'tasks.authentication.TelegramUserAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+    # orjson, если установлен; иначе стандартный json с тем же выводом
+    'DEFAULT_RENDERER_CLASSES': [
+        'tasks.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'tasks.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',  # Временно для отладки
     ],
 }
 
+# CACHE_URL=redis://redis:6379/2 включает общий для всех процессов кэш в Redis,
+# без него используется кэш в памяти процесса
+if os.getenv('CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_URL'),
+            'KEY_PREFIX': 'todo',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Сколько секунд хранится закэшированный ответ списка задач или категорий
+API_CACHE_TTL = int(os.getenv('API_CACHE_TTL', '300'))
+
+# Redis для событий об изменении категорий, которые сбрасывают кэш категорий в боте
+CATEGORY_EVENTS_REDIS_URL = os.getenv('CATEGORY_EVENTS_REDIS_URL')
+
+# Метрики запросов на /metrics и лог медленных запросов и N+1 (tasks/metrics.py)
+PERF_METRICS_ENABLED = os.getenv('PERF_METRICS_ENABLED', 'False').lower() == 'true'
+# Запросы дольше стольких миллисекунд пишутся в лог вместе с самыми долгими SQL
+PERF_SLOW_REQUEST_MS = int(os.getenv('PERF_SLOW_REQUEST_MS', '500'))
+# Один и тот же SQL столько раз за запрос — признак N+1
+PERF_N_PLUS_ONE_THRESHOLD = int(os.getenv('PERF_N_PLUS_ONE_THRESHOLD', '10'))
+# Как часто воркер сбрасывает накопленные метрики в кэш, сек.; 0 — после каждого запроса
+PERF_METRICS_FLUSH_INTERVAL = float(os.getenv('PERF_METRICS_FLUSH_INTERVAL', '10'))
+
 CELERY_BROKER_URL = os.getenv('REDIS_URL', 'redis://redis:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('REDIS_URL', 'redis://redis:6379/0')
 
+# Сколько просроченных задач check_due_tasks кладет в одно сообщение очереди
+DUE_TASKS_BATCH_SIZE = int(os.getenv('DUE_TASKS_BATCH_SIZE', '500'))
+
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 
+# Адрес Bot API; для нагрузочных тестов можно указать локальную заглушку
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org')
+# Лимиты Telegram: ~30 сообщений в секунду на бота и ~1 в секунду в один чат.
+# Лимит действует на процесс воркера — при нескольких процессах делите его между ними
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '30'))
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', '1'))
+TELEGRAM_POOL_SIZE = int(os.getenv('TELEGRAM_POOL_SIZE', '10'))
+
+# Общий секрет бота и backend: без верного X-Bot-Api-Token заголовок X-Telegram-User-Id
+# не принимается. Пустое значение отключает аутентификацию по Telegram ID целиком
+BOT_API_TOKEN = os.getenv('BOT_API_TOKEN', '')
+
+# Telegram ID владельца задач, созданных ботом до привязки задач к пользователям
+TELEGRAM_LEGACY_OWNER_ID = os.getenv('TELEGRAM_LEGACY_OWNER_ID')
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
 ]
\ No newline at end of file
@@ -0,0 +1,264 @@
+import asyncio
+import json
+import logging
+import re
+import time
+from collections import OrderedDict, defaultdict, deque
+
+import aiohttp
+
+from metrics import add_api_time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Методы, которые безопасно повторять при ответе 5xx
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+# Сегмент пути, похожий на идентификатор, заменяется на {id},
+# чтобы метрики собирались по эндпоинту, а не по каждой задаче отдельно
+ID_SEGMENT_RE = re.compile(r'^[^/]*\d[^/]*$')
+
+LATENCY_SAMPLES = 1000
+
+# Сколько ответов с ETag помнить для условных GET
+ETAG_CACHE_SIZE = 1000
+
+# Заголовок с общим секретом бота и backend (BOT_API_TOKEN): без него backend
+# не принимает X-Telegram-User-Id
+BOT_API_TOKEN_HEADER = 'X-Bot-Api-Token'
+
+
+def json_loads(body):
+    """Разбирает тело ответа в байтах, без промежуточного декодирования в str"""
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+
+def json_dumps(data):
+    return orjson.dumps(data).decode() if orjson is not None else json.dumps(data)
+
+
+def endpoint_key(method, endpoint):
+    path = endpoint.split('?', 1)[0].strip('/')
+    parts = ['{id}' if ID_SEGMENT_RE.match(part) else part for part in path.split('/')]
+    return f"{method} {'/'.join(parts)}/"
+
+
+def percentile(samples, p):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class EndpointStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.not_modified = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def as_dict(self):
+        samples = list(self.latencies)
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'retries': self.retries,
+            'not_modified': self.not_modified,
+            'p50_ms': round(percentile(samples, 50) * 1000, 2),
+            'p95_ms': round(percentile(samples, 95) * 1000, 2),
+            'p99_ms': round(percentile(samples, 99) * 1000, 2),
+            'max_ms': round(max(samples, default=0.0) * 1000, 2),
+        }
+
+
+class ApiClient:
+    """Долгоживущий клиент Django API с пулом keep-alive соединений.
+
+    Создается один раз в main() и передается в хендлеры через dispatcher.
+    """
+
+    def __init__(self, base_url, pool_size=20, timeout=10.0, connect_timeout=3.0,
+                 retries=2, backoff=0.3, keepalive_timeout=30.0, token=None):
+        self.base_url = base_url.rstrip('/')
+        self.token = token
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.keepalive_timeout = keepalive_timeout
+
+        self._session = None
+        # (url, пользователь) -> (ETag, тело ответа); при 304 тело берется отсюда
+        self._etags = OrderedDict()
+        self._endpoints = defaultdict(EndpointStats)
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._connections_created = 0
+        self._connections_reused = 0
+
+    async def start(self):
+        if self._session is not None and not self._session.closed:
+            return
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_end.append(self._on_connection_create)
+        trace_config.on_connection_reuseconn.append(self._on_connection_reuse)
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size,
+            limit_per_host=self.pool_size,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        headers = {'Accept': 'application/json'}
+        if self.token:
+            headers[BOT_API_TOKEN_HEADER] = self.token
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=self.timeout,
+            headers=headers,
+            json_serialize=json_dumps,
+            trace_configs=[trace_config],
+        )
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _on_connection_create(self, session, context, params):
+        self._connections_created += 1
+
+    async def _on_connection_reuse(self, session, context, params):
+        self._connections_reused += 1
+
+    def _should_retry(self, method, attempt, status=None, error=None):
+        if attempt >= self.retries:
+            return False
+        if error is not None:
+            # Если соединение не удалось установить, запрос точно не ушел на сервер
+            if isinstance(error, aiohttp.ClientConnectorError):
+                return True
+            return method in IDEMPOTENT_METHODS
+        return status >= 500 and method in IDEMPOTENT_METHODS
+
+    async def request(self, endpoint, method='GET', data=None, headers=None):
+        """Выполняет запрос к API и возвращает JSON либо словарь с ключом 'error'."""
+        await self.start()
+        method = method.upper()
+        url = f"{self.base_url}/{endpoint}"
+        stats = self._endpoints[endpoint_key(method, endpoint)]
+        request_headers = {'Content-Type': 'application/json'}
+        if headers:
+            request_headers.update(headers)
+        etag_key = (url, request_headers.get('X-Telegram-User-Id')) if method == 'GET' else None
+        cached = self._etags.get(etag_key) if etag_key else None
+        if cached:
+            request_headers['If-None-Match'] = cached[0]
+
+        attempt = 0
+        started = time.perf_counter()
+        self._in_flight += 1
+        self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        try:
+            while True:
+                try:
+                    async with self._session.request(method, url, json=data, headers=request_headers) as response:
+                        if response.status == 304 and cached:
+                            stats.not_modified += 1
+                            self._etags.move_to_end(etag_key)
+                            result = json_loads(cached[1])
+                        else:
+                            result = await self._parse_response(response)
+                            if etag_key and response.status == 200 and response.headers.get('ETag'):
+                                self._remember_etag(etag_key, response.headers['ETag'], await response.read())
+                    if not self._should_retry(method, attempt, status=response.status):
+                        break
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if not self._should_retry(method, attempt, error=e):
+                        logger.exception("API request error: %s %s data=%s", method, url, data)
+                        result = {'error': True, 'message': 'Connection failed'}
+                        break
+                attempt += 1
+                stats.retries += 1
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+        finally:
+            self._in_flight -= 1
+            elapsed = time.perf_counter() - started
+            stats.count += 1
+            stats.latencies.append(elapsed)
+            add_api_time(elapsed)
+
+        if isinstance(result, dict) and result.get('error'):
+            stats.errors += 1
+        return result
+
+    def _remember_etag(self, key, etag, body):
+        self._etags[key] = (etag, body)
+        self._etags.move_to_end(key)
+        if len(self._etags) > ETAG_CACHE_SIZE:
+            self._etags.popitem(last=False)
+
+    async def _parse_response(self, response):
+        content_type = response.headers.get('Content-Type', '')
+        body = await response.read()
+
+        if 'application/json' not in content_type:
+            return {'error': True, 'status_code': response.status, 'message': 'Non-JSON response'}
+
+        if response.status >= 400:
+            return {'error': True, 'status_code': response.status, 'message': body.decode(errors='replace')}
+
+        try:
+            return json_loads(body)
+        except ValueError:
+            return {'error': True, 'message': 'Invalid JSON response'}
+
+    def stats(self):
+        return {
+            'pool': {
+                'limit': self.pool_size,
+                'in_flight': self._in_flight,
+                'peak_in_flight': self._peak_in_flight,
+                'connections_created': self._connections_created,
+                'connections_reused': self._connections_reused,
+            },
+            'endpoints': {key: value.as_dict() for key, value in sorted(self._endpoints.items())},
+        }
+
+    def dump_stats(self):
+        return json.dumps(self.stats(), ensure_ascii=False, indent=2)
+
+    def reset_stats(self):
+        self._endpoints.clear()
+        self._peak_in_flight = self._in_flight
+        self._connections_created = 0
+        self._connections_reused = 0
+
+
+class UserApiClient:
+    """Клиент API от имени конкретного пользователя Telegram.
+
+    Использует общий пул ApiClient и добавляет заголовок X-Telegram-User-Id,
+    по которому backend отдает только задачи этого пользователя.
+    """
+
+    def __init__(self, client, telegram_id):
+        self.client = client
+        self.telegram_id = telegram_id
+
+    async def request(self, endpoint, method='GET', data=None, headers=None):
+        headers = dict(headers or {})
+        headers['X-Telegram-User-Id'] = str(self.telegram_id)
+        return await self.client.request(endpoint, method, data, headers)
@@ -0,0 +1,88 @@
+"""Синтетическая нагрузка на эндпоинт «📋 Мои задачи».
+
+Сравнивает старый режим (новая ClientSession на каждый запрос)
+с общим пулом соединений ApiClient:
+
+    python bench_api.py --requests 500 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import aiohttp
+
+from api import BOT_API_TOKEN_HEADER, ApiClient, percentile
+
+# Задачи доступны только пользователю из X-Telegram-User-Id; backend создаст его при первом запросе
+BENCH_TELEGRAM_ID = 999_999_999_200
+
+
+def user_headers(telegram_id):
+    return {'X-Telegram-User-Id': str(telegram_id), BOT_API_TOKEN_HEADER: os.getenv('BOT_API_TOKEN', '')}
+
+
+async def run_session_per_request(base_url, endpoint, total, concurrency, telegram_id):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f"{base_url.rstrip('/')}/{endpoint}", headers=user_headers(telegram_id)) as response:
+                    await response.read()
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one() for _ in range(total)))
+    return latencies, None
+
+
+async def run_pooled(base_url, endpoint, total, concurrency, telegram_id):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with ApiClient(base_url, pool_size=concurrency, token=os.getenv('BOT_API_TOKEN')) as api:
+        async def one():
+            async with semaphore:
+                started = time.perf_counter()
+                await api.request(endpoint, headers={'X-Telegram-User-Id': str(telegram_id)})
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(one() for _ in range(total)))
+        return latencies, api.stats()
+
+
+def summarize(latencies, elapsed):
+    return {
+        'requests': len(latencies),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=os.getenv('DJANGO_API_URL', 'http://localhost:8000/api'))
+    parser.add_argument('--endpoint', default='tasks/')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--telegram-id', type=int, default=BENCH_TELEGRAM_ID)
+    args = parser.parse_args()
+
+    report = {}
+    for name, runner in (('session_per_request', run_session_per_request), ('pooled', run_pooled)):
+        started = time.perf_counter()
+        latencies, stats = await runner(args.url, args.endpoint, args.requests, args.concurrency, args.telegram_id)
+        report[name] = summarize(latencies, time.perf_counter() - started)
+        if stats:
+            report[name]['pool'] = stats['pool']
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
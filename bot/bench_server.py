@@ -0,0 +1,81 @@
+"""Нагрузочный тест backend: WSGI против ASGI на одних и тех же запросах.
+
+Смесь самых частых запросов бота — «📋 Мои задачи» (курсорная пагинация),
+список категорий и check_category — от нескольких пользователей. Второй
+backend под ASGI можно поднять в том же контейнере на порту 8001:
+
+    docker-compose exec -d -e SERVER_MODE=asgi -e GUNICORN_BIND=0.0.0.0:8001 backend gunicorn -c gunicorn.conf.py
+    python bench_server.py wsgi=http://backend:8000/api asgi=http://backend:8001/api
+
+С --bust-cache каждый запрос получает уникальный URL и проходит мимо кэша ответов.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import aiohttp
+
+from api import BOT_API_TOKEN_HEADER
+from bench_api import summarize
+
+ENDPOINTS = ('tasks/?pagination=cursor', 'categories/', 'categories/check_category/?name=Работа')
+# Telegram ID пользователей нагрузочного теста; backend создаст их при первом запросе
+BENCH_TELEGRAM_ID = 999_999_999_100
+
+
+async def run(base_url, total, concurrency, users, bust_cache):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        async def one(i, measure=True):
+            nonlocal errors
+            endpoint = ENDPOINTS[i % len(ENDPOINTS)]
+            if bust_cache:
+                endpoint += f"{'&' if '?' in endpoint else '?'}_={time.time_ns()}"
+            headers = {'X-Telegram-User-Id': str(BENCH_TELEGRAM_ID + i % users),
+                       BOT_API_TOKEN_HEADER: os.getenv('BOT_API_TOKEN', '')}
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    async with session.get(f"{base_url.rstrip('/')}/{endpoint}", headers=headers) as response:
+                        await response.read()
+                        failed = response.status >= 400
+                except aiohttp.ClientError:
+                    failed = True
+                if measure:
+                    latencies.append(time.perf_counter() - started)
+                    errors += failed
+
+        # Прогрев: пользователи, соединения и кэш не должны попадать в замер
+        await asyncio.gather(*(one(i, measure=False) for i in range(users * len(ENDPOINTS))))
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+
+    report = summarize(latencies, elapsed)
+    report['errors'] = errors
+    return report
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('targets', nargs='+', metavar='NAME=URL', help='Адреса API для сравнения')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--bust-cache', action='store_true')
+    args = parser.parse_args()
+
+    report = {}
+    for target in args.targets:
+        name, _, url = target.partition('=')
+        report[name] = await run(url, args.requests, args.concurrency, args.users, args.bust_cache)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,290 @@
+"""Воспроизводимый нагрузочный тест API и бота с сохранением базовой линии.
+
+Данные засевает backend (пользователи стенда, их задачи и категории):
+
+    docker-compose exec backend python manage.py seed_bench --users 100 --tasks 1000 --categories 20
+
+Затем сценарии по очереди, каждый с фиксированной параллельностью:
+
+    tasks_list      GET tasks/?pagination=cursor — «📋 Мои задачи»
+    categories_list GET categories/
+    check_category  GET categories/check_category/?name=...
+    create_task     POST tasks/ с двумя категориями
+    bot_add_task    весь диалог «➕ Добавить задачу» в боте: хендлеры работают
+                    в этом процессе с настоящим backend и заглушкой Bot API
+
+    python bench_suite.py --output baseline.json
+    python bench_suite.py --baseline baseline.json   # код возврата 1 при регрессии
+
+Для каждого сценария в JSON: запросы, rps, p50/p95/p99, ошибки и число
+SQL-запросов на HTTP-запрос — из /metrics backend (PERF_METRICS_ENABLED=True;
+воркеры сбрасывают метрики раз в PERF_METRICS_FLUSH_INTERVAL секунд, его
+и стоит указать в --metrics-wait). Для bot_add_task — время диалога целиком
+и разбивка времени хендлеров на backend, Bot API и остальное.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+from urllib.parse import quote
+
+import aiohttp
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import Update
+
+from api import BOT_API_TOKEN_HEADER, ApiClient
+from bench_api import summarize
+from main import create_dispatcher
+from metrics import TelegramMetricsMiddleware, metrics
+from telegram_stub import TelegramStub
+
+# Совпадают с seed_bench в backend
+BENCH_TELEGRAM_ID = 999_999_000_000
+CATEGORY_PREFIX = 'Бенчмарк'
+SCENARIOS = ('tasks_list', 'categories_list', 'check_category', 'create_task', 'bot_add_task')
+# Насколько метрика может ухудшиться относительно базовой линии, прежде чем это регрессия
+DEFAULT_TOLERANCE = 0.2
+METRIC_LINE_RE = re.compile(r'^todo_http_request_db_queries_(sum|count)\{[^}]*\} (\S+)$', re.M)
+
+
+def http_scenario(name, base_url):
+    """Запрос сценария для i-го повторения: (метод, URL, тело)"""
+    base_url = base_url.rstrip('/')
+    if name == 'tasks_list':
+        return lambda i: ('GET', f'{base_url}/tasks/?pagination=cursor', None)
+    if name == 'categories_list':
+        return lambda i: ('GET', f'{base_url}/categories/', None)
+    if name == 'check_category':
+        return lambda i: ('GET', f"{base_url}/categories/check_category/?name={quote(f'{CATEGORY_PREFIX} {i % 20 + 1}')}", None)
+    if name == 'create_task':
+        return lambda i: ('POST', f'{base_url}/tasks/', {
+            'title': f'Задача нагрузочного теста {i}',
+            'description': 'Создана bench_suite.py',
+            'category_names': [f'{CATEGORY_PREFIX} 1', f'{CATEGORY_PREFIX} 2'],
+        })
+    raise ValueError(name)
+
+
+async def run_http(name, args):
+    make_request = http_scenario(name, args.url)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    errors = 0
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=args.concurrency)) as session:
+        async def one(i, measure=True):
+            nonlocal errors
+            method, url, body = make_request(i)
+            if args.bust_cache and method == 'GET':
+                url += f"{'&' if '?' in url else '?'}_={time.time_ns()}"
+            headers = {'X-Telegram-User-Id': str(BENCH_TELEGRAM_ID + i % args.users),
+                       BOT_API_TOKEN_HEADER: os.getenv('BOT_API_TOKEN', '')}
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    async with session.request(method, url, json=body, headers=headers) as response:
+                        await response.read()
+                        failed = response.status >= 400
+                except aiohttp.ClientError:
+                    failed = True
+                if measure:
+                    latencies.append(time.perf_counter() - started)
+                    errors += failed
+
+        # Прогрев: соединения и кэш каждого пользователя не должны попадать в замер
+        if name != 'create_task':
+            await asyncio.gather(*(one(i, measure=False) for i in range(args.users)))
+        queries = await DbQueries.start(session, args)
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - started
+        report = summarize(latencies, elapsed)
+        report['errors'] = errors
+        report['db_queries_per_request'] = await queries.finish()
+    return report
+
+
+class DbQueries:
+    """Среднее число SQL-запросов на HTTP-запрос по приросту счетчиков /metrics backend"""
+
+    def __init__(self, session, args, before):
+        self.session = session
+        self.args = args
+        self.before = before
+
+    @classmethod
+    async def start(cls, session, args):
+        return cls(session, args, await cls.scrape(session, args))
+
+    @staticmethod
+    async def scrape(session, args):
+        if not args.metrics_url:
+            return None
+        try:
+            async with session.get(args.metrics_url) as response:
+                text = await response.text()
+        except aiohttp.ClientError:
+            return None
+        totals = defaultdict(float)
+        for kind, value in METRIC_LINE_RE.findall(text):
+            totals[kind] += float(value)
+        return totals if totals else None
+
+    async def finish(self):
+        if self.before is None:
+            return None
+        await asyncio.sleep(self.args.metrics_wait)
+        after = await self.scrape(self.session, self.args)
+        if after is None or after['count'] <= self.before['count']:
+            return None
+        return round((after['sum'] - self.before['sum']) / (after['count'] - self.before['count']), 2)
+
+
+def add_task_conversation(telegram_id, i):
+    texts = [
+        '➕ Добавить задачу',
+        f'Задача из диалога {i}',
+        'Описание задачи из нагрузочного теста',
+        '31.12.2030',
+        f'{CATEGORY_PREFIX} 1, {CATEGORY_PREFIX} 2',
+    ]
+    return [
+        {
+            'update_id': i * len(texts) + step + 1,
+            'message': {
+                'message_id': step + 1,
+                'date': int(time.time()),
+                'chat': {'id': telegram_id, 'type': 'private'},
+                'from': {'id': telegram_id, 'is_bot': False, 'first_name': f'User {telegram_id}'},
+                'text': text,
+            },
+        }
+        for step, text in enumerate(texts)
+    ]
+
+
+async def run_bot_add_task(args):
+    """Диалоги разных пользователей идут параллельно, шаги одного диалога — по очереди, как в Telegram"""
+    stub = TelegramStub(port=args.stub_port)
+    await stub.start()
+    session = AiohttpSession(api=TelegramAPIServer.from_base(stub.url))
+    session.middleware(TelegramMetricsMiddleware())
+    bot = Bot('123456:BENCH', session=session)
+    api = ApiClient(args.url, pool_size=args.concurrency, token=os.getenv('BOT_API_TOKEN'))
+    dp = create_dispatcher(api)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    errors = 0
+
+    async def conversation(i):
+        nonlocal errors
+        updates = add_task_conversation(BENCH_TELEGRAM_ID + i % args.users, i)
+        async with semaphore:
+            started = time.perf_counter()
+            for update in updates:
+                try:
+                    await dp.feed_update(bot, Update.model_validate(update, context={'bot': bot}))
+                except Exception:
+                    errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    try:
+        await api.start()
+        async with aiohttp.ClientSession() as http:
+            queries = await DbQueries.start(http, args)
+            metrics.histograms.clear()
+            started = time.perf_counter()
+            await asyncio.gather(*(conversation(i) for i in range(args.conversations)))
+            elapsed = time.perf_counter() - started
+            report = summarize(latencies, elapsed)
+            report['errors'] = errors + sum(stats['errors'] for stats in api.stats()['endpoints'].values())
+            report['db_queries_per_request'] = await queries.finish()
+    finally:
+        await api.close()
+        await bot.session.close()
+        await dp.storage.close()
+        await stub.stop()
+    report['handlers'] = handler_breakdown()
+    return report
+
+
+def handler_breakdown():
+    """Среднее время хендлеров диалога и его части по гистограммам метрик бота, мс"""
+    result = defaultdict(dict)
+    for (family, labels), histogram in metrics.histograms.items():
+        if family == 'todo_bot_handler_part_seconds' and histogram.count:
+            labels = dict(labels)
+            result[labels['handler']][f"{labels['part']}_ms"] = round(histogram.sum / histogram.count * 1000, 2)
+    return dict(sorted(result.items()))
+
+
+def compare(report, baseline, tolerance):
+    """Список регрессий относительно базовой линии"""
+    regressions = []
+    for name, current in report['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(name)
+        if not base:
+            continue
+        if current['errors'] > base.get('errors', 0):
+            regressions.append(f"{name}: ошибок {current['errors']} (было {base.get('errors', 0)})")
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if base.get(key) and current[key] > base[key] * (1 + tolerance):
+                regressions.append(f'{name}: {key} {current[key]} (было {base[key]})')
+        if base.get('rps') and current['rps'] < base['rps'] * (1 - tolerance):
+            regressions.append(f"{name}: rps {current['rps']} (было {base['rps']})")
+        # Число SQL шумит меньше задержек, но зависит от попаданий в кэш ответов,
+        # поэтому регрессия — рост больше допуска и хотя бы на ползапроса (N+1 дает кратный рост)
+        queries, base_queries = current.get('db_queries_per_request'), base.get('db_queries_per_request')
+        if queries is not None and base_queries is not None and queries > base_queries * (1 + tolerance) + 0.5:
+            regressions.append(f'{name}: SQL-запросов на запрос {queries} (было {base_queries})')
+    return regressions
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=os.getenv('DJANGO_API_URL', 'http://localhost:8000/api'))
+    parser.add_argument('--metrics-url', default=os.getenv('BENCH_METRICS_URL', 'http://localhost:8000/metrics'),
+                        help='/metrics backend для числа SQL-запросов; пустая строка — не собирать')
+    parser.add_argument('--metrics-wait', type=float, default=0, help='Пауза перед чтением /metrics после сценария, сек.')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--requests', type=int, default=1000, help='Запросов в каждом HTTP-сценарии')
+    parser.add_argument('--conversations', type=int, default=100, help='Диалогов в bot_add_task')
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--users', type=int, default=100, help='Сколько пользователей засеял seed_bench')
+    parser.add_argument('--bust-cache', action='store_true', help='Уникальный URL у каждого GET, мимо кэша ответов')
+    parser.add_argument('--stub-port', type=int, default=8081)
+    parser.add_argument('--output', help='Сохранить отчет в JSON (базовая линия для --baseline)')
+    parser.add_argument('--baseline', help='Сравнить с сохраненным отчетом')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    report = {
+        'params': {key: getattr(args, key) for key in ('requests', 'conversations', 'concurrency', 'users', 'bust_cache')},
+        'scenarios': {},
+    }
+    for name in args.scenarios:
+        runner = run_bot_add_task(args) if name == 'bot_add_task' else run_http(name, args)
+        report['scenarios'][name] = await runner
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f'Регрессия: {regression}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+import asyncio
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Канал Redis, в который backend сообщает об изменении категорий
+CATEGORY_EVENTS_CHANNEL = 'categories:changed'
+
+
+class CategoryCache:
+    """Список категорий, общий для всех пользователей бота.
+
+    Живет ttl секунд. Если список устарел, его загружает только первый
+    запрос, остальные одновременные запросы ждут тот же результат.
+    При ошибке API возвращается последний удачный список, если он есть.
+    """
+
+    def __init__(self, api, ttl=60.0, clock=time.monotonic):
+        self.api = api
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.fetches = 0
+        self.errors = 0
+        self._categories = None
+        self._expires_at = 0.0
+        self._generation = 0
+        self._refresh = None
+
+    async def get(self):
+        """Возвращает список категорий [{'id', 'name', ...}] или None, если API недоступен"""
+        if self._categories is not None and self.clock() < self._expires_at:
+            self.hits += 1
+            return self._categories
+        if self._refresh is None:
+            self._refresh = asyncio.ensure_future(self._fetch())
+        refresh = self._refresh
+        try:
+            return await asyncio.shield(refresh)
+        finally:
+            if self._refresh is refresh and refresh.done():
+                self._refresh = None
+
+    async def _fetch(self):
+        self.fetches += 1
+        generation = self._generation
+        result = await self.api.request('categories/')
+        if isinstance(result, dict) and result.get('error'):
+            self.errors += 1
+            return self._categories
+        categories = result.get('results', []) if isinstance(result, dict) else result
+        categories = [category for category in categories if isinstance(category, dict) and 'name' in category]
+        # Пока шел запрос, категории могли измениться — такой ответ не кэшируем
+        if generation == self._generation:
+            self._categories = categories
+            self._expires_at = self.clock() + self.ttl
+        return categories
+
+    def invalidate(self):
+        self._generation += 1
+        self._expires_at = 0.0
+        self._refresh = None
+
+    def stats(self):
+        return {'hits': self.hits, 'fetches': self.fetches, 'errors': self.errors}
+
+
+async def listen_category_events(cache, redis_url):
+    """Сбрасывает кэш по сообщениям backend из Redis; при обрыве переподключается"""
+    from redis.asyncio import Redis
+
+    while True:
+        client = Redis.from_url(redis_url)
+        try:
+            async with client.pubsub() as pubsub:
+                await pubsub.subscribe(CATEGORY_EVENTS_CHANNEL)
+                # После переподключения события могли потеряться
+                cache.invalidate()
+                async for message in pubsub.listen():
+                    if message['type'] == 'message':
+                        logger.debug("Category event: %s", json.loads(message['data']))
+                        cache.invalidate()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Category events subscription failed, reconnecting")
+            await asyncio.sleep(5)
+        finally:
+            await client.aclose()
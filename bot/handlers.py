@@ -1,18 +1,20 @@
-import aiohttp
-import os
 import re
 from datetime import datetime
+from urllib.parse import parse_qs, quote, urlsplit
 from aiogram import Router, F
-from aiogram.filters import Command
-from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
+from aiogram.filters import Command, CommandObject
+from aiogram.types import (
+    CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, Message,
+    ReplyKeyboardMarkup, ReplyKeyboardRemove,
+)
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 import logging
-import json
 
-router = Router()
+from api import UserApiClient
+from categories import CategoryCache
 
-API_URL = os.getenv('DJANGO_API_URL', 'http://backend:8000/api')
+router = Router()
 
 class AddTaskStates(StatesGroup):
     waiting_for_title = State()
@@ -23,6 +25,12 @@ class AddTaskStates(StatesGroup):
 class DeleteTaskStates(StatesGroup):
     waiting_for_task_number = State()
 
+class SearchStates(StatesGroup):
+    waiting_for_query = State()
+
+# Сколько самых релевантных задач показывает поиск
+SEARCH_RESULTS = 10
+
 class CategoryStates(StatesGroup):
     waiting_for_category_name = State()
     waiting_for_category_to_delete = State()
@@ -31,8 +39,9 @@ def get_main_keyboard():
     return ReplyKeyboardMarkup(
         keyboard=[
             [KeyboardButton(text="📋 Мои задачи"), KeyboardButton(text="➕ Добавить задачу")],
+            [KeyboardButton(text="⏳ Открытые"), KeyboardButton(text="🚨 Просроченные")],
             [KeyboardButton(text="🗑️ Удалить задачу"), KeyboardButton(text="🏷️ Категории")],
-            [KeyboardButton(text="ℹ️ Помощь")]
+            [KeyboardButton(text="🔍 Поиск задач"), KeyboardButton(text="ℹ️ Помощь")]
         ],
         resize_keyboard=True
     )
@@ -46,39 +55,6 @@ def get_categories_keyboard():
         resize_keyboard=True
     )
 
-async def make_api_request(endpoint, method='GET', data=None, headers=None):
-    url = f"{API_URL}/{endpoint}"
-    
-    if headers is None:
-        headers = {}
-    
-    headers.update({
-        'Content-Type': 'application/json',
-        'Accept': 'application/json'
-    })
-    
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.request(method, url, json=data, headers=headers) as response:
-                content_type = response.headers.get('Content-Type', '')
-                
-                if 'application/json' not in content_type:
-                    text = await response.text()
-                    return {'error': True, 'status_code': response.status, 'message': 'Non-JSON response'}
-                
-                text = await response.text()
-                if response.status >= 400:
-                    return {'error': True, 'status_code': response.status, 'message': text}
-                
-                try:
-                    return json.loads(text)
-                except json.JSONDecodeError:
-                    return {'error': True, 'message': 'Invalid JSON response'}
-                    
-    except Exception as e:
-        logging.exception("API request error: %s %s data=%s headers=%s", method, url, data, headers)
-        return {'error': True, 'message': 'Connection failed'}
-
 @router.message(Command("start"))
 async def cmd_start(message: Message):
     await message.answer(
@@ -92,54 +68,153 @@ async def back_to_main(message: Message, state: FSMContext):
     await state.clear()
     await message.answer("🔙 Возвращаемся в главное меню:", reply_markup=get_main_keyboard())
 
-@router.message(F.text == "📋 Мои задачи")
-async def show_tasks(message: Message):
-    try:
-        result = await make_api_request('tasks/')
+def format_task(i, task):
+    status = "✅" if task.get('completed') else "⏳"
+    if task.get('is_overdue') and not task.get('completed'):
+        status = "🚨"  # Просроченная задача
         
-        if isinstance(result, dict) and result.get('error'):
-            await message.answer("❌ Ошибка при получении задач.")
-            return
-        
-        tasks = result.get('results', []) if isinstance(result, dict) else result
+    categories = ", ".join([cat['name'] for cat in task.get('categories', []) if isinstance(cat, dict)])
+    created_date = task.get('created_date', 'Неизвестно')
+    due_date = task.get('due_date')
+    
+    text = f"{i}. {status} {task['title']}\n"
+    text += f"   📅 Создана: {created_date[:10]}\n"
+    if due_date:
+        due_status = "🚨 ПРОСРОЧЕНА" if task.get('is_overdue') else "⏰ Дедлайн"
+        text += f"   {due_status}: {due_date[:10]}\n"
+    if categories:
+        text += f"   🏷️ Категории: {categories}\n"
+    if task.get('description'):
+        # Список задач отдает описание уже обрезанным
+        text += f"   📄 Описание: {task['description']}\n"
+    # Начало ULID — время создания, различается только конец
+    text += f"   🆔 ID: ...{task['id'][-8:]}\n\n"
+    return text
+
+def get_next_cursor(result):
+    """Достает курсор следующей страницы из ссылки next"""
+    next_url = result.get('next') if isinstance(result, dict) else None
+    if not next_url:
+        return None
+    return parse_qs(urlsplit(next_url).query).get('cursor', [None])[0]
+
+# Виды списка задач: фильтр API, заголовок и текст для пустого списка.
+# Фильтрует backend — бот получает только нужные задачи
+TASK_VIEWS = {
+    'all': ('', "📋 Ваши задачи:", "📭 У вас пока нет задач."),
+    'open': ('&completed=false', "⏳ Открытые задачи:", "🎉 Открытых задач нет."),
+    'overdue': ('&overdue=true', "🚨 Просроченные задачи:", "👍 Просроченных задач нет."),
+}
+
+async def send_tasks_page(message: Message, state: FSMContext, api: UserApiClient, cursor=None, start=1, view='all'):
+    filters, title, empty_text = TASK_VIEWS[view]
+    endpoint = f'tasks/?pagination=cursor{filters}'
+    if cursor:
+        endpoint += f'&cursor={quote(cursor)}'
+    result = await api.request(endpoint)
+    
+    if isinstance(result, dict) and result.get('error'):
+        await message.answer("❌ Ошибка при получении задач.")
+        return
+    
+    tasks = result.get('results', []) if isinstance(result, dict) else result
+    
+    if not tasks:
+        await message.answer(empty_text if start == 1 else "📭 Больше задач нет.")
+        return
         
-        if not tasks:
-            await message.answer("📭 У вас пока нет задач.")
-            return
-            
-        response = "📋 Ваши задачи:\n\n"
-        for i, task in enumerate(tasks, 1):
-            if isinstance(task, dict) and 'title' in task:
-                status = "✅" if task.get('completed') else "⏳"
-                if task.get('is_overdue') and not task.get('completed'):
-                    status = "🚨"  # Просроченная задача
-                    
-                categories = ", ".join([cat['name'] for cat in task.get('categories', []) if isinstance(cat, dict)])
-                created_date = task.get('created_date', 'Неизвестно')
-                due_date = task.get('due_date')
-                
-                response += f"{i}. {status} {task['title']}\n"
-                response += f"   📅 Создана: {created_date[:10]}\n"
-                if due_date:
-                    due_status = "🚨 ПРОСРОЧЕНА" if task.get('is_overdue') else "⏰ Дедлайн"
-                    response += f"   {due_status}: {due_date[:10]}\n"
-                if categories:
-                    response += f"   🏷️ Категории: {categories}\n"
-                if task.get('description'):
-                    desc = task['description']
-                    if len(desc) > 50:
-                        desc = desc[:50] + "..."
-                    response += f"   📄 Описание: {desc}\n"
-                response += f"   🆔 ID: {task['id'][:8]}...\n\n"
-            
+    response = f"{title}\n\n" if start == 1 else ""
+    for i, task in enumerate(tasks, start):
+        if isinstance(task, dict) and 'title' in task:
+            response += format_task(i, task)
+    
+    # Курсор следующей страницы храним в FSM, в callback_data он не помещается
+    next_cursor = get_next_cursor(result)
+    reply_markup = None
+    if next_cursor:
+        await state.update_data(tasks_cursor=next_cursor, tasks_offset=start + len(tasks), tasks_view=view)
+        reply_markup = InlineKeyboardMarkup(
+            inline_keyboard=[[InlineKeyboardButton(text="➡️ Далее", callback_data="tasks:next")]]
+        )
+    else:
         response += "💡 Для удаления задачи нажмите «🗑️ Удалить задачу»"
-        await message.answer(response)
-        
+    await message.answer(response, reply_markup=reply_markup)
+
+@router.message(F.text.in_({"📋 Мои задачи", "⏳ Открытые", "🚨 Просроченные"}))
+async def show_tasks(message: Message, state: FSMContext, api: UserApiClient):
+    view = {"⏳ Открытые": 'open', "🚨 Просроченные": 'overdue'}.get(message.text, 'all')
+    try:
+        await send_tasks_page(message, state, api, view=view)
     except Exception as e:
         logging.exception("Error in show_tasks handler")
         await message.answer("❌ Ошибка при получении задач.")
 
+@router.callback_query(F.data == "tasks:next")
+async def show_next_tasks_page(callback: CallbackQuery, state: FSMContext, api: UserApiClient):
+    data = await state.get_data()
+    cursor = data.get('tasks_cursor')
+    await callback.answer()
+    if not cursor:
+        await callback.message.answer("ℹ️ Список устарел, нажмите «📋 Мои задачи» еще раз.")
+        return
+    try:
+        await callback.message.edit_reply_markup(reply_markup=None)
+        await send_tasks_page(callback.message, state, api, cursor=cursor, start=data.get('tasks_offset', 1),
+                              view=data.get('tasks_view', 'all'))
+    except Exception as e:
+        logging.exception("Error in show_next_tasks_page handler")
+        await callback.message.answer("❌ Ошибка при получении задач.")
+
         
+async def send_search_results(message: Message, api: UserApiClient, text: str):
+    result = await api.request(f'tasks/?q={quote(text)}&page_size={SEARCH_RESULTS}')
+    if isinstance(result, dict) and result.get('error'):
+        await message.answer("❌ Ошибка при поиске задач.")
+        return
+    
+    tasks = result.get('results', []) if isinstance(result, dict) else result
+    tasks = [task for task in tasks if isinstance(task, dict) and 'title' in task]
+    if not tasks:
+        await message.answer(f"🔍 По запросу «{text}» ничего не найдено.", reply_markup=get_main_keyboard())
+        return
+    
+    count = result.get('count', len(tasks)) if isinstance(result, dict) else len(tasks)
+    response = f"🔍 Найдено задач: {count}\n\n"
+    for i, task in enumerate(tasks, 1):
+        response += format_task(i, task)
+    if count > len(tasks):
+        response += f"💡 Показаны {len(tasks)} самых подходящих, уточните запрос"
+    await message.answer(response, reply_markup=get_main_keyboard())
+
+@router.message(Command("search"))
+async def cmd_search(message: Message, command: CommandObject, state: FSMContext, api: UserApiClient):
+    if not command.args:
+        await search_start(message, state)
+        return
+    try:
+        await send_search_results(message, api, command.args.strip())
+    except Exception as e:
+        logging.exception("Error in cmd_search handler")
+        await message.answer("❌ Ошибка при поиске задач.")
+
+@router.message(F.text == "🔍 Поиск задач")
+async def search_start(message: Message, state: FSMContext):
+    await state.set_state(SearchStates.waiting_for_query)
+    await message.answer(
+        "🔍 Введите слова для поиска по названию и описанию задач:\n"
+        "(\"точная фраза\", -слово — исключить)",
+        reply_markup=ReplyKeyboardRemove()
+    )
+
+@router.message(SearchStates.waiting_for_query)
+async def process_search_query(message: Message, state: FSMContext, api: UserApiClient):
+    await state.clear()
+    try:
+        await send_search_results(message, api, (message.text or '').strip())
+    except Exception as e:
+        logging.exception("Error in process_search_query handler")
+        await message.answer("❌ Ошибка при поиске задач.", reply_markup=get_main_keyboard())
+
 @router.message(F.text == "➕ Добавить задачу")
 async def add_task_start(message: Message, state: FSMContext):
     await state.set_state(AddTaskStates.waiting_for_title)
@@ -165,7 +240,7 @@ async def process_task_description(message: Message, state: FSMContext):
     )
 
 @router.message(AddTaskStates.waiting_for_due_date)
-async def process_task_due_date(message: Message, state: FSMContext):
+async def process_task_due_date(message: Message, state: FSMContext, categories: CategoryCache):
     due_date_input = message.text.strip()
     
     if due_date_input != '-':
@@ -190,11 +265,7 @@ async def process_task_due_date(message: Message, state: FSMContext):
     await state.set_state(AddTaskStates.waiting_for_categories)
     
     # Получаем список существующих категорий
-    categories_result = await make_api_request('categories/')
-    existing_categories = []
-    if not isinstance(categories_result, dict) or not categories_result.get('error'):
-        categories = categories_result.get('results', []) if isinstance(categories_result, dict) else categories_result
-        existing_categories = [cat['name'] for cat in categories if isinstance(cat, dict)]
+    existing_categories = [category['name'] for category in await categories.get() or []]
     
     if existing_categories:
         categories_text = ", ".join(existing_categories)
@@ -209,7 +280,7 @@ async def process_task_due_date(message: Message, state: FSMContext):
         )
 
 @router.message(AddTaskStates.waiting_for_categories)
-async def process_task_categories(message: Message, state: FSMContext):
+async def process_task_categories(message: Message, state: FSMContext, api: UserApiClient):
     data = await state.get_data()
     categories_input = message.text.strip()
     
@@ -224,17 +295,15 @@ async def process_task_categories(message: Message, state: FSMContext):
     if categories_input != '-':
         category_names = [cat.strip() for cat in categories_input.split(',') if cat.strip()]
         
-        # Проверяем существование категорий
-        valid_categories = []
-        invalid_categories = []
+        # Проверяем все категории одним запросом
+        check_result = await api.request('categories/check_categories/', 'POST', {'names': category_names})
+        if isinstance(check_result, dict) and check_result.get('error'):
+            await message.answer("❌ Ошибка при проверке категорий.", reply_markup=get_main_keyboard())
+            await state.clear()
+            return
         
-        for category_name in category_names:
-            check_result = await make_api_request(f'categories/check_category?name={category_name}')
-            if not isinstance(check_result, dict) or not check_result.get('error'):
-                if check_result.get('exists'):
-                    valid_categories.append(category_name)
-                else:
-                    invalid_categories.append(category_name)
+        valid_categories = [category['name'] for category in check_result.get('existing', [])]
+        invalid_categories = check_result.get('missing', [])
         
         if invalid_categories:
             await message.answer(
@@ -246,10 +315,11 @@ async def process_task_categories(message: Message, state: FSMContext):
             await state.clear()
             return
         
-        task_data['category_names'] = valid_categories
+        # Категории уже найдены, backend не нужно искать их по именам повторно
+        task_data['category_ids'] = [category['id'] for category in check_result.get('existing', [])]
     
     try:
-        result = await make_api_request('tasks/', 'POST', task_data)
+        result = await api.request('tasks/', 'POST', task_data)
         
         if isinstance(result, dict) and result.get('error'):
             await message.answer("❌ Ошибка при добавлении задачи.", reply_markup=get_main_keyboard())
@@ -269,9 +339,9 @@ async def process_task_categories(message: Message, state: FSMContext):
     await state.clear()
 
 @router.message(F.text == "🗑️ Удалить задачу")
-async def delete_task_start(message: Message, state: FSMContext):
+async def delete_task_start(message: Message, state: FSMContext, api: UserApiClient):
     # Сначала показываем список задач
-    result = await make_api_request('tasks/')
+    result = await api.request('tasks/')
     
     if isinstance(result, dict) and result.get('error'):
         await message.answer("❌ Ошибка при получении задач.")
@@ -283,35 +353,34 @@ async def delete_task_start(message: Message, state: FSMContext):
         await message.answer("📭 У вас пока нет задач для удаления.")
         return
     
-    # Сохраняем задачи в состоянии
+    # В состоянии храним только пары [id, название], а не задачи целиком
+    tasks = [[task['id'], task['title']] for task in tasks if isinstance(task, dict) and 'title' in task]
     await state.update_data(tasks=tasks)
     await state.set_state(DeleteTaskStates.waiting_for_task_number)
     
     response = "🗑️ Выберите номер задачи для удаления:\n\n"
-    for i, task in enumerate(tasks, 1):
-        if isinstance(task, dict) and 'title' in task:
-            response += f"{i}. {task['title']}\n"
+    for i, (task_id, title) in enumerate(tasks, 1):
+        response += f"{i}. {title}\n"
     
     await message.answer(response)
 
 @router.message(DeleteTaskStates.waiting_for_task_number)
-async def process_task_deletion(message: Message, state: FSMContext):
+async def process_task_deletion(message: Message, state: FSMContext, api: UserApiClient):
     try:
         task_number = int(message.text.strip())
         data = await state.get_data()
         tasks = data.get('tasks', [])
         
         if 1 <= task_number <= len(tasks):
-            task_to_delete = tasks[task_number - 1]
-            task_id = task_to_delete['id']
+            task_id, title = tasks[task_number - 1]
             
             # Удаляем задачу
-            result = await make_api_request(f'tasks/{task_id}/delete_task/', 'POST')
+            result = await api.request(f'tasks/{task_id}/delete_task/', 'POST')
             
             if isinstance(result, dict) and result.get('error'):
                 await message.answer("❌ Ошибка при удалении задачи.", reply_markup=get_main_keyboard())
             else:
-                await message.answer(f"✅ Задача «{task_to_delete['title']}» успешно удалена!", reply_markup=get_main_keyboard())
+                await message.answer(f"✅ Задача «{title}» успешно удалена!", reply_markup=get_main_keyboard())
         else:
             await message.answer("❌ Неверный номер задачи. Пожалуйста, выберите номер из списка:")
             return
@@ -330,24 +399,21 @@ async def show_categories_menu(message: Message):
     )
 
 @router.message(F.text == "📋 Список категорий")
-async def show_categories(message: Message):
+async def show_categories(message: Message, categories: CategoryCache):
     try:
-        result = await make_api_request('categories/')
+        result = await categories.get()
         
-        if isinstance(result, dict) and result.get('error'):
+        if result is None:
             await message.answer("❌ Ошибка при получении категорий.")
             return
-        
-        categories = result.get('results', []) if isinstance(result, dict) else result
             
-        if not categories:
+        if not result:
             await message.answer("📭 Категории пока не созданы.")
             return
             
         response = "🏷️ Доступные категории:\n\n"
-        for i, category in enumerate(categories, 1):
-            if isinstance(category, dict) and 'name' in category:
-                response += f"{i}. {category['name']}\n"
+        for i, category in enumerate(result, 1):
+            response += f"{i}. {category['name']}\n"
             
         await message.answer(response)
         
@@ -361,7 +427,7 @@ async def add_category_start(message: Message, state: FSMContext):
     await message.answer("🏷️ Введите название новой категории:")
 
 @router.message(CategoryStates.waiting_for_category_name)
-async def process_category_name(message: Message, state: FSMContext):
+async def process_category_name(message: Message, state: FSMContext, api: UserApiClient, categories: CategoryCache):
     category_name = message.text.strip()
     
     if not category_name:
@@ -369,7 +435,7 @@ async def process_category_name(message: Message, state: FSMContext):
         return
     
     # Проверяем, существует ли уже категория
-    check_result = await make_api_request(f'categories/check_category?name={category_name}')
+    check_result = await api.request(f'categories/check_category?name={category_name}')
     if not isinstance(check_result, dict) or not check_result.get('error'):
         if check_result.get('exists'):
             await message.answer(f"❌ Категория «{category_name}» уже существует!", reply_markup=get_categories_keyboard())
@@ -378,59 +444,58 @@ async def process_category_name(message: Message, state: FSMContext):
     
     # Создаем категорию
     category_data = {'name': category_name}
-    result = await make_api_request('categories/create_category/', 'POST', category_data)
+    result = await api.request('categories/create_category/', 'POST', category_data)
     
     if isinstance(result, dict) and result.get('error'):
         await message.answer("❌ Ошибка при создании категории.", reply_markup=get_categories_keyboard())
     else:
+        categories.invalidate()
         await message.answer(f"✅ Категория «{category_name}» успешно создана!", reply_markup=get_categories_keyboard())
     
     await state.clear()
 
 @router.message(F.text == "🗑️ Удалить категорию")
-async def delete_category_start(message: Message, state: FSMContext):
+async def delete_category_start(message: Message, state: FSMContext, categories: CategoryCache):
     # Сначала показываем список категорий
-    result = await make_api_request('categories/')
+    result = await categories.get()
     
-    if isinstance(result, dict) and result.get('error'):
+    if result is None:
         await message.answer("❌ Ошибка при получении категорий.")
         return
     
-    categories = result.get('results', []) if isinstance(result, dict) else result
-    
-    if not categories:
+    if not result:
         await message.answer("📭 У вас пока нет категорий для удаления.")
         return
     
-    # Сохраняем категории в состоянии
-    await state.update_data(categories=categories)
+    # В состоянии храним только пары [id, название]
+    pairs = [[category['id'], category['name']] for category in result]
+    await state.update_data(categories=pairs)
     await state.set_state(CategoryStates.waiting_for_category_to_delete)
     
     response = "🗑️ Выберите номер категории для удаления:\n\n"
-    for i, category in enumerate(categories, 1):
-        if isinstance(category, dict) and 'name' in category:
-            response += f"{i}. {category['name']}\n"
+    for i, (category_id, name) in enumerate(pairs, 1):
+        response += f"{i}. {name}\n"
     
     await message.answer(response)
 
 @router.message(CategoryStates.waiting_for_category_to_delete)
-async def process_category_deletion(message: Message, state: FSMContext):
+async def process_category_deletion(message: Message, state: FSMContext, api: UserApiClient, categories: CategoryCache):
     try:
         category_number = int(message.text.strip())
         data = await state.get_data()
-        categories = data.get('categories', [])
+        pairs = data.get('categories', [])
         
-        if 1 <= category_number <= len(categories):
-            category_to_delete = categories[category_number - 1]
-            category_id = category_to_delete['id']
+        if 1 <= category_number <= len(pairs):
+            category_id, name = pairs[category_number - 1]
             
             # Удаляем категорию
-            result = await make_api_request(f'categories/{category_id}/delete_category/', 'POST')
+            result = await api.request(f'categories/{category_id}/delete_category/', 'POST')
             
             if isinstance(result, dict) and result.get('error'):
                 await message.answer("❌ Ошибка при удалении категории.", reply_markup=get_categories_keyboard())
             else:
-                await message.answer(f"✅ Категория «{category_to_delete['name']}» успешно удалена!", reply_markup=get_categories_keyboard())
+                categories.invalidate()
+                await message.answer(f"✅ Категория «{name}» успешно удалена!", reply_markup=get_categories_keyboard())
         else:
             await message.answer("❌ Неверный номер категории. Пожалуйста, выберите номер из списка:")
             return
@@ -448,9 +513,11 @@ async def show_help(message: Message):
 
 **Основные команды:**
 📋 Мои задачи - Показать все ваши задачи
+⏳ Открытые / 🚨 Просроченные - Только невыполненные или просроченные задачи
 ➕ Добавить задачу - Создать новую задачу
 🗑️ Удалить задачу - Удалить существующую задачу
 🏷️ Категории - Управление категориями
+🔍 Поиск задач - Найти задачи по словам из названия и описания (или /search <слова>)
 
 **Управление категориями:**
 📋 Список категорий - Показать все категории
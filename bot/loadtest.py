@@ -0,0 +1,179 @@
+"""Нагрузочный тест приема апдейтов: polling против webhook.
+
+Бот запускается в этом же процессе и направляется на локальную заглушку
+Bot API (telegram_stub.py). Апдейты берутся из файла, записанного ботом
+с RECORD_UPDATES_PATH, либо генерируются:
+
+    python loadtest.py --mode polling --generate 2000 --users 100
+    python loadtest.py --mode webhook --updates updates.jsonl --expect 1500
+    python loadtest.py --mode polling --generate 2000 --no-metrics
+
+Синтетические апдейты (/start, помощь, меню категорий) не ходят в backend,
+поэтому измеряют только накладные расходы приема и диспетчеризации.
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import defaultdict, deque
+
+import aiohttp
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from api import percentile
+from main import create_api_client, create_dispatcher
+from metrics import TelegramMetricsMiddleware
+from telegram_stub import TelegramStub
+from webhook import SECRET_HEADER, create_app
+
+SYNTHETIC_TEXTS = ['/start', 'ℹ️ Помощь', '🏷️ Категории']
+WEBHOOK_SECRET = 'loadtest-secret'
+
+
+def generate_updates(count, users):
+    return [
+        {
+            'update_id': i + 1,
+            'message': {
+                'message_id': i + 1,
+                'date': int(time.time()),
+                'chat': {'id': i % users + 1, 'type': 'private'},
+                'from': {'id': i % users + 1, 'is_bot': False, 'first_name': f'User {i % users + 1}'},
+                'text': SYNTHETIC_TEXTS[i % len(SYNTHETIC_TEXTS)],
+            },
+        }
+        for i in range(count)
+    ]
+
+
+def load_updates(path):
+    with open(path, encoding='utf-8') as f:
+        updates = [json.loads(line) for line in f if line.strip()]
+    # Перенумеровываем, чтобы getUpdates с offset работал с любыми записями
+    for i, update in enumerate(updates, 1):
+        update['update_id'] = i
+    return updates
+
+
+def chat_id_of(update):
+    for key in ('message', 'callback_query'):
+        if key in update:
+            event = update[key]
+            return (event.get('chat') or event.get('message', {}).get('chat') or event['from'])['id']
+    return None
+
+
+async def run_polling(dp, bot, stub, updates, args):
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, polling_timeout=1))
+    sent_at = {}
+    for update in updates:
+        sent_at[update['update_id']] = time.perf_counter()
+    stub.push_updates(updates)
+    try:
+        await stub.wait_for_replies(args.expect, args.timeout)
+    finally:
+        await dp.stop_polling()
+        await polling
+    return sent_at, {}
+
+
+async def run_webhook(dp, bot, stub, updates, args):
+    app = create_app(dp, bot, WEBHOOK_SECRET, workers=args.workers, queue_size=args.queue_size)
+    runner = aiohttp.web.AppRunner(app)
+    await runner.setup()
+    await aiohttp.web.TCPSite(runner, '127.0.0.1', args.webhook_port).start()
+
+    url = f'http://127.0.0.1:{args.webhook_port}/telegram/webhook'
+    semaphore = asyncio.Semaphore(args.concurrency)
+    sent_at = {}
+
+    async def deliver(session, update):
+        async with semaphore:
+            sent_at[update['update_id']] = time.perf_counter()
+            # Как и Telegram, повторяем доставку, пока очередь переполнена
+            while True:
+                async with session.post(url, json=update, headers={SECRET_HEADER: WEBHOOK_SECRET}) as response:
+                    if response.status != 503:
+                        break
+                await asyncio.sleep(0.05)
+
+    try:
+        async with aiohttp.ClientSession() as session:
+            await asyncio.gather(*(deliver(session, update) for update in updates))
+        await stub.wait_for_replies(args.expect, args.timeout)
+        return sent_at, app['updates'].stats()
+    finally:
+        await runner.cleanup()
+
+
+def latencies(updates, sent_at, replies):
+    """Сопоставляет ответы апдейтам по порядку внутри каждого чата"""
+    queues = defaultdict(deque)
+    for update in updates:
+        queues[chat_id_of(update)].append(sent_at[update['update_id']])
+    result = []
+    for replied_at, method, chat_id in replies:
+        if method == 'sendMessage' and queues[chat_id]:
+            result.append(replied_at - queues[chat_id].popleft())
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['polling', 'webhook'], required=True)
+    parser.add_argument('--updates', help='JSONL с записанными апдейтами')
+    parser.add_argument('--generate', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--expect', type=int, help='Сколько ответов бота ждать (по умолчанию — по одному на апдейт)')
+    parser.add_argument('--concurrency', type=int, default=40, help='Параллельных доставок вебхука, как max_connections')
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--queue-size', type=int, default=1000)
+    parser.add_argument('--stub-port', type=int, default=8081)
+    parser.add_argument('--webhook-port', type=int, default=8082)
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--no-metrics', action='store_true', help='Без middleware метрик, для оценки их накладных расходов')
+    args = parser.parse_args()
+
+    updates = load_updates(args.updates) if args.updates else generate_updates(args.generate, args.users)
+    args.expect = args.expect or len(updates)
+
+    stub = TelegramStub(port=args.stub_port)
+    await stub.start()
+    session = AiohttpSession(api=TelegramAPIServer.from_base(stub.url))
+    if not args.no_metrics:
+        session.middleware(TelegramMetricsMiddleware())
+    bot = Bot('123456:LOADTEST', session=session)
+    api = create_api_client()
+    dp = create_dispatcher(api, with_metrics=not args.no_metrics)
+
+    runner = run_polling if args.mode == 'polling' else run_webhook
+    started = time.perf_counter()
+    try:
+        sent_at, extra = await runner(dp, bot, stub, updates, args)
+    finally:
+        await api.close()
+        await bot.session.close()
+        await dp.storage.close()
+        await stub.stop()
+    elapsed = time.perf_counter() - started
+
+    samples = latencies(updates, sent_at, stub.sent)
+    report = {
+        'mode': args.mode,
+        'updates': len(updates),
+        'replies': len(stub.sent),
+        'elapsed_s': round(elapsed, 3),
+        'updates_per_s': round(len(updates) / elapsed, 1),
+        'p50_ms': round(percentile(samples, 50) * 1000, 2),
+        'p95_ms': round(percentile(samples, 95) * 1000, 2),
+        'p99_ms': round(percentile(samples, 99) * 1000, 2),
+    }
+    if extra:
+        report['webhook'] = extra
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
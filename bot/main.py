@@ -1,23 +1,125 @@
 import os
 import asyncio
+import signal
+import threading
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.fsm.storage.memory import MemoryStorage
 from dotenv import load_dotenv
+from api import ApiClient
+from categories import CategoryCache, listen_category_events
 from handlers import router
+from metrics import (
+    HandlerMetricsMiddleware, SamplingProfiler, TelegramMetricsMiddleware, UpdateMetricsMiddleware, metrics,
+    start_metrics_server, toggle_profiler,
+)
+from middlewares import ApiUserMiddleware, UpdateRecorderMiddleware
 import logging
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
 
-async def main():
-    bot = Bot(token=os.getenv('TELEGRAM_BOT_TOKEN'))
-    dp = Dispatcher(storage=MemoryStorage())
-    
+def create_storage():
+    """FSM_STORAGE=redis хранит диалоги в Redis: они переживают рестарт и общие для всех процессов бота"""
+    if os.getenv('FSM_STORAGE', 'memory') != 'redis':
+        return MemoryStorage()
+
+    from aiogram.fsm.storage.redis import DefaultKeyBuilder, RedisStorage
+    ttl = int(os.getenv('FSM_STATE_TTL', '86400'))
+    return RedisStorage.from_url(
+        os.getenv('REDIS_URL', 'redis://redis:6379/1'),
+        key_builder=DefaultKeyBuilder(prefix='fsm'),
+        state_ttl=ttl,
+        data_ttl=ttl,
+    )
+
+def create_api_client():
+    return ApiClient(
+        os.getenv('DJANGO_API_URL', 'http://backend:8000/api'),
+        pool_size=int(os.getenv('API_POOL_SIZE', '20')),
+        timeout=float(os.getenv('API_TIMEOUT', '10')),
+        retries=int(os.getenv('API_RETRIES', '2')),
+        token=os.getenv('BOT_API_TOKEN'),
+    )
+
+def create_bot():
+    # TELEGRAM_API_URL позволяет направить бота на локальную заглушку Bot API
+    api_url = os.getenv('TELEGRAM_API_URL')
+    session = AiohttpSession(api=TelegramAPIServer.from_base(api_url)) if api_url else AiohttpSession()
+    # Время запросов к Bot API — в метриках по методу и в разбивке времени хендлеров
+    session.middleware(TelegramMetricsMiddleware())
+    return Bot(token=os.getenv('TELEGRAM_BOT_TOKEN'), session=session)
+
+def create_dispatcher(api, with_metrics=True):
+    dp = Dispatcher(storage=create_storage())
+    # Клиент доступен в хендлерах как аргумент `api`
+    dp['api'] = api
+    # Категории общие для всех пользователей — кэшируем их в процессе бота
+    dp['categories'] = CategoryCache(api, ttl=float(os.getenv('CATEGORY_CACHE_TTL', '60')))
+
+    record_path = os.getenv('RECORD_UPDATES_PATH')
+    if record_path:
+        dp.update.outer_middleware(UpdateRecorderMiddleware(record_path))
+    if with_metrics:
+        dp.update.outer_middleware(UpdateMetricsMiddleware())
+        dp.message.middleware(HandlerMetricsMiddleware())
+        dp.callback_query.middleware(HandlerMetricsMiddleware())
+    dp.message.middleware(ApiUserMiddleware())
+    dp.callback_query.middleware(ApiUserMiddleware())
     dp.include_router(router)
-    
+    return dp
+
+async def run_polling(dp, bot):
     await bot.delete_webhook(drop_pending_updates=True)
     await dp.start_polling(bot)
 
+async def main():
+    bot = create_bot()
+    api = create_api_client()
+    dp = create_dispatcher(api)
+
+    # kill -USR1 <pid> выводит в лог метрики клиента API
+    loop = asyncio.get_running_loop()
+    if hasattr(signal, 'SIGUSR1'):
+        loop.add_signal_handler(signal.SIGUSR1, lambda: logging.info(
+            "API stats:\n%s\nCategory cache: %s", api.dump_stats(), dp['categories'].stats()
+        ))
+
+    # kill -USR2 <pid> включает и выключает семплирующий профилировщик event loop
+    profiler = SamplingProfiler(threading.get_ident())
+    if hasattr(signal, 'SIGUSR2'):
+        loop.add_signal_handler(signal.SIGUSR2, toggle_profiler, profiler)
+
+    metrics.api = api
+    metrics.add_gauges('api_pool', lambda: api.stats()['pool'])
+    metrics.add_gauges('category_cache', dp['categories'].stats)
+    metrics_port = int(os.getenv('BOT_METRICS_PORT', '9101'))
+    metrics_server = None
+    if metrics_port:
+        metrics_server = await start_metrics_server(profiler, os.getenv('BOT_METRICS_HOST', '0.0.0.0'), metrics_port)
+
+    # Сброс кэша категорий сразу после изменений в backend (иначе — по TTL)
+    events_url = os.getenv('CATEGORY_EVENTS_REDIS_URL')
+    category_events = asyncio.create_task(listen_category_events(dp['categories'], events_url)) if events_url else None
+
+    await api.start()
+    try:
+        if os.getenv('BOT_MODE', 'polling') == 'webhook':
+            from webhook import run_webhook
+            await run_webhook(dp, bot)
+        else:
+            await run_polling(dp, bot)
+    finally:
+        if category_events is not None:
+            category_events.cancel()
+        if metrics_server is not None:
+            await metrics_server.cleanup()
+        logging.info("API stats:\n%s", api.dump_stats())
+        await api.close()
+        await dp.storage.close()
+        await bot.session.close()
+
 if __name__ == "__main__":
     logging.info("Starting bot...")
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
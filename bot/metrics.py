@@ -0,0 +1,303 @@
+"""Метрики обработки апдейтов и семплирующий профилировщик бота.
+
+UpdateMetricsMiddleware считает апдейты, ошибки и апдейты в обработке,
+HandlerMetricsMiddleware — время каждого хендлера по имени и состоянию FSM,
+разложенное на ожидание backend (ApiClient), ожидание Bot API (сессия бота)
+и остальное: форматирование ответа и работу с FSM. Метрики и профилировщик
+доступны по HTTP на BOT_METRICS_PORT:
+
+    GET /metrics                           - текстовый формат Prometheus
+    GET /debug/profile?seconds=10&interval_ms=5 - стеки event loop в формате
+                                             collapsed (flamegraph.pl, speedscope)
+
+kill -USR2 <pid> включает профилировщик, повторный сигнал выключает его и
+выводит в лог самые частые стеки.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.methods import GetUpdates
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Части времени хендлера: backend, Bot API и все остальное
+PARTS = ('api', 'telegram', 'render')
+FAMILIES = {
+    'todo_bot_updates_total': ('counter', 'Апдейты по типу'),
+    'todo_bot_update_errors_total': ('counter', 'Апдейты, обработка которых завершилась исключением'),
+    'todo_bot_update_duration_seconds': ('histogram', 'Время обработки апдейта'),
+    'todo_bot_handler_duration_seconds': ('histogram', 'Время хендлера по имени и состоянию FSM'),
+    'todo_bot_handler_part_seconds': ('histogram', 'Время хендлера в ожидании backend, Bot API и на остальное'),
+    'todo_bot_handler_errors_total': ('counter', 'Исключения, вышедшие из хендлера'),
+    'todo_bot_telegram_request_duration_seconds': ('histogram', 'Запросы к Bot API по методу'),
+}
+# Сколько стеков выводить в лог после профилирования по сигналу
+PROFILE_LOG_STACKS = 20
+
+_current = ContextVar('handler_timings', default=None)
+
+
+class HandlerTimings:
+    __slots__ = ('api', 'telegram')
+
+    def __init__(self):
+        self.api = 0.0
+        self.telegram = 0.0
+
+
+def add_api_time(duration):
+    """Вызывается ApiClient: время запроса к backend учитывается в текущем хендлере"""
+    timings = _current.get()
+    if timings is not None:
+        timings.api += duration
+
+
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * len(DURATION_BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class BotMetrics:
+    """Метрики процесса бота; все обновления идут из потока event loop"""
+
+    def __init__(self):
+        self.counters = defaultdict(int)
+        self.histograms = defaultdict(Histogram)
+        self.in_flight = 0
+        # Префикс -> функция, возвращающая словарь чисел (статистика очереди вебхука, пула API)
+        self.gauges = {}
+        self.api = None
+
+    def inc(self, family, labels, value=1):
+        self.counters[family, labels] += value
+
+    def observe(self, family, labels, value):
+        self.histograms[family, labels].observe(value)
+
+    def add_gauges(self, prefix, stats):
+        self.gauges[prefix] = stats
+
+    def render(self):
+        lines = []
+        series = defaultdict(list)
+        for (family, labels), value in self.counters.items():
+            series[family].append(f'{family}{format_labels(labels)} {value}')
+        for (family, labels), histogram in self.histograms.items():
+            for bound, count in zip(DURATION_BUCKETS, histogram.counts):
+                series[family].append(f"{family}_bucket{format_labels(labels + (('le', str(bound)),))} {count}")
+            series[family] += [
+                f"{family}_bucket{format_labels(labels + (('le', '+Inf'),))} {histogram.count}",
+                f'{family}_sum{format_labels(labels)} {histogram.sum:.6f}',
+                f'{family}_count{format_labels(labels)} {histogram.count}',
+            ]
+        for family in sorted(series):
+            kind, help_text = FAMILIES[family]
+            lines += [f'# HELP {family} {help_text}', f'# TYPE {family} {kind}', *series[family]]
+
+        lines += ['# TYPE todo_bot_updates_in_flight gauge', f'todo_bot_updates_in_flight {self.in_flight}']
+        for prefix, stats in sorted(self.gauges.items()):
+            for key, value in stats().items():
+                if isinstance(value, (int, float)):
+                    lines += [f'# TYPE todo_bot_{prefix}_{key} gauge', f'todo_bot_{prefix}_{key} {value}']
+
+        if self.api is not None:
+            lines += api_lines(self.api.stats()['endpoints'])
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                             for name, value in labels)
+
+
+def api_lines(endpoints):
+    """Статистика ApiClient по эндпоинтам: перцентили по последним запросам как summary"""
+    lines = [
+        '# HELP todo_bot_api_request_seconds Запросы к backend по эндпоинту (последние запросы)',
+        '# TYPE todo_bot_api_request_seconds summary',
+    ]
+    errors = ['# TYPE todo_bot_api_errors_total counter']
+    for endpoint, stats in endpoints.items():
+        labels = (('endpoint', endpoint),)
+        for quantile in ('50', '95', '99'):
+            lines.append(f"todo_bot_api_request_seconds{format_labels(labels + (('quantile', '0.' + quantile),))} "
+                         f"{stats[f'p{quantile}_ms'] / 1000}")
+        lines.append(f"todo_bot_api_request_seconds_count{format_labels(labels)} {stats['count']}")
+        errors.append(f"todo_bot_api_errors_total{format_labels(labels)} {stats['errors']}")
+    return lines + errors
+
+
+metrics = BotMetrics()
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Внешний middleware апдейтов: число, ошибки, время и апдейты в обработке"""
+
+    async def __call__(self, handler, event, data):
+        labels = (('type', event.event_type),)
+        metrics.inc('todo_bot_updates_total', labels)
+        metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            metrics.inc('todo_bot_update_errors_total', labels)
+            raise
+        finally:
+            metrics.in_flight -= 1
+            metrics.observe('todo_bot_update_duration_seconds', labels, time.perf_counter() - started)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Время хендлера сообщений или колбэков с разбивкой на backend, Bot API и остальное"""
+
+    async def __call__(self, handler, event, data):
+        handler_object = data.get('handler')
+        name = handler_object.callback.__name__ if handler_object is not None else 'unknown'
+        labels = (('handler', name), ('state', data.get('raw_state') or 'none'))
+        timings = HandlerTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            metrics.inc('todo_bot_handler_errors_total', (('handler', name),))
+            raise
+        finally:
+            _current.reset(token)
+            duration = time.perf_counter() - started
+            metrics.observe('todo_bot_handler_duration_seconds', labels, duration)
+            for part, value in zip(PARTS, (timings.api, timings.telegram,
+                                           max(duration - timings.api - timings.telegram, 0.0))):
+                metrics.observe('todo_bot_handler_part_seconds', (('handler', name), ('part', part)), value)
+
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: время запросов к Bot API по методу и в текущем хендлере"""
+
+    async def __call__(self, make_request, bot, method):
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        finally:
+            # getUpdates — long polling, его время не задержка Bot API
+            if not isinstance(method, GetUpdates):
+                duration = time.perf_counter() - started
+                metrics.observe('todo_bot_telegram_request_duration_seconds',
+                                (('method', method.__api_method__),), duration)
+                timings = _current.get()
+                if timings is not None:
+                    timings.telegram += duration
+
+
+class SamplingProfiler:
+    """Раз в interval секунд снимает стек потока event loop из отдельного потока.
+
+    Собирает число попаданий каждого стека; время, когда loop ждет событий,
+    видно как стеки с select/poll. Работает только пока включен.
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        self.samples.clear()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        return self.samples
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def collapsed(self, limit=None):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.samples.most_common(limit))
+
+
+def create_metrics_app(profiler):
+    async def metrics_view(request):
+        return web.Response(text=metrics.render(), content_type='text/plain', charset='utf-8')
+
+    async def profile_view(request):
+        try:
+            seconds = min(float(request.query.get('seconds', '10')), 300.0)
+            interval = float(request.query.get('interval_ms', '5')) / 1000
+        except ValueError:
+            return web.Response(status=400, text='seconds and interval_ms must be numbers')
+        if profiler.running:
+            return web.Response(status=409, text='profiler is already running')
+        profiler.interval = max(interval, 0.001)
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.stop()
+        return web.Response(text=profiler.collapsed(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', metrics_view)
+    app.router.add_get('/debug/profile', profile_view)
+    return app
+
+
+def toggle_profiler(profiler):
+    """Обработчик SIGUSR2: включает профилировщик или выключает и пишет стеки в лог"""
+    if not profiler.running:
+        profiler.start()
+        logger.info("Sampling profiler started, send SIGUSR2 again to stop")
+        return
+    profiler.stop()
+    logger.info("Sampling profiler: %s samples, top stacks:\n%s",
+                sum(profiler.samples.values()), profiler.collapsed(PROFILE_LOG_STACKS))
+
+
+async def start_metrics_server(profiler, host, port):
+    runner = web.AppRunner(create_metrics_app(profiler), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Metrics server is listening on %s:%s", host, port)
+    return runner
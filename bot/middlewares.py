@@ -0,0 +1,24 @@
+from aiogram import BaseMiddleware
+
+from api import UserApiClient
+
+
+class ApiUserMiddleware(BaseMiddleware):
+    """Подменяет общий клиент `api` на клиент от имени отправителя апдейта"""
+
+    async def __call__(self, handler, event, data):
+        user = data.get('event_from_user')
+        if user is not None and 'api' in data:
+            data['api'] = UserApiClient(data['api'], user.id)
+        return await handler(event, data)
+
+
+class UpdateRecorderMiddleware(BaseMiddleware):
+    """Пишет входящие апдейты в JSONL-файл для последующего воспроизведения в loadtest.py"""
+
+    def __init__(self, path):
+        self.file = open(path, 'a', encoding='utf-8', buffering=1)
+
+    async def __call__(self, handler, event, data):
+        self.file.write(event.model_dump_json(exclude_none=True) + '\n')
+        return await handler(event, data)
@@ -0,0 +1,89 @@
+"""Локальная заглушка Telegram Bot API для нагрузочных тестов бота.
+
+Отдает апдейты через getUpdates, принимает исходящие сообщения бота
+и запоминает время их получения.
+"""
+import asyncio
+import time
+
+from aiohttp import web
+
+
+class TelegramStub:
+    def __init__(self, host='127.0.0.1', port=8081):
+        self.host = host
+        self.port = port
+        self.pending = []
+        self.new_updates = asyncio.Event()
+        self.sent = []
+        self.replied = asyncio.Condition()
+        self._message_id = 0
+        self._runner = None
+
+    @property
+    def url(self):
+        return f'http://{self.host}:{self.port}'
+
+    def push_updates(self, updates):
+        self.pending.extend(updates)
+        self.new_updates.set()
+
+    async def wait_for_replies(self, count, timeout=60):
+        async with self.replied:
+            await asyncio.wait_for(self.replied.wait_for(lambda: len(self.sent) >= count), timeout)
+
+    def _ok(self, result):
+        return web.json_response({'ok': True, 'result': result})
+
+    def _message(self, payload):
+        self._message_id += 1
+        return {
+            'message_id': self._message_id,
+            'date': int(time.time()),
+            'chat': {'id': int(payload.get('chat_id', 0)), 'type': 'private'},
+            'text': payload.get('text', ''),
+        }
+
+    async def _payload(self, request):
+        if request.content_type == 'application/json':
+            return await request.json()
+        return dict(await request.post())
+
+    async def handle(self, request):
+        method = request.match_info['method']
+        payload = await self._payload(request)
+
+        if method == 'getMe':
+            return self._ok({'id': 1, 'is_bot': True, 'first_name': 'Stub', 'username': 'stub_bot'})
+        if method in ('deleteWebhook', 'setWebhook', 'answerCallbackQuery'):
+            return self._ok(True)
+        if method == 'getUpdates':
+            return self._ok(await self._get_updates(payload))
+
+        message = self._message(payload)
+        async with self.replied:
+            self.sent.append((time.perf_counter(), method, message['chat']['id']))
+            self.replied.notify_all()
+        return self._ok(message if method != 'editMessageReplyMarkup' else True)
+
+    async def _get_updates(self, payload):
+        offset = int(payload.get('offset') or 0)
+        self.pending = [update for update in self.pending if update['update_id'] >= offset]
+        if not self.pending:
+            self.new_updates.clear()
+            try:
+                await asyncio.wait_for(self.new_updates.wait(), float(payload.get('timeout') or 0) or 0.1)
+            except asyncio.TimeoutError:
+                return []
+        return self.pending[:int(payload.get('limit') or 100)]
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
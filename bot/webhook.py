@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import os
+import secrets
+import signal
+
+from aiogram.types import Update
+from aiohttp import web
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class UpdateQueue:
+    """Ограниченная очередь апдейтов и пул обработчиков.
+
+    Вебхук только кладет апдейт в очередь и сразу отвечает Telegram;
+    обработку ведут workers корутин. Если очередь переполнена,
+    вебхук отвечает 503 и Telegram повторит доставку позже.
+    """
+
+    def __init__(self, dp, bot, workers=16, maxsize=1000):
+        self.dp = dp
+        self.bot = bot
+        self.workers = workers
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._tasks = []
+
+    def put_nowait(self, update):
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        return True
+
+    async def _worker(self):
+        while True:
+            update = await self.queue.get()
+            try:
+                await self.dp.feed_update(self.bot, update)
+                self.processed += 1
+            except Exception:
+                self.failed += 1
+                logger.exception("Error while processing update %s", update.update_id)
+            finally:
+                self.queue.task_done()
+
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout=10):
+        # Даем дообработать то, что уже принято от Telegram
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Dropping %s unprocessed updates on shutdown", self.queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self):
+        return {
+            'queue_depth': self.queue.qsize(),
+            'queue_size': self.queue.maxsize,
+            'workers': self.workers,
+            'processed': self.processed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+        }
+
+
+def create_app(dp, bot, secret, path='/telegram/webhook', workers=16, queue_size=1000):
+    updates = UpdateQueue(dp, bot, workers=workers, maxsize=queue_size)
+    # Глубина очереди, обработанные, упавшие и отклоненные апдейты — в /metrics бота
+    metrics.add_gauges('webhook', updates.stats)
+
+    async def handle_update(request):
+        if not secrets.compare_digest(request.headers.get(SECRET_HEADER, ''), secret):
+            return web.Response(status=401)
+        try:
+            update = Update.model_validate(await request.json(), context={'bot': bot})
+        except ValueError:
+            return web.Response(status=400)
+        if not updates.put_nowait(update):
+            return web.Response(status=503)
+        return web.Response()
+
+    async def health(request):
+        return web.json_response(updates.stats())
+
+    async def on_startup(app):
+        await updates.start()
+
+    async def on_cleanup(app):
+        await updates.stop()
+
+    app = web.Application()
+    app['updates'] = updates
+    app.router.add_post(path, handle_update)
+    app.router.add_get('/healthz', health)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+async def run_webhook(dp, bot):
+    """Запускает HTTP-сервер вебхука и регистрирует его адрес в Telegram"""
+    secret = os.getenv('WEBHOOK_SECRET')
+    base_url = os.getenv('WEBHOOK_URL')
+    if not secret or not base_url:
+        raise RuntimeError('BOT_MODE=webhook requires WEBHOOK_URL and WEBHOOK_SECRET')
+    path = os.getenv('WEBHOOK_PATH', '/telegram/webhook')
+
+    app = create_app(
+        dp, bot, secret,
+        path=path,
+        workers=int(os.getenv('WEBHOOK_WORKERS', '16')),
+        queue_size=int(os.getenv('WEBHOOK_QUEUE_SIZE', '1000')),
+    )
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, os.getenv('WEBHOOK_HOST', '0.0.0.0'), int(os.getenv('WEBHOOK_PORT', '8080')))
+
+    await dp.emit_startup(bot=bot, **dp.workflow_data)
+    try:
+        await site.start()
+        await bot.set_webhook(
+            url=base_url.rstrip('/') + path,
+            secret_token=secret,
+            allowed_updates=dp.resolve_used_update_types(),
+            max_connections=int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40')),
+        )
+        logger.info("Webhook server is listening on %s", path)
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await stop.wait()
+    finally:
+        await runner.cleanup()
+        await dp.emit_shutdown(bot=bot, **dp.workflow_data)